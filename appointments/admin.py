@@ -1,8 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.db.models import Count
 from django.utils.html import format_html
 
-from .models import Agendamento, Cliente, Profissional, Servico
+from .models import Agendamento, Cliente, HistoricoAgendamento, Profissional, Servico
+from .services.agendamento_service import AgendamentoService
+from .services.metricas_service import MetricasService
 
 
 @admin.register(Cliente)
@@ -150,8 +152,49 @@ class ProfissionalAdmin(admin.ModelAdmin):
     total_agendamentos.admin_order_field = "total_agendamentos"
 
 
+class HistoricoAgendamentoInline(admin.TabularInline):
+    """Histórico somente leitura, com a descrição renderizada"""
+
+    model = HistoricoAgendamento
+    extra = 0
+    can_delete = False
+    fields = [
+        "data_acao",
+        "tipo_acao",
+        "descricao",
+        "status_anterior",
+        "status_novo",
+        "nome_usuario",
+        "observacoes",
+    ]
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related(
+                "agendamento__cliente", "agendamento__profissional", "usuario"
+            )
+        )
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def descricao(self, obj):
+        return obj.descricao
+
+    descricao.short_description = "Descrição"
+
+    def nome_usuario(self, obj):
+        return obj.nome_usuario
+
+    nome_usuario.short_description = "Usuário"
+
+
 @admin.register(Agendamento)
 class AgendamentoAdmin(admin.ModelAdmin):
+    inlines = [HistoricoAgendamentoInline]
     list_display = [
         "cliente",
         "profissional",
@@ -243,29 +286,48 @@ class AgendamentoAdmin(admin.ModelAdmin):
         "marcar_como_cancelado",
     ]
 
+    def _alterar_status_em_lote(self, request, queryset, novo_status, mensagem):
+        """Aplicar a transição em lote e informar quantos foram ignorados"""
+        alterados = AgendamentoService.alterar_status_em_lote(
+            queryset, novo_status, usuario=request.user
+        )
+        ignorados = queryset.count() - len(alterados)
+        for resultado, total in (("alterado", len(alterados)), ("ignorado", ignorados)):
+            MetricasService.incrementar(
+                "salao_admin_acoes_total", total, acao=novo_status, resultado=resultado
+            )
+        self.message_user(request, mensagem.format(total=len(alterados)))
+        if ignorados:
+            self.message_user(
+                request,
+                f"{ignorados} agendamento(s) ignorado(s): status atual não permite a alteração.",
+                level=messages.WARNING,
+            )
+
     def marcar_como_confirmado(self, request, queryset):
-        updated = queryset.filter(status="AGENDADO").update(status="CONFIRMADO")
-        self.message_user(
-            request, f"{updated} agendamento(s) marcado(s) como confirmado(s)."
+        self._alterar_status_em_lote(
+            request,
+            queryset,
+            "CONFIRMADO",
+            "{total} agendamento(s) marcado(s) como confirmado(s).",
         )
 
     marcar_como_confirmado.short_description = "Marcar selecionados como confirmados"
 
     def marcar_como_concluido(self, request, queryset):
-        updated = queryset.filter(status__in=["CONFIRMADO", "EM_ANDAMENTO"]).update(
-            status="CONCLUIDO"
-        )
-        self.message_user(
-            request, f"{updated} agendamento(s) marcado(s) como concluído(s)."
+        self._alterar_status_em_lote(
+            request,
+            queryset,
+            "CONCLUIDO",
+            "{total} agendamento(s) marcado(s) como concluído(s).",
         )
 
     marcar_como_concluido.short_description = "Marcar selecionados como concluídos"
 
     def marcar_como_cancelado(self, request, queryset):
-        updated = queryset.filter(status__in=["AGENDADO", "CONFIRMADO"]).update(
-            status="CANCELADO"
+        self._alterar_status_em_lote(
+            request, queryset, "CANCELADO", "{total} agendamento(s) cancelado(s)."
         )
-        self.message_user(request, f"{updated} agendamento(s) cancelado(s).")
 
     marcar_como_cancelado.short_description = "Cancelar selecionados"
 
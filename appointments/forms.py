@@ -1,12 +1,65 @@
 from datetime import datetime, time
 
 from django import forms
+from django.forms.models import ModelChoiceIterator
 from django.utils import timezone
 
 from .models import Agendamento, Cliente, Profissional, Servico
+from .services.compatibilidade_service import CompatibilidadeService
+from .services.metricas_service import MetricasService
+from .services.rastreamento_service import RastreamentoService
+from .services.referencia_service import ReferenciaService
 from .utils import get_local_now, get_local_today
 
 
+class ReferenciaChoiceIterator(ModelChoiceIterator):
+    """Iterador de choices que lê os objetos do cache de referência"""
+
+    def __iter__(self):
+        if self.field.carregar is None:
+            yield from super().__iter__()
+            return
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.carregar():
+            yield self.choice(obj)
+
+    def __len__(self):
+        if self.field.carregar is None:
+            return super().__len__()
+        return len(self.field.carregar()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        if self.field.carregar is None:
+            return super().__bool__()
+        return self.field.empty_label is not None or bool(self.field.carregar())
+
+
+class ReferenciaChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField para tabelas pequenas servidas pelo ReferenciaService"""
+
+    iterator = ReferenciaChoiceIterator
+    carregar = None  # Função que retorna a lista de objetos permitidos
+
+    def to_python(self, value):
+        if self.carregar is None:
+            return super().to_python(value)
+        if value in self.empty_values:
+            return None
+        try:
+            pk = int(getattr(value, "pk", value))
+        except (TypeError, ValueError):
+            pk = None
+        for obj in self.carregar():
+            if obj.pk == pk:
+                return obj
+        raise forms.ValidationError(
+            self.error_messages["invalid_choice"],
+            code="invalid_choice",
+            params={"value": value},
+        )
+
+
 class AgendamentoForm(forms.ModelForm):
     # Campos separados para melhor UX
     data = forms.DateField(
@@ -40,6 +93,10 @@ class AgendamentoForm(forms.ModelForm):
     class Meta:
         model = Agendamento
         fields = ["cliente", "profissional", "servico", "observacoes"]
+        field_classes = {
+            "profissional": ReferenciaChoiceField,
+            "servico": ReferenciaChoiceField,
+        }
         widgets = {
             "cliente": forms.Select(
                 attrs={"class": "form-select", "placeholder": "Selecione o cliente"}
@@ -81,6 +138,9 @@ class AgendamentoForm(forms.ModelForm):
         self.fields["servico"].queryset = Servico.objects.filter(ativo=True).order_by(
             "categoria", "nome"
         )
+        # Profissionais e serviços vêm do cache de referência (sem consultas)
+        self.fields["profissional"].carregar = ReferenciaService.profissionais_ativos
+        self.fields["servico"].carregar = ReferenciaService.servicos_ativos
 
         # Se está editando um agendamento existente, separar data e hora
         if self.instance and self.instance.pk and self.instance.data_hora:
@@ -103,11 +163,26 @@ class AgendamentoForm(forms.ModelForm):
                 hour = now_local.hour + 1 if now_local.minute > 0 else now_local.hour
                 self.fields["hora"].initial = time(hour, 0)
 
+    @RastreamentoService.rastrear("AgendamentoForm.full_clean")
+    def full_clean(self):
+        # Span da validação inteira (campos, clean e unicidade do modelo)
+        super().full_clean()
+
     def clean(self):
         cleaned_data = super().clean()
         data = cleaned_data.get("data")
         hora = cleaned_data.get("hora")
         profissional = cleaned_data.get("profissional")
+        servico = cleaned_data.get("servico")
+
+        # Verificar se o profissional realiza o serviço (matriz em cache)
+        if profissional and servico:
+            if not CompatibilidadeService.profissional_realiza(
+                profissional.pk, servico.pk
+            ):
+                raise forms.ValidationError(
+                    f"{profissional.nome} não realiza o serviço {servico.nome}."
+                )
 
         if hora:
             # Validar se o horário está em horas cheias (apenas :00)
@@ -167,6 +242,9 @@ class AgendamentoForm(forms.ModelForm):
                     conflitos = conflitos.exclude(pk=self.instance.pk)
 
                 if conflitos.exists():
+                    MetricasService.incrementar(
+                        "salao_agendamentos_recusados_total", motivo="horario_ocupado"
+                    )
                     raise forms.ValidationError(
                         f"{profissional.nome} já possui um agendamento para este horário."
                     )
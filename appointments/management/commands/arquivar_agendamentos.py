@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services.arquivo_service import ArquivoService
+
+
+class Command(BaseCommand):
+    help = (
+        "Move agendamentos finalizados mais antigos que N meses (e seu histórico) "
+        "para as tabelas de arquivo, em lotes. Pode ser interrompido e executado "
+        "de novo: cada lote é gravado em uma transação."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=None,
+            help="Idade mínima em meses (padrão: settings.ARQUIVO_MESES)",
+        )
+        parser.add_argument(
+            "--lote", type=int, default=500, help="Agendamentos por transação"
+        )
+        parser.add_argument(
+            "--max-lotes",
+            type=int,
+            default=None,
+            help="Parar após N lotes (para rodar em janelas curtas)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas mostra quantos agendamentos seriam arquivados",
+        )
+
+    def handle(self, *args, **options):
+        data_corte = ArquivoService.data_corte(options["meses"])
+        pendentes = ArquivoService.candidatos(data_corte).count()
+        self.stdout.write(
+            f"{pendentes} agendamento(s) finalizado(s) antes de {data_corte:%d/%m/%Y}"
+        )
+        if options["dry_run"] or not pendentes:
+            return
+
+        total = 0
+        lotes = 0
+        while options["max_lotes"] is None or lotes < options["max_lotes"]:
+            movidos = ArquivoService.arquivar_lote(data_corte, options["lote"])
+            if not movidos:
+                break
+            total += movidos
+            lotes += 1
+            self.stdout.write(f"  lote {lotes}: {total}/{pendentes}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} agendamento(s) arquivado(s) em {lotes} lote(s)")
+        )
@@ -0,0 +1,410 @@
+import json
+import math
+import random
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import Agendamento, Cliente, Profissional
+from appointments.services.agendamento_service import AgendamentoService
+from appointments.services.compatibilidade_service import CompatibilidadeService
+from appointments.utils import get_local_today
+from appointments.views import AgendamentoListView
+
+# Métricas comparadas com a baseline (maior = pior)
+METRICAS_COMPARADAS = ("p95_ms", "consultas_media")
+
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    posicao = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[posicao]
+
+
+class MedidorConsultas:
+    """execute_wrapper que conta as consultas SQL e soma o tempo gasto nelas"""
+
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.total += 1
+
+
+class Cenario:
+    """Uma requisição do benchmark; requisicao(i) devolve (método, url, dados)"""
+
+    def __init__(self, nome, requisicao, status_esperado=200, validar=None):
+        self.nome = nome
+        self.requisicao = requisicao
+        self.status_esperado = status_esperado
+        self.validar = validar
+        # Respostas validadas são JSON: a requisição vai como AJAX
+        self.extra = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"} if validar else {}
+
+    def sucesso(self, response):
+        if response.status_code != self.status_esperado:
+            return False
+        return self.validar is None or self.validar(response)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede latência (p50/p95/p99), vazão e consultas SQL dos principais "
+        "endpoints com N threads. ATENÇÃO: cria agendamentos e altera status; "
+        "use um banco de benchmark, não o de produção."
+    )
+
+    def add_arguments(self, parser):
+        dados = parser.add_argument_group(
+            "massa de dados",
+            "Se informados, gera os dados antes via populate_data (mesmas opções)",
+        )
+        dados.add_argument("--clients", type=int)
+        dados.add_argument("--professionals", type=int)
+        dados.add_argument("--days", type=int)
+        dados.add_argument("--seed", type=int, default=42)
+
+        parser.add_argument(
+            "--requests", type=int, default=50, help="Requisições por endpoint"
+        )
+        parser.add_argument(
+            "--threads", type=int, default=4, help="Requisições simultâneas"
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Requisições descartadas antes de medir cada endpoint",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            metavar="ENDPOINT",
+            help="Medir apenas estes endpoints (ex.: dashboard lista detalhe)",
+        )
+        parser.add_argument("--output", help="Gravar os resultados neste arquivo JSON")
+        parser.add_argument(
+            "--baseline", help="Resultados JSON de uma execução anterior para comparar"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Piora máxima aceita em relação à baseline (0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        if any(options[o] is not None for o in ("clients", "professionals", "days")):
+            call_command(
+                "populate_data",
+                clients=options["clients"],
+                professionals=options["professionals"],
+                days=options["days"],
+                seed=options["seed"],
+                stdout=self.stdout,
+            )
+
+        if not Agendamento.objects.exists():
+            raise CommandError(
+                "Nenhum agendamento no banco: rode populate_data ou informe "
+                "--clients/--professionals/--days"
+            )
+
+        rng = random.Random(options["seed"])
+        total = options["requests"] + options["warmup"]
+        cenarios = self.montar_cenarios(rng, total)
+        if options["only"]:
+            desconhecidos = set(options["only"]) - {c.nome for c in cenarios}
+            if desconhecidos:
+                raise CommandError(
+                    f"Endpoint(s) desconhecido(s): {', '.join(sorted(desconhecidos))}"
+                )
+            cenarios = [c for c in cenarios if c.nome in options["only"]]
+
+        resultados = {
+            "executado_em": timezone.now().isoformat(),
+            "parametros": {
+                "requests": options["requests"],
+                "threads": options["threads"],
+                "warmup": options["warmup"],
+            },
+            "dados": {
+                "clientes": Cliente.objects.count(),
+                "profissionais": Profissional.objects.count(),
+                "agendamentos": Agendamento.objects.count(),
+            },
+            "endpoints": {},
+        }
+
+        self.stdout.write(
+            f"{'endpoint':<16}{'req':>6}{'erros':>7}{'p50':>9}{'p95':>9}"
+            f"{'p99':>9}{'req/s':>9}{'sql':>7}{'sql ms':>9}"
+        )
+        for cenario in cenarios:
+            metricas = self.medir(
+                cenario, options["requests"], options["warmup"], options["threads"]
+            )
+            resultados["endpoints"][cenario.nome] = metricas
+            self.stdout.write(
+                f"{cenario.nome:<16}{metricas['requisicoes']:>6}"
+                f"{metricas['erros']:>7}{metricas['p50_ms']:>9.1f}"
+                f"{metricas['p95_ms']:>9.1f}{metricas['p99_ms']:>9.1f}"
+                f"{metricas['vazao_rps']:>9.1f}{metricas['consultas_media']:>7.1f}"
+                f"{metricas['tempo_sql_ms_media']:>9.1f}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as arquivo:
+                json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados gravados em {options['output']}")
+
+        if options["baseline"]:
+            self.comparar(resultados, options["baseline"], options["threshold"])
+
+    def montar_cenarios(self, rng, total):
+        """Endpoints medidos, com os dados de cada requisição sorteados antes"""
+        ids = list(Agendamento.objects.values_list("pk", flat=True))
+        detalhes = [rng.choice(ids) for _ in range(total)]
+
+        paginas = max(1, -(-len(ids) // AgendamentoListView.paginate_by))
+
+        profissionais = list(Profissional.objects.filter(ativo=True))
+        amanha = get_local_today() + timedelta(days=1)
+        consultas_horarios = [
+            (rng.choice(profissionais).pk, amanha + timedelta(days=rng.randrange(14)))
+            for _ in range(total)
+        ]
+
+        # Cada alteração de status usa um agendamento diferente
+        confirmaveis = list(
+            Agendamento.objects.filter(
+                status="AGENDADO", data_hora__gte=timezone.now()
+            ).values_list("pk", flat=True)[:total]
+        )
+
+        vagas = self.horarios_livres(profissionais, rng, total)
+        clientes = list(Cliente.objects.values_list("pk", flat=True)[:1000])
+
+        cenarios = [
+            Cenario("dashboard", lambda i: ("get", reverse("appointments:dashboard"), {})),
+            Cenario(
+                "lista",
+                lambda i: ("get", reverse("appointments:agendamento_list"), {}),
+            ),
+            Cenario(
+                "lista_profunda",
+                lambda i: (
+                    "get",
+                    reverse("appointments:agendamento_list"),
+                    {"page": paginas},
+                ),
+            ),
+            Cenario(
+                "detalhe",
+                lambda i: (
+                    "get",
+                    reverse("appointments:agendamento_detail", args=[detalhes[i]]),
+                    {},
+                ),
+            ),
+            Cenario(
+                "horarios",
+                lambda i: (
+                    "get",
+                    reverse("appointments:api_horarios_disponiveis"),
+                    {
+                        "profissional_id": consultas_horarios[i][0],
+                        "data": consultas_horarios[i][1].isoformat(),
+                    },
+                ),
+            ),
+            Cenario(
+                "relatorio",
+                lambda i: ("get", reverse("appointments:relatorio_servicos"), {}),
+            ),
+        ]
+
+        if len(vagas) >= total and clientes:
+            cenarios.append(
+                Cenario(
+                    "criar",
+                    lambda i: (
+                        "post",
+                        reverse("appointments:agendamento_create"),
+                        {
+                            "cliente": clientes[i % len(clientes)],
+                            "profissional": vagas[i][0],
+                            "servico": vagas[i][1],
+                            "data": vagas[i][2].isoformat(),
+                            "hora": vagas[i][3].strftime("%H:%M"),
+                        },
+                    ),
+                    status_esperado=302,
+                )
+            )
+        else:
+            self.stderr.write("criar: horários livres insuficientes, ignorado")
+
+        if len(confirmaveis) >= total:
+            cenarios.append(
+                Cenario(
+                    "status",
+                    lambda i: (
+                        "post",
+                        reverse("appointments:atualizar_status", args=[confirmaveis[i]]),
+                        {"status": "CONFIRMADO"},
+                    ),
+                    validar=lambda response: response.json()["success"],
+                )
+            )
+        else:
+            self.stderr.write("status: agendamentos AGENDADO insuficientes, ignorado")
+
+        return cenarios
+
+    @staticmethod
+    def horarios_livres(profissionais, rng, total):
+        """Vagas (profissional, serviço, data, hora) livres, após os dados gerados"""
+        vagas = []
+        data = get_local_today() + timedelta(days=60)
+        for _ in range(365):
+            for profissional in profissionais:
+                servicos = sorted(
+                    CompatibilidadeService.servicos_do_profissional(profissional.pk)
+                )
+                if not servicos:
+                    continue
+                for hora in AgendamentoService.get_horarios_disponiveis(
+                    profissional, data
+                ):
+                    # O serviço (60 min) precisa terminar dentro do expediente
+                    if hora.hour + 1 <= profissional.horario_fim.hour:
+                        vagas.append((profissional.pk, rng.choice(servicos), data, hora))
+                if len(vagas) >= total:
+                    return vagas
+            data += timedelta(days=1)
+        return vagas
+
+    def medir(self, cenario, requisicoes, aquecimento, threads):
+        """Executar as requisições do cenário e calcular as métricas"""
+        latencias = []
+        consultas = []
+        tempos_sql = []
+        erros = []
+        trava = threading.Lock()
+
+        def trabalhar(proximo, registrar):
+            client = Client(HTTP_HOST="localhost")
+            try:
+                while True:
+                    with trava:
+                        i = next(proximo, None)
+                    if i is None:
+                        return
+                    metodo, url, dados = cenario.requisicao(i)
+                    medidor = MedidorConsultas()
+                    inicio = time.perf_counter()
+                    # Todas as conexões: com DB_LEITURA as leituras vão à réplica
+                    with ExitStack() as pilha:
+                        for conexao in connections.all():
+                            pilha.enter_context(conexao.execute_wrapper(medidor))
+                        try:
+                            response = getattr(client, metodo)(
+                                url, dados, **cenario.extra
+                            )
+                            ok = cenario.sucesso(response)
+                        except Exception as e:
+                            ok = False
+                            response = e
+                    duracao = time.perf_counter() - inicio
+                    if not registrar:
+                        continue
+                    with trava:
+                        latencias.append(duracao * 1000)
+                        consultas.append(medidor.total)
+                        tempos_sql.append(medidor.tempo * 1000)
+                        if not ok:
+                            erros.append(response)
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+
+        def executar(indices, registrar):
+            proximo = iter(indices)
+            if threads <= 1:
+                trabalhar(proximo, registrar)
+                return
+            workers = [
+                threading.Thread(target=trabalhar, args=(proximo, registrar))
+                for _ in range(threads)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        # Aquecimento inteiro antes: a vazão cobre só a fase medida
+        executar(range(aquecimento), registrar=False)
+        inicio = time.perf_counter()
+        executar(range(aquecimento, aquecimento + requisicoes), registrar=True)
+        duracao = time.perf_counter() - inicio
+
+        if erros:
+            self.stderr.write(f"{cenario.nome}: {len(erros)} erro(s), ex.: {erros[0]!r}")
+
+        latencias.sort()
+        return {
+            "requisicoes": len(latencias),
+            "erros": len(erros),
+            "p50_ms": round(percentil(latencias, 50), 2),
+            "p95_ms": round(percentil(latencias, 95), 2),
+            "p99_ms": round(percentil(latencias, 99), 2),
+            "media_ms": round(sum(latencias) / max(len(latencias), 1), 2),
+            "vazao_rps": round(requisicoes / duracao, 2) if duracao else 0.0,
+            "consultas_media": round(sum(consultas) / max(len(consultas), 1), 2),
+            "consultas_max": max(consultas, default=0),
+            "tempo_sql_ms_media": round(sum(tempos_sql) / max(len(tempos_sql), 1), 2),
+        }
+
+    def comparar(self, resultados, caminho, limite):
+        """Falhar se algum endpoint piorou mais que o limite em relação à baseline"""
+        with open(caminho, encoding="utf-8") as arquivo:
+            baseline = json.load(arquivo)
+
+        regressoes = []
+        for nome, anteriores in baseline.get("endpoints", {}).items():
+            atuais = resultados["endpoints"].get(nome)
+            if atuais is None:
+                continue
+            for metrica in METRICAS_COMPARADAS:
+                antes, agora = anteriores.get(metrica), atuais[metrica]
+                if antes and agora > antes * (1 + limite):
+                    regressoes.append(
+                        f"{nome}.{metrica}: {antes} → {agora} "
+                        f"(+{(agora / antes - 1) * 100:.0f}%)"
+                    )
+
+        if regressoes:
+            raise CommandError(
+                "Regressão em relação à baseline:\n  " + "\n  ".join(regressoes)
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Sem regressões acima de {limite:.0%} da baseline")
+        )
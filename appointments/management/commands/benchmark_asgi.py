@@ -0,0 +1,263 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from appointments.management.commands.benchmark import percentil
+from appointments.models import Profissional
+from appointments.utils import get_local_today
+
+# modo: (aplicação, classe de worker do gunicorn, API_ASSINCRONA)
+SERVIDORES = {
+    "wsgi": ("salon_management.wsgi:application", "gthread", "False"),
+    "asgi": (
+        "salon_management.asgi:application",
+        "uvicorn.workers.UvicornWorker",
+        "True",
+    ),
+}
+
+# Resposta incompleta ou conexão encerrada pelo servidor
+ERROS_CONEXAO = (
+    OSError,
+    asyncio.IncompleteReadError,
+    asyncio.TimeoutError,
+    IndexError,
+    ValueError,
+)
+
+
+async def _ler_resposta(reader):
+    """Status e corpo de uma resposta HTTP/1.1 (Content-Length ou chunked)"""
+    status = int((await reader.readline()).split()[1])
+    cabecalhos = {}
+    while True:
+        linha = await reader.readline()
+        if linha in (b"\r\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+    if cabecalhos.get("transfer-encoding") == "chunked":
+        while True:
+            tamanho = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(tamanho + 2)
+            if not tamanho:
+                break
+    else:
+        await reader.readexactly(int(cabecalhos.get("content-length", 0)))
+    return status, cabecalhos.get("connection") != "close"
+
+
+async def _cliente(porta, caminhos, inicio, fim, latencias, erros):
+    """Um cliente com conexão keep-alive, requisitando até o fim do teste"""
+    conexao = None
+    indice = inicio
+    while time.perf_counter() < fim:
+        caminho = caminhos[indice % len(caminhos)]
+        indice += 1
+        comeco = time.perf_counter()
+        try:
+            if conexao is None:
+                conexao = await asyncio.open_connection("127.0.0.1", porta)
+            reader, writer = conexao
+            writer.write(
+                f"GET {caminho} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode()
+            )
+            await writer.drain()
+            status, manter = await asyncio.wait_for(_ler_resposta(reader), 30)
+        except ERROS_CONEXAO:
+            erros.append("conexao")
+            conexao = None
+            continue
+        if status != 200:
+            erros.append(status)
+        else:
+            latencias.append((time.perf_counter() - comeco) * 1000)
+        if not manter:
+            writer.close()
+            conexao = None
+    if conexao is not None:
+        conexao[1].close()
+
+
+async def _carga(porta, caminhos, clientes, duracao):
+    latencias, erros = [], []
+    fim = time.perf_counter() + duracao
+    await asyncio.gather(
+        *(
+            _cliente(porta, caminhos, i, fim, latencias, erros)
+            for i in range(clientes)
+        )
+    )
+    return latencias, erros
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga do endpoint de horários disponíveis com o gunicorn em "
+        "WSGI (workers gthread, views síncronas) e em ASGI (workers uvicorn, "
+        "views assíncronas): vazão e latência com N clientes simultâneos "
+        "usando conexões keep-alive"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clientes", type=int, default=200, help="Clientes simultâneos (200)"
+        )
+        parser.add_argument(
+            "--duracao", type=float, default=10.0, help="Segundos por modo (10)"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=2, help="Processos do gunicorn (2)"
+        )
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Threads por worker WSGI (8)"
+        )
+        parser.add_argument("--porta", type=int, default=8765)
+        parser.add_argument(
+            "--modos", default="wsgi,asgi", help="Modos comparados (wsgi,asgi)"
+        )
+
+    def handle(self, *args, **options):
+        if shutil.which("gunicorn") is None:
+            raise CommandError("gunicorn não instalado: pip install -r requirements")
+        modos = [m.strip() for m in options["modos"].split(",") if m.strip()]
+        desconhecidos = set(modos) - set(SERVIDORES)
+        if desconhecidos:
+            raise CommandError(f"Modos desconhecidos: {', '.join(desconhecidos)}")
+
+        caminhos = self.caminhos()
+        resultados = {}
+        for modo in modos:
+            with self.servidor(modo, options) as porta:
+                self.aguardar(porta, caminhos[0])
+                latencias, erros = asyncio.run(
+                    _carga(porta, caminhos, options["clientes"], options["duracao"])
+                )
+            latencias.sort()
+            resultados[modo] = {
+                "requisicoes": len(latencias),
+                "req_por_s": len(latencias) / options["duracao"],
+                "p50_ms": percentil(latencias, 50),
+                "p95_ms": percentil(latencias, 95),
+                "p99_ms": percentil(latencias, 99),
+                "erros": len(erros),
+            }
+        self.relatorio(resultados, options)
+
+    @staticmethod
+    def caminhos():
+        """URLs do endpoint para os profissionais ativos nas próximas 2 semanas"""
+        profissionais = list(
+            Profissional.objects.filter(ativo=True).values_list("pk", flat=True)
+        )
+        if not profissionais:
+            raise CommandError("Banco sem dados: rode populate_data antes")
+        url = reverse("appointments:api_horarios_disponiveis")
+        hoje = get_local_today()
+        return [
+            f"{url}?profissional_id={pk}&data={hoje + timedelta(days=dia):%Y-%m-%d}"
+            for dia in range(14)
+            for pk in profissionais
+        ]
+
+    @contextmanager
+    def servidor(self, modo, options):
+        """gunicorn do modo em um subprocesso, encerrado ao sair do bloco"""
+        aplicacao, worker, assincrona = SERVIDORES[modo]
+        comando = [
+            "gunicorn",
+            aplicacao,
+            "-c",
+            str(settings.BASE_DIR / "gunicorn.conf.py"),
+            "--bind",
+            f"127.0.0.1:{options['porta']}",
+            "--workers",
+            str(options["workers"]),
+            "--worker-class",
+            worker,
+            "--access-logfile",
+            "/dev/null",
+            "--error-logfile",
+            "-",
+        ]
+        if modo == "wsgi":
+            comando += ["--threads", str(options["threads"])]
+        ambiente = {
+            **os.environ,
+            "API_ASSINCRONA": assincrona,
+            # Mesmo cenário de produção nos dois modos
+            "DEBUG": "False",
+            "PERFIL_ATIVO": "False",
+        }
+        processo = subprocess.Popen(
+            comando,
+            env=ambiente,
+            cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=sys.stderr,
+        )
+        try:
+            yield options["porta"]
+        finally:
+            processo.terminate()
+            try:
+                processo.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+
+    @staticmethod
+    def aguardar(porta, caminho, limite=30):
+        """Esperar o servidor responder (os workers importam o Django)"""
+
+        async def tentar():
+            reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+            writer.write(f"GET {caminho} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+            await writer.drain()
+            status, _ = await _ler_resposta(reader)
+            writer.close()
+            return status
+
+        fim = time.monotonic() + limite
+        while time.monotonic() < fim:
+            try:
+                status = asyncio.run(tentar())
+            except ERROS_CONEXAO:
+                time.sleep(0.2)
+                continue
+            if status != 200:
+                raise CommandError(f"O endpoint respondeu {status}")
+            return
+        raise CommandError("O servidor não respondeu a tempo")
+
+    def relatorio(self, resultados, options):
+        self.stdout.write(
+            f"{options['clientes']} clientes, {options['duracao']:.0f}s por modo, "
+            f"{options['workers']} worker(s)\n"
+        )
+        self.stdout.write(
+            f"{'modo':<6} {'requisições':>11} {'req/s':>9} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'erros':>6}"
+        )
+        for modo, r in resultados.items():
+            estilo = self.style.ERROR if r["erros"] else self.style.SUCCESS
+            self.stdout.write(
+                estilo(
+                    f"{modo:<6} {r['requisicoes']:>11} {r['req_por_s']:>9.1f} "
+                    f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                    f"{r['erros']:>6}"
+                )
+            )
+        if {"wsgi", "asgi"} <= resultados.keys() and resultados["wsgi"]["req_por_s"]:
+            ganho = resultados["asgi"]["req_por_s"] / resultados["wsgi"]["req_por_s"]
+            self.stdout.write(f"\nVazão ASGI / WSGI: {ganho:.2f}x")
+
@@ -0,0 +1,193 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from appointments.management.commands.benchmark import Command as Benchmark
+from appointments.management.commands.benchmark import percentil
+from appointments.models import Agendamento, Cliente, Profissional, Servico
+from appointments.services.agendamento_service import AgendamentoService
+
+# perfil: (pragmas, transaction_mode, reaproveitar a conexão)
+PERFIS = {
+    "padrao": ({"journal_mode": "DELETE"}, None, False),
+    "producao": (settings.SQLITE_PRAGMAS_PRODUCAO, "IMMEDIATE", True),
+}
+
+
+def _iniciar_worker(perfil):
+    """Configurar o processo filho com os pragmas e o modo de transação"""
+    pragmas, modo, _ = PERFIS[perfil]
+    settings.SQLITE_PRAGMAS = pragmas
+    connection.settings_dict["OPTIONS"] = {"transaction_mode": modo} if modo else {}
+    connections.close_all()
+
+
+def _escrever(tarefa):
+    """Criar e confirmar agendamentos, como as requisições de um worker
+
+    Devolve (ids criados, latências em ms das operações completas, erros de
+    lock, outros erros).
+    """
+    perfil, vagas = tarefa
+    reaproveitar = PERFIS[perfil][2]
+    ids, latencias, erros_lock, outros = [], [], 0, 0
+
+    for cliente_id, profissional_id, servico_id, data_hora in vagas:
+        inicio = time.perf_counter()
+        try:
+            agendamento = AgendamentoService.criar_agendamento(
+                Cliente.objects.get(pk=cliente_id),
+                Profissional.objects.get(pk=profissional_id),
+                Servico.objects.get(pk=servico_id),
+                data_hora,
+            )
+            ids.append(agendamento.pk)
+            # Caminho da API em lote: lê os status e atualiza na mesma transação
+            AgendamentoService.alterar_status_em_lote([agendamento.pk], "CONFIRMADO")
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            erros_lock += 1
+        except ValueError:
+            outros += 1
+        finally:
+            if not reaproveitar:
+                # Sem CONN_MAX_AGE cada requisição abre a sua conexão
+                connection.close()
+
+    connection.close()
+    return ids, latencias, erros_lock, outros
+
+
+class Command(BaseCommand):
+    help = (
+        "Escritas concorrentes de vários processos (criar e confirmar "
+        "agendamentos) com o SQLite no perfil padrão e no de produção "
+        "(WAL, pragmas, BEGIN IMMEDIATE e conexão reaproveitada): vazão, "
+        "latência e erros \"database is locked\". Cria e depois apaga os "
+        "agendamentos; use um banco separado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processos", type=int, default=4, help="Processos escrevendo (4)"
+        )
+        parser.add_argument(
+            "--escritas", type=int, default=100, help="Agendamentos por processo"
+        )
+        parser.add_argument(
+            "--perfis",
+            default="padrao,producao",
+            help="Perfis comparados, na ordem (padrao,producao)",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            raise CommandError("O benchmark de escrita precisa de um SQLite em arquivo")
+
+        perfis = [p.strip() for p in options["perfis"].split(",") if p.strip()]
+        desconhecidos = set(perfis) - set(PERFIS)
+        if desconhecidos:
+            raise CommandError(f"Perfis desconhecidos: {', '.join(desconhecidos)}")
+
+        processos, escritas = options["processos"], options["escritas"]
+        clientes = list(Cliente.objects.values_list("pk", flat=True)[:500])
+        profissionais = list(Profissional.objects.filter(ativo=True))
+        if not clientes or not profissionais:
+            raise CommandError("Banco sem dados: rode populate_data antes")
+
+        rng = random.Random(options["seed"])
+        total = processos * escritas
+        vagas = Benchmark.horarios_livres(profissionais, rng, total * len(perfis))
+        if len(vagas) < total * len(perfis):
+            raise CommandError("Horários livres insuficientes para o benchmark")
+        rng.shuffle(vagas)
+
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            modo_original = cursor.fetchone()[0]
+
+        resultados = {}
+        try:
+            for indice, perfil in enumerate(perfis):
+                bloco = vagas[indice * total : (indice + 1) * total]
+                lotes = [
+                    [
+                        (
+                            rng.choice(clientes),
+                            profissional_id,
+                            servico_id,
+                            timezone.make_aware(datetime.combine(data, hora)),
+                        )
+                        for profissional_id, servico_id, data, hora in bloco[
+                            i::processos
+                        ]
+                    ]
+                    for i in range(processos)
+                ]
+                resultados[perfil] = self.executar(perfil, lotes)
+        finally:
+            self._journal_mode(modo_original)
+
+        self.relatorio(resultados)
+        if resultados.get("producao", {}).get("erros_lock"):
+            raise CommandError("Erros de lock no perfil de produção")
+
+    def executar(self, perfil, lotes):
+        pragmas = PERFIS[perfil][0]
+        self._journal_mode(pragmas.get("journal_mode", "DELETE"))
+        connections.close_all()
+
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=len(lotes), initializer=_iniciar_worker, initargs=(perfil,)
+        ) as executor:
+            partes = list(executor.map(_escrever, [(perfil, lote) for lote in lotes]))
+        duracao = time.perf_counter() - inicio
+
+        ids = [pk for parte in partes for pk in parte[0]]
+        latencias = sorted(ms for parte in partes for ms in parte[1])
+        Agendamento.objects.filter(pk__in=ids).delete()
+        return {
+            "escritas": len(latencias),
+            "escritas_por_s": len(latencias) / duracao if duracao else 0.0,
+            "p50_ms": percentil(latencias, 50),
+            "p95_ms": percentil(latencias, 95),
+            "erros_lock": sum(parte[2] for parte in partes),
+            "outros_erros": sum(parte[3] for parte in partes),
+        }
+
+    @staticmethod
+    def _journal_mode(modo):
+        """Trocar o journal_mode exige o banco sem outras conexões"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {modo}")
+        connection.close()
+
+    def relatorio(self, resultados):
+        self.stdout.write(
+            f"{'perfil':<10} {'escritas':>8} {'escritas/s':>11} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'locks':>6} {'outros':>7}"
+        )
+        for perfil, r in resultados.items():
+            estilo = self.style.ERROR if r["erros_lock"] else self.style.SUCCESS
+            self.stdout.write(
+                estilo(
+                    f"{perfil:<10} {r['escritas']:>8} {r['escritas_por_s']:>11.1f} "
+                    f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                    f"{r['erros_lock']:>6} {r['outros_erros']:>7}"
+                )
+            )
+        if {"padrao", "producao"} <= resultados.keys():
+            base = resultados["padrao"]["escritas_por_s"]
+            if base:
+                ganho = resultados["producao"]["escritas_por_s"] / base
+                self.stdout.write(f"\nVazão do perfil de produção: {ganho:.1f}x")
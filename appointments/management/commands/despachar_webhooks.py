@@ -0,0 +1,122 @@
+import logging
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.saloes import ativar_salao, saloes
+from appointments.services.webhook_service import WebhookService
+
+logger = logging.getLogger(__name__)
+
+# Remoção dos eventos entregues fora da retenção, no máximo uma vez por hora
+INTERVALO_LIMPEZA_S = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Entrega os eventos da tabela de saída aos webhooks (settings.WEBHOOKS) "
+        "em lotes de WEBHOOK_LOTE, com no máximo N requisições simultâneas por "
+        "destino e novas tentativas com backoff; percorre o banco de cada salão. "
+        "Rode como serviço (um processo) ou com --uma-vez no cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--uma-vez",
+            action="store_true",
+            help="Sair quando não houver eventos vencidos",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=1.0,
+            help="Segundos entre consultas à fila vazia (1)",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.WEBHOOKS:
+            raise CommandError("Nenhum webhook configurado (settings.WEBHOOKS)")
+        bancos = saloes() or [None]
+        # Um pool por destino: um destino lento não ocupa as vagas dos outros
+        executores = {
+            destino: ThreadPoolExecutor(
+                max_workers=WebhookService.concorrencia(destino),
+                thread_name_prefix=f"webhook-{destino}",
+            )
+            for destino in settings.WEBHOOKS
+        }
+        em_andamento = {}
+        ocupados = Counter()
+        totais = Counter()
+        proxima_limpeza = 0.0
+        try:
+            while True:
+                if time.monotonic() >= proxima_limpeza:
+                    for salao in bancos:
+                        with ativar_salao(salao):
+                            WebhookService.limpar_entregues()
+                    proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA_S
+
+                lote = settings.WEBHOOK_LOTE
+                for destino, executor in executores.items():
+                    limite = WebhookService.concorrencia(destino)
+                    for salao in bancos:
+                        livres = limite - ocupados[destino]
+                        if livres <= 0:
+                            break
+                        with ativar_salao(salao):
+                            eventos = WebhookService.reservar(destino, livres * lote)
+                            for inicio in range(0, len(eventos), lote):
+                                parte = eventos[inicio : inicio + lote]
+                                futuro = executor.submit(
+                                    WebhookService.enviar,
+                                    destino,
+                                    WebhookService.corpo(parte),
+                                )
+                                em_andamento[futuro] = (salao, destino, parte)
+                                ocupados[destino] += 1
+                # Revezar a ordem para um salão não monopolizar as vagas
+                bancos = bancos[1:] + bancos[:1]
+
+                if not em_andamento:
+                    if options["uma_vez"]:
+                        break
+                    time.sleep(options["intervalo"])
+                    continue
+
+                concluidos, _ = wait(
+                    em_andamento,
+                    timeout=options["intervalo"],
+                    return_when=FIRST_COMPLETED,
+                )
+                for futuro in concluidos:
+                    salao, destino, eventos = em_andamento.pop(futuro)
+                    ocupados[destino] -= 1
+                    erro, espera = futuro.result()
+                    with ativar_salao(salao):
+                        if erro is None:
+                            WebhookService.confirmar(eventos)
+                            totais["entregues"] += len(eventos)
+                        else:
+                            WebhookService.adiar(eventos, erro, espera)
+                            totais["falhas"] += len(eventos)
+                            logger.warning(
+                                "Webhook %s falhou (%s): %s evento(s) adiado(s)",
+                                destino,
+                                erro,
+                                len(eventos),
+                            )
+        finally:
+            # Lotes em andamento ao interromper voltam à fila após a reserva
+            for executor in executores.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{totais['entregues']} evento(s) entregue(s), "
+                f"{totais['falhas']} falha(s) de entrega"
+            )
+        )
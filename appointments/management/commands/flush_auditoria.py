@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services.auditoria_service import AuditoriaService
+
+
+class Command(BaseCommand):
+    help = (
+        "Grava no banco o spool de auditoria de processos encerrados "
+        "(rode no deploy, antes de subir os workers)"
+    )
+
+    def handle(self, *args, **options):
+        total = AuditoriaService.recuperar_orfaos()
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} evento(s) de histórico gravado(s)")
+        )
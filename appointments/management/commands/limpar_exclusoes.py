@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from appointments.services.sincronizacao_service import SincronizacaoService
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove as lápides do feed de alterações mais antigas que a retenção "
+        "(settings.FEED_RETENCAO_DIAS); agendar no cron, como o otimizar_banco"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=settings.FEED_RETENCAO_DIAS,
+            help=f"Retenção em dias ({settings.FEED_RETENCAO_DIAS})",
+        )
+
+    def handle(self, *args, **options):
+        removidas = SincronizacaoService.limpar_exclusoes(options["dias"])
+        self.stdout.write(self.style.SUCCESS(f"{removidas} lápide(s) removida(s)"))
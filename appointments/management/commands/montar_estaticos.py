@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.services.estaticos_service import EstaticosService
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera os pacotes de settings.PACOTES_ESTATICOS em static/dist/ "
+        "(concatenados e minificados). Rode antes do collectstatic quando "
+        "ESTATICOS_EMPACOTADOS=True"
+    )
+
+    def handle(self, *args, **options):
+        destino = settings.ESTATICOS_DIST
+        destino.mkdir(parents=True, exist_ok=True)
+        self.stdout.write(f"{'pacote':<18} {'bytes':>9} {'gzip':>9} {'brotli':>9}")
+        for nome in settings.PACOTES_ESTATICOS:
+            try:
+                conteudo = EstaticosService.montar(nome)
+            except ValueError as e:
+                raise CommandError(str(e))
+            (destino / nome).write_text(conteudo, encoding="utf-8")
+            tamanhos = EstaticosService.tamanhos(conteudo)
+            brotli = tamanhos["brotli"] if tamanhos["brotli"] is not None else "-"
+            self.stdout.write(
+                f"{nome:<18} {tamanhos['bruto']:>9} {tamanhos['gzip']:>9} {brotli:>9}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Pacotes gravados em {destino}"))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Manutenção periódica do banco (agende no cron): PRAGMA optimize no "
+        "SQLite, que só reanalisa as tabelas que mudaram; --analyze refaz todas "
+        "as estatísticas e --checkpoint esvazia o arquivo -wal"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database", default="default", help="Alias do banco (padrão: default)"
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="ANALYZE completo (após cargas grandes, ex.: populate_data)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            action="store_true",
+            help="PRAGMA wal_checkpoint(TRUNCATE) ao final",
+        )
+
+    def handle(self, *args, **options):
+        conexao = connections[options["database"]]
+        with conexao.cursor() as cursor:
+            if conexao.vendor != "sqlite":
+                cursor.execute("ANALYZE")
+                self.stdout.write(self.style.SUCCESS("✓ ANALYZE"))
+                return
+
+            cursor.execute("PRAGMA journal_mode")
+            modo = cursor.fetchone()[0]
+
+            if options["analyze"]:
+                cursor.execute("ANALYZE")
+                self.stdout.write("✓ ANALYZE")
+            cursor.execute("PRAGMA optimize")
+            self.stdout.write("✓ PRAGMA optimize")
+
+            if options["checkpoint"] and modo != "wal":
+                self.stdout.write(f"checkpoint ignorado (journal_mode={modo})")
+            elif options["checkpoint"]:
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                ocupado, paginas, copiadas = cursor.fetchone()
+                if ocupado:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            "checkpoint incompleto: há leitores ativos "
+                            f"({copiadas}/{paginas} páginas copiadas)"
+                        )
+                    )
+                else:
+                    self.stdout.write(f"✓ checkpoint ({paginas} páginas)")
+
+        self.stdout.write(self.style.SUCCESS(f"Banco otimizado (journal_mode={modo})"))
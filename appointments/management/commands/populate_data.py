@@ -1,13 +1,242 @@
 import random
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, time, timedelta
 from decimal import Decimal
+from zoneinfo import ZoneInfo
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
 from django.utils import timezone
 from faker import Faker
 
 from appointments.models import Agendamento, Cliente, Profissional, Servico
+from appointments.routers import banco_escrita
+from appointments.services.compatibilidade_service import CompatibilidadeService
+from appointments.services.referencia_service import ReferenciaService
+
+
+def normalizar_nome(nome):
+    nome_normalizado = (
+        unicodedata.normalize("NFKD", nome).encode("ASCII", "ignore").decode("utf-8")
+    )
+    return nome_normalizado
+
+
+def formatar_nome_para_email(nome):
+    nome_normalizado = normalizar_nome(nome)
+    # Substitui espaço por ponto e mantém apenas letras, números e pontos
+    email_user = "".join(
+        c if c.isalnum() or c == "." else "."
+        for c in nome_normalizado.lower().replace(" ", ".")
+    )
+    # Remove pontos duplicados e bordas
+    return ".".join(filter(None, email_user.split(".")))
+
+
+# Geração em escala (--clients/--professionals/--days)
+#
+# As funções abaixo rodam nos processos do pool: recebem apenas dados simples,
+# usam um gerador aleatório próprio por lote (semente + índice do lote) e
+# devolvem tuplas; só o processo principal grava no banco. Assim o resultado
+# é o mesmo com qualquer número de workers.
+
+_contexto = {}
+
+
+def _iniciar_worker(contexto):
+    _contexto.update(contexto)
+
+
+def _gerar_clientes(lote):
+    """Dados de um lote de clientes: lista de dicts para Cliente(**dados)"""
+    semente, indice, quantidade = lote
+    fake = Faker("pt_BR")
+    fake.seed_instance(semente * 1_000_003 + indice)
+    rng = random.Random(semente * 1_000_003 + indice)
+
+    clientes = []
+    for _ in range(quantidade):
+        nome = fake.name()
+        clientes.append(
+            {
+                "nome": nome,
+                "telefone": fake.phone_number(),
+                "email": f"{formatar_nome_para_email(nome)}@gmail.com",
+                "endereco": fake.address(),
+                "data_nascimento": fake.date_of_birth(minimum_age=18, maximum_age=80),
+                "observacoes": (
+                    fake.text(max_nb_chars=100) if rng.random() < 0.5 else ""
+                ),
+            }
+        )
+    return clientes
+
+
+def _status_por_data(rng, data, hoje):
+    """Mesma distribuição de status do modo de demonstração"""
+    dias_atras = (hoje - data).days
+    if dias_atras > 7:
+        return rng.choice(["CONCLUIDO", "CONCLUIDO", "CONCLUIDO", "CANCELADO"])
+    if dias_atras > 0:
+        return rng.choice(["CONCLUIDO", "CANCELADO", "NAO_COMPARECEU"])
+    return rng.choice(["AGENDADO", "CONFIRMADO", "CONFIRMADO"])
+
+
+def _gerar_agendamentos(dias):
+    """Agendamentos de um bloco de dias, para todos os profissionais
+
+    Cada profissional recebe uma amostra sem repetição dos seus horários no
+    dia, então a restrição de horário único é garantida na construção.
+    Retorna tuplas (cliente, profissional, servico, data_hora, status, preco).
+    """
+    semente = _contexto["semente"]
+    hoje = _contexto["hoje"]
+    fuso = ZoneInfo(_contexto["fuso"])
+    clientes = _contexto["clientes"]
+    precos = _contexto["precos"]
+    ocupacao = _contexto["ocupacao"]
+
+    agendamentos = []
+    for data in dias:
+        rng = random.Random(semente * 1_000_003 + data.toordinal())
+        dia_semana = data.isoweekday()
+        for profissional_id, horarios, dias_semana, servicos in _contexto[
+            "profissionais"
+        ]:
+            if dia_semana not in dias_semana or not servicos:
+                continue
+            quantidade = sum(1 for _ in horarios if rng.random() < ocupacao)
+            for horario in sorted(rng.sample(horarios, quantidade)):
+                servico_id = rng.choice(servicos)
+                agendamentos.append(
+                    (
+                        rng.choice(clientes),
+                        profissional_id,
+                        servico_id,
+                        datetime.combine(data, horario, tzinfo=fuso),
+                        _status_por_data(rng, data, hoje),
+                        precos[servico_id],
+                    )
+                )
+    return agendamentos
+
+
+def _horarios_do_profissional(inicio, fim):
+    """Horários de início (horas cheias) que terminam dentro do expediente"""
+    horarios = []
+    atual = datetime.combine(datetime.min.date(), inicio)
+    limite = datetime.combine(datetime.min.date(), fim)
+    # Expedientes que começam na meia hora (8:30) abrem na hora cheia seguinte
+    if atual.minute or atual.second:
+        atual = atual.replace(minute=0, second=0) + timedelta(hours=1)
+    while atual + timedelta(hours=1) <= limite:
+        horarios.append(atual.time())
+        atual += timedelta(hours=1)
+    return horarios
+
+
+SERVICOS = [
+    {
+        "nome": "Corte de Cabelo Feminino",
+        "categoria": "CABELO",
+        "preco": Decimal("45.00"),
+        "duracao_minutos": 60,
+        "descricao": "Corte personalizado para cabelo feminino",
+    },
+    {
+        "nome": "Corte de Cabelo Masculino",
+        "categoria": "CABELO",
+        "preco": Decimal("25.00"),
+        "duracao_minutos": 60,
+        "descricao": "Corte tradicional masculino",
+    },
+    {
+        "nome": "Escova e Prancha",
+        "categoria": "CABELO",
+        "preco": Decimal("35.00"),
+        "duracao_minutos": 60,
+        "descricao": "Escovação e finalização com prancha",
+    },
+    {
+        "nome": "Coloração",
+        "categoria": "CABELO",
+        "preco": Decimal("80.00"),
+        "duracao_minutos": 60,
+        "descricao": "Coloração completa do cabelo",
+    },
+    {
+        "nome": "Manicure",
+        "categoria": "UNHAS",
+        "preco": Decimal("20.00"),
+        "duracao_minutos": 60,
+        "descricao": "Cuidados e esmaltação das unhas das mãos",
+    },
+    {
+        "nome": "Pedicure",
+        "categoria": "UNHAS",
+        "preco": Decimal("25.00"),
+        "duracao_minutos": 60,
+        "descricao": "Cuidados e esmaltação das unhas dos pés",
+    },
+    {
+        "nome": "Unha em Gel",
+        "categoria": "UNHAS",
+        "preco": Decimal("50.00"),
+        "duracao_minutos": 60,
+        "descricao": "Aplicação de unhas em gel",
+    },
+    {
+        "nome": "Limpeza de Pele",
+        "categoria": "ESTETICA",
+        "preco": Decimal("60.00"),
+        "duracao_minutos": 60,
+        "descricao": "Limpeza profunda da pele facial",
+    },
+    {
+        "nome": "Massagem Relaxante",
+        "categoria": "MASSAGEM",
+        "preco": Decimal("70.00"),
+        "duracao_minutos": 60,
+        "descricao": "Massagem corporal relaxante",
+    },
+    {
+        "nome": "Design de Sobrancelhas",
+        "categoria": "ESTETICA",
+        "preco": Decimal("30.00"),
+        "duracao_minutos": 60,
+        "descricao": "Design e modelagem de sobrancelhas",
+    },
+]
+
+ESPECIALIDADES = [
+    ["CABELO", "ESTETICA"],
+    ["CABELO"],
+    ["UNHAS"],
+    ["MASSAGEM", "ESTETICA"],
+    ["CABELO", "UNHAS"],
+    ["ESTETICA"],
+    ["UNHAS", "ESTETICA"],
+    ["CABELO", "MASSAGEM"],
+    ["ESTETICA", "MASSAGEM"],
+    ["CABELO", "ESTETICA", "UNHAS"],
+]
+
+HORARIOS = [
+    (time(8, 0), time(18, 0), "1,2,3,4,5,6"),  # Segunda a sábado
+    (time(9, 0), time(17, 0), "1,2,3,4,5"),  # Segunda a sexta
+    (time(8, 0), time(16, 0), "1,2,3,4,5,6"),  # Segunda a sábado
+    (time(10, 0), time(19, 0), "2,3,4,5,6"),  # Terça a sábado
+    (time(7, 0), time(15, 0), "1,2,3,4,5"),  # Segunda a sexta
+    (time(13, 0), time(21, 0), "3,4,5,6,7"),  # Quarta a domingo
+    (time(8, 30), time(17, 30), "1,2,3,4,5"),  # Segunda a sexta (manhã/tarde)
+    (time(14, 0), time(22, 0), "1,2,3,4,5,6"),  # Tarde/noite segunda a sábado
+    (time(9, 30), time(18, 30), "2,3,4,5,6"),  # Terça a sábado
+    (time(7, 30), time(16, 30), "1,2,3,4,5,6"),  # Segunda a sábado (cedo)
+]
 
 
 class Command(BaseCommand):
@@ -20,27 +249,61 @@ class Command(BaseCommand):
             help="Limpa todos os dados antes de popular",
         )
 
-    def normalizar_nome(self, nome):
-        nome_normalizado = (
-            unicodedata.normalize("NFKD", nome)
-            .encode("ASCII", "ignore")
-            .decode("utf-8")
+        # Geração em escala para testes de carga
+        escala = parser.add_argument_group(
+            "geração em escala",
+            "Informar --clients, --professionals ou --days ativa o gerador em "
+            "lote (determinístico, bulk_create em transações)",
         )
-        return nome_normalizado
-
-    def formatar_nome_para_email(self, nome):
-        nome_normalizado = self.normalizar_nome(nome)
-        # Substitui espaço por ponto e mantém apenas letras, números e pontos
-        email_user = "".join(
-            c if c.isalnum() or c == "." else "."
-            for c in nome_normalizado.lower().replace(" ", ".")
+        escala.add_argument("--clients", type=int, help="Quantidade de clientes")
+        escala.add_argument(
+            "--professionals", type=int, help="Quantidade de profissionais"
         )
-        # Remove pontos duplicados e bordas
-        return ".".join(filter(None, email_user.split(".")))
+        escala.add_argument(
+            "--days", type=int, help="Dias de histórico até hoje (passado)"
+        )
+        escala.add_argument(
+            "--future-days",
+            type=int,
+            default=14,
+            help="Dias de agenda futura (padrão: 14)",
+        )
+        escala.add_argument(
+            "--occupancy",
+            type=float,
+            default=0.6,
+            help="Fração dos horários ocupados por dia (padrão: 0.6)",
+        )
+        escala.add_argument(
+            "--seed", type=int, default=42, help="Semente (padrão: 42)"
+        )
+        escala.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processos para gerar os dados (a gravação é sempre sequencial)",
+        )
+        escala.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Registros por lote/transação (padrão: 5000)",
+        )
+
+    def criar_servicos(self):
+        servicos = []
+        for servico_data in SERVICOS:
+            servico, created = Servico.objects.get_or_create(
+                nome=servico_data["nome"], defaults=servico_data
+            )
+            servicos.append(servico)
+            if created:
+                self.stdout.write(f"  ✓ Serviço criado: {servico.nome}")
+        return servicos
 
     def gerar_email(self, nome, dominio):
         """Gera um endereço de email com base no nome e domínio fornecidos"""
-        nome_formatado = self.formatar_nome_para_email(nome)
+        nome_formatado = formatar_nome_para_email(nome)
         return f"{nome_formatado}@{dominio}"
 
     def gerar_email_profissional(self, nome):
@@ -52,6 +315,9 @@ class Command(BaseCommand):
         return self.gerar_email(nome, "gmail.com")
 
     def handle(self, *args, **options):
+        if any(options[o] is not None for o in ("clients", "professionals", "days")):
+            return self.gerar_em_escala(options)
+
         # Configurar Faker para português brasileiro
         fake = Faker("pt_BR")
         Faker.seed(42)  # Para dados consistentes entre execuções
@@ -67,125 +333,19 @@ class Command(BaseCommand):
         self.stdout.write("Criando dados de exemplo...")
 
         # Criar serviços
-        servicos_data = [
-            {
-                "nome": "Corte de Cabelo Feminino",
-                "categoria": "CABELO",
-                "preco": Decimal("45.00"),
-                "duracao_minutos": 60,
-                "descricao": "Corte personalizado para cabelo feminino",
-            },
-            {
-                "nome": "Corte de Cabelo Masculino",
-                "categoria": "CABELO",
-                "preco": Decimal("25.00"),
-                "duracao_minutos": 60,
-                "descricao": "Corte tradicional masculino",
-            },
-            {
-                "nome": "Escova e Prancha",
-                "categoria": "CABELO",
-                "preco": Decimal("35.00"),
-                "duracao_minutos": 60,
-                "descricao": "Escovação e finalização com prancha",
-            },
-            {
-                "nome": "Coloração",
-                "categoria": "CABELO",
-                "preco": Decimal("80.00"),
-                "duracao_minutos": 60,
-                "descricao": "Coloração completa do cabelo",
-            },
-            {
-                "nome": "Manicure",
-                "categoria": "UNHAS",
-                "preco": Decimal("20.00"),
-                "duracao_minutos": 60,
-                "descricao": "Cuidados e esmaltação das unhas das mãos",
-            },
-            {
-                "nome": "Pedicure",
-                "categoria": "UNHAS",
-                "preco": Decimal("25.00"),
-                "duracao_minutos": 60,
-                "descricao": "Cuidados e esmaltação das unhas dos pés",
-            },
-            {
-                "nome": "Unha em Gel",
-                "categoria": "UNHAS",
-                "preco": Decimal("50.00"),
-                "duracao_minutos": 60,
-                "descricao": "Aplicação de unhas em gel",
-            },
-            {
-                "nome": "Limpeza de Pele",
-                "categoria": "ESTETICA",
-                "preco": Decimal("60.00"),
-                "duracao_minutos": 60,
-                "descricao": "Limpeza profunda da pele facial",
-            },
-            {
-                "nome": "Massagem Relaxante",
-                "categoria": "MASSAGEM",
-                "preco": Decimal("70.00"),
-                "duracao_minutos": 60,
-                "descricao": "Massagem corporal relaxante",
-            },
-            {
-                "nome": "Design de Sobrancelhas",
-                "categoria": "ESTETICA",
-                "preco": Decimal("30.00"),
-                "duracao_minutos": 60,
-                "descricao": "Design e modelagem de sobrancelhas",
-            },
-        ]
-
-        servicos = []
-        for servico_data in servicos_data:
-            servico, created = Servico.objects.get_or_create(
-                nome=servico_data["nome"], defaults=servico_data
-            )
-            servicos.append(servico)
-            if created:
-                self.stdout.write(f"  ✓ Serviço criado: {servico.nome}")
-
-        # Criar profissionais com Faker
-        especialidades_config = [
-            ["CABELO", "ESTETICA"],
-            ["CABELO"],
-            ["UNHAS"],
-            ["MASSAGEM", "ESTETICA"],
-            ["CABELO", "UNHAS"],
-            ["ESTETICA"],
-            ["UNHAS", "ESTETICA"],
-            ["CABELO", "MASSAGEM"],
-            ["ESTETICA", "MASSAGEM"],
-            ["CABELO", "ESTETICA", "UNHAS"],
-        ]
-
-        horarios_config = [
-            (time(8, 0), time(18, 0), "1,2,3,4,5,6"),  # Segunda a sábado
-            (time(9, 0), time(17, 0), "1,2,3,4,5"),  # Segunda a sexta
-            (time(8, 0), time(16, 0), "1,2,3,4,5,6"),  # Segunda a sábado
-            (time(10, 0), time(19, 0), "2,3,4,5,6"),  # Terça a sábado
-            (time(7, 0), time(15, 0), "1,2,3,4,5"),  # Segunda a sexta
-            (time(13, 0), time(21, 0), "3,4,5,6,7"),  # Quarta a domingo
-            (time(8, 30), time(17, 30), "1,2,3,4,5"),  # Segunda a sexta (manhã/tarde)
-            (time(14, 0), time(22, 0), "1,2,3,4,5,6"),  # Tarde/noite segunda a sábado
-            (time(9, 30), time(18, 30), "2,3,4,5,6"),  # Terça a sábado
-            (time(7, 30), time(16, 30), "1,2,3,4,5,6"),  # Segunda a sábado (cedo)
-        ]
+        servicos = self.criar_servicos()
 
         # Número de profissionais desejado
         num_profissionais = 8
 
+        # Criar profissionais com Faker
         profissionais_data = []
         for i in range(num_profissionais):
             nome = fake.name()
             # Usar módulo para evitar index out of range
-            config_index = i % len(horarios_config)
-            horario_inicio, horario_fim, dias_semana = horarios_config[config_index]
-            especialidades = especialidades_config[config_index]
+            config_index = i % len(HORARIOS)
+            horario_inicio, horario_fim, dias_semana = HORARIOS[config_index]
+            especialidades = ESPECIALIDADES[config_index]
 
             profissionais_data.append(
                 {
@@ -438,3 +598,162 @@ class Command(BaseCommand):
                 f"\n🚀 O sistema está pronto para demonstração!"
             )
         )
+
+    def gerar_em_escala(self, options):
+        """Modo de carga: milhares de clientes e milhões de agendamentos"""
+        num_clientes = options["clients"] or 0
+        num_profissionais = options["professionals"] or 0
+        dias_passados = options["days"] or 0
+        semente = options["seed"]
+        lote = options["batch_size"]
+        if not 0 < options["occupancy"] <= 1:
+            raise CommandError("--occupancy deve estar entre 0 e 1")
+
+        if options["clear"]:
+            self.stdout.write("Limpando dados existentes...")
+            with transaction.atomic(using=banco_escrita()):
+                Agendamento.objects.all().delete()
+                Cliente.objects.all().delete()
+                Profissional.objects.all().delete()
+
+        servicos = self.criar_servicos()
+
+        # Profissionais (poucos: gerados aqui mesmo)
+        fake = Faker("pt_BR")
+        fake.seed_instance(semente)
+        profissionais = []
+        categorias = []
+        for i in range(num_profissionais):
+            nome = fake.name()
+            horario_inicio, horario_fim, dias_semana = HORARIOS[i % len(HORARIOS)]
+            profissionais.append(
+                Profissional(
+                    nome=nome,
+                    telefone=fake.phone_number(),
+                    email=self.gerar_email_profissional(nome),
+                    horario_inicio=horario_inicio,
+                    horario_fim=horario_fim,
+                    dias_semana=dias_semana,
+                )
+            )
+            categorias.append(ESPECIALIDADES[i % len(ESPECIALIDADES)])
+
+        with transaction.atomic(using=banco_escrita()):
+            Profissional.objects.bulk_create(profissionais, batch_size=lote)
+            Profissional.especialidades.through.objects.bulk_create(
+                [
+                    Profissional.especialidades.through(
+                        profissional_id=profissional.pk, servico_id=servico.pk
+                    )
+                    for profissional, cats in zip(profissionais, categorias)
+                    for servico in servicos
+                    if servico.categoria in cats
+                ],
+                batch_size=lote,
+            )
+        self.stdout.write(f"  ✓ {len(profissionais)} profissionais")
+
+        # Só os clientes gerados agora (pks acima do maior existente)
+        ultimo_cliente = Cliente.objects.aggregate(ultimo=Max("pk"))["ultimo"] or 0
+        with self._pool(options["workers"], {}) as executar:
+            # Clientes
+            lotes = [
+                (semente, indice, min(lote, num_clientes - inicio))
+                for indice, inicio in enumerate(range(0, num_clientes, lote))
+            ]
+            criados = 0
+            for dados in executar(_gerar_clientes, lotes):
+                with transaction.atomic(using=banco_escrita()):
+                    Cliente.objects.bulk_create([Cliente(**d) for d in dados])
+                criados += len(dados)
+                self.stdout.write(f"  clientes: {criados}/{num_clientes}", ending="\r")
+            self.stdout.write(f"  ✓ {criados} clientes          ")
+
+        clientes = Cliente.objects.filter(ativo=True)
+        if num_clientes:
+            clientes = clientes.filter(pk__gt=ultimo_cliente)
+        clientes = list(clientes.order_by("pk").values_list("pk", flat=True))
+        if not clientes:
+            raise CommandError("Nenhum cliente ativo: informe --clients")
+
+        # Agendamentos: blocos de uma semana por tarefa
+        hoje = timezone.localdate()
+        dias = [
+            hoje + timedelta(days=d)
+            for d in range(-dias_passados, options["future_days"] + 1)
+        ]
+        blocos = [dias[i : i + 7] for i in range(0, len(dias), 7)]
+        contexto = {
+            "semente": semente,
+            "hoje": hoje,
+            "fuso": settings.TIME_ZONE,
+            "clientes": clientes,
+            "ocupacao": options["occupancy"],
+            "precos": {servico.pk: servico.preco for servico in servicos},
+            # Só os profissionais gerados agora (pks preenchidos pelo bulk_create)
+            "profissionais": [
+                (
+                    profissional.pk,
+                    _horarios_do_profissional(
+                        profissional.horario_inicio, profissional.horario_fim
+                    ),
+                    set(profissional.lista_dias_semana),
+                    [s.pk for s in servicos if s.categoria in cats],
+                )
+                for profissional, cats in zip(profissionais, categorias)
+            ],
+        }
+
+        total = 0
+        with self._pool(options["workers"], contexto) as executar:
+            for tuplas in executar(_gerar_agendamentos, blocos):
+                with transaction.atomic(using=banco_escrita()):
+                    Agendamento.objects.bulk_create(
+                        [
+                            Agendamento(
+                                cliente_id=cliente_id,
+                                profissional_id=profissional_id,
+                                servico_id=servico_id,
+                                data_hora=data_hora,
+                                status=status,
+                                preco_final=preco,
+                            )
+                            for (
+                                cliente_id,
+                                profissional_id,
+                                servico_id,
+                                data_hora,
+                                status,
+                                preco,
+                            ) in tuplas
+                        ],
+                        batch_size=lote,
+                    )
+                total += len(tuplas)
+                self.stdout.write(f"  agendamentos: {total}", ending="\r")
+
+        # bulk_create não dispara signals: invalidar os caches manualmente
+        CompatibilidadeService.invalidar()
+        ReferenciaService.invalidar()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ Gerados {len(profissionais)} profissionais, {criados} clientes "
+                f"e {total} agendamentos ({len(dias)} dias, semente {semente})"
+            )
+        )
+
+    @contextmanager
+    def _pool(self, workers, contexto):
+        """map() ordenado: em processo com 1 worker, senão em um ProcessPoolExecutor"""
+        if workers <= 1:
+            _iniciar_worker(contexto)
+            yield map
+            return
+
+        # Conexões não podem ser herdadas pelos processos filhos
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_iniciar_worker, initargs=(contexto,)
+        ) as executor:
+            yield executor.map
@@ -0,0 +1,57 @@
+import argparse
+
+from django.core.management import call_command, get_commands, load_command_class
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.saloes import alias_do_salao, ativar_salao, saloes
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa um comando no banco de cada salão (settings.SALOES), um "
+        "salão por vez: por_salao migrate, por_salao populate_data --clear, "
+        "por_salao --saloes centro arquivar_agendamentos --meses 12. "
+        "Comandos com --database (migrate, otimizar_banco...) recebem o alias "
+        "do salão"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--saloes", help="Slugs separados por vírgula (padrão: todos)"
+        )
+        parser.add_argument("comando", help="Nome do comando")
+        parser.add_argument("argumentos", nargs=argparse.REMAINDER)
+
+    def handle(self, *args, **options):
+        escolhidos = (
+            [s.strip() for s in options["saloes"].split(",") if s.strip()]
+            if options["saloes"]
+            else saloes()
+        )
+        if not escolhidos:
+            raise CommandError("Nenhum salão configurado (settings.SALOES)")
+        desconhecidos = set(escolhidos) - set(saloes())
+        if desconhecidos:
+            raise CommandError(f"Salões desconhecidos: {', '.join(desconhecidos)}")
+
+        nome = options["comando"]
+        try:
+            app = get_commands()[nome]
+        except KeyError:
+            raise CommandError(f"Comando desconhecido: {nome}")
+        opcoes = {
+            acao.dest
+            for acao in load_command_class(app, nome).create_parser("", nome)._actions
+        }
+
+        for salao in escolhidos:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"[{salao}] {nome}"))
+            extras = {"database": alias_do_salao(salao)} if "database" in opcoes else {}
+            with ativar_salao(salao):
+                call_command(
+                    nome,
+                    *options["argumentos"],
+                    stdout=self.stdout._out,
+                    stderr=self.stderr._out,
+                    **extras,
+                )
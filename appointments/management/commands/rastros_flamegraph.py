@@ -0,0 +1,61 @@
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.services.rastreamento_service import RastreamentoService
+
+
+class Command(BaseCommand):
+    help = (
+        "Converte o arquivo de rastros (NDJSON) em pilhas \"dobradas\" "
+        "(uma linha por pilha com o tempo próprio em µs), o formato de entrada "
+        "do flamegraph.pl, do speedscope e do inferno"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Arquivo RASTREAMENTO_ARQUIVO")
+        parser.add_argument(
+            "--raiz",
+            help="Só rastros cuja raiz tem este nome "
+            '(ex.: "POST appointments:agendamento_create")',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            spans = list(RastreamentoService.ler(options["arquivo"]))
+        except FileNotFoundError:
+            raise CommandError(f"Arquivo não encontrado: {options['arquivo']}")
+
+        por_id = {(s["traceId"], s["spanId"]): s for s in spans}
+        filhos = defaultdict(int)
+        for span in spans:
+            if "parentSpanId" in span:
+                filhos[(span["traceId"], span["parentSpanId"])] += self._duracao(span)
+
+        pilhas = Counter()
+        for span in spans:
+            caminho = self._caminho(span, por_id)
+            if options["raiz"] and caminho[0] != options["raiz"]:
+                continue
+            # Tempo próprio: o que não foi gasto nos spans filhos
+            chave = (span["traceId"], span["spanId"])
+            proprio = max(self._duracao(span) - filhos[chave], 0)
+            pilhas[";".join(caminho)] += proprio // 1000
+
+        for pilha, micros in sorted(pilhas.items()):
+            if micros:
+                self.stdout.write(f"{pilha} {micros}")
+
+    @staticmethod
+    def _duracao(span):
+        return int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])
+
+    @staticmethod
+    def _caminho(span, por_id):
+        """Nomes da raiz até o span (';' separa níveis no formato dobrado)"""
+        caminho = []
+        while span is not None:
+            caminho.append(span["name"].replace(";", ","))
+            pai = span.get("parentSpanId")
+            span = por_id.get((span["traceId"], pai)) if pai else None
+        return caminho[::-1]
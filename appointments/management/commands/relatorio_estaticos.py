@@ -0,0 +1,144 @@
+import posixpath
+from html.parser import HTMLParser
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from appointments.services.estaticos_service import URL_CSS, EstaticosService
+
+PAGINAS = [
+    "appointments:dashboard",
+    "appointments:agendamento_list",
+    "appointments:agendamento_create",
+    "appointments:profissional_create",
+    "appointments:relatorio_servicos",
+]
+
+
+class _Recursos(HTMLParser):
+    """Folhas de estilo e scripts externos de uma página"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "link" and attrs.get("rel") == "stylesheet" and attrs.get("href"):
+            self.urls.append(attrs["href"])
+        elif tag == "script" and attrs.get("src"):
+            self.urls.append(attrs["src"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Peso e número de requisições de estáticos das principais páginas: "
+        "CSS, JS e fontes woff2 na primeira visita (bytes sem compressão, gzip "
+        "e brotli) e requisições na visita seguinte (arquivos sem hash no nome "
+        "são revalidados; com hash ficam no cache do navegador)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--urls", nargs="+", help="Caminhos das páginas (padrão: principais)"
+        )
+        parser.add_argument(
+            "--detalhes", action="store_true", help="Listar os arquivos de cada página"
+        )
+
+    def handle(self, *args, **options):
+        paginas = options["urls"] or [reverse(nome) for nome in PAGINAS]
+        hosts = [h for h in settings.ALLOWED_HOSTS if h and "*" not in h]
+        cliente = Client(HTTP_HOST=(hosts[0] if hosts else "localhost").lstrip("."))
+        imutaveis = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+
+        self.stdout.write(
+            f"{'página':<32} {'req':>4} {'KB':>8} {'KB gzip':>8} {'KB br':>8} "
+            f"{'externos':>8} {'req repetida':>12}"
+        )
+        for pagina in paginas:
+            # Com DEBUG o storage de manifesto gera URLs sem o hash
+            with override_settings(DEBUG=False):
+                resposta = cliente.get(pagina)
+            if resposta.status_code != 200:
+                raise CommandError(f"{pagina} respondeu {resposta.status_code}")
+            recursos = self.recursos(resposta.content.decode(resposta.charset))
+
+            total = {"bruto": 0, "gzip": 0, "brotli": 0}
+            externos = repetidas = 0
+            detalhes = []
+            for url, caminho in recursos:
+                if caminho is None:
+                    externos += 1
+                    repetidas += 1
+                    continue
+                nome = url[len(settings.STATIC_URL) :]
+                if nome not in imutaveis:
+                    repetidas += 1
+                tamanhos = EstaticosService.tamanhos(caminho.read_bytes())
+                for chave in total:
+                    total[chave] += tamanhos[chave] or 0
+                detalhes.append(
+                    f"    {url} ({tamanhos['bruto'] / 1024:.1f} KB"
+                    f"{', cache imutável' if nome in imutaveis else ''})"
+                )
+            brotli = (
+                f"{total['brotli'] / 1024:>8.1f}" if total["brotli"] else f"{'-':>8}"
+            )
+            self.stdout.write(
+                f"{pagina:<32} {len(recursos):>4} {total['bruto'] / 1024:>8.1f} "
+                f"{total['gzip'] / 1024:>8.1f} {brotli} {externos:>8} "
+                f"{repetidas:>12}"
+            )
+            if options["detalhes"]:
+                self.stdout.write("\n".join(detalhes))
+        if not settings.ESTATICOS_EMPACOTADOS:
+            self.stdout.write(
+                "\nArquivos de origem (ESTATICOS_EMPACOTADOS=False). Para medir a "
+                "produção: montar_estaticos, collectstatic e este comando com "
+                "ESTATICOS_EMPACOTADOS=True"
+            )
+
+    def recursos(self, html):
+        """(url, arquivo local ou None) dos CSS/JS da página e das fontes
+        woff2 citadas nos CSS locais, sem repetições"""
+        parser = _Recursos()
+        parser.feed(html)
+        vistos, recursos = set(), []
+        for url in parser.urls:
+            if url in vistos:
+                continue
+            vistos.add(url)
+            caminho = self.arquivo(url)
+            recursos.append((url, caminho))
+            if caminho is None or not url.endswith(".css"):
+                continue
+            for match in URL_CSS.finditer(caminho.read_text(encoding="utf-8")):
+                fonte = match.group(2).split("?")[0].split("#")[0]
+                if not fonte.endswith(".woff2"):
+                    continue
+                fonte = posixpath.normpath(
+                    posixpath.join(posixpath.dirname(url), fonte)
+                )
+                if fonte not in vistos:
+                    vistos.add(fonte)
+                    recursos.append((fonte, self.arquivo(fonte)))
+        return recursos
+
+    @staticmethod
+    def arquivo(url):
+        """Arquivo servido para uma URL estática (None se externa)"""
+        if not url.startswith(settings.STATIC_URL):
+            return None
+        nome = url[len(settings.STATIC_URL) :]
+        encontrado = finders.find(nome)
+        if encontrado:
+            return Path(encontrado)
+        if staticfiles_storage.exists(nome):
+            return Path(staticfiles_storage.path(nome))
+        raise CommandError(f"Arquivo estático não encontrado: {url}")
@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from appointments.saloes import ativar_salao, saloes
+from appointments.services.relatorio_service import RelatorioService
+from appointments.utils import ler_data
+
+
+def _relatorio_do_salao(salao, data_inicio, data_fim):
+    """Totais de um salão, calculados na thread com o banco do salão"""
+    try:
+        with ativar_salao(salao):
+            relatorio = RelatorioService.relatorio_servicos_concluidos(
+                data_inicio, data_fim
+            )
+            return {
+                "stats_gerais": relatorio["stats_gerais"],
+                "servicos_stats": list(relatorio["servicos_stats"]),
+            }
+    finally:
+        # Threads do executor não passam pelo ciclo de requisição do Django
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Serviços concluídos e receita de todos os salões no período, com as "
+        "consultas feitas em paralelo (uma thread por banco de salão)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--inicio", help="Data inicial (AAAA-MM-DD; padrão: 30 dias atrás)"
+        )
+        parser.add_argument("--fim", help="Data final (AAAA-MM-DD; padrão: hoje)")
+        parser.add_argument(
+            "--workers", type=int, default=8, help="Salões consultados ao mesmo tempo"
+        )
+
+    def handle(self, *args, **options):
+        todos = saloes()
+        if not todos:
+            raise CommandError("Nenhum salão configurado (settings.SALOES)")
+        data_inicio = ler_data(options["inicio"])
+        data_fim = ler_data(options["fim"])
+        if (options["inicio"] and not data_inicio) or (options["fim"] and not data_fim):
+            raise CommandError("Datas no formato AAAA-MM-DD")
+
+        with ThreadPoolExecutor(max_workers=max(1, options["workers"])) as executor:
+            resultados = dict(
+                zip(
+                    todos,
+                    executor.map(
+                        lambda salao: _relatorio_do_salao(salao, data_inicio, data_fim),
+                        todos,
+                    ),
+                )
+            )
+
+        self.stdout.write(
+            f"{'salão':<20} {'serviços':>9} {'receita':>12} {'ticket':>9}"
+        )
+        total, receita = 0, Decimal("0")
+        servicos = {}
+        for salao, resultado in resultados.items():
+            stats = resultado["stats_gerais"]
+            total += stats["total_agendamentos"]
+            receita += stats["receita_total"] or 0
+            self.stdout.write(
+                f"{salao:<20} {stats['total_agendamentos']:>9} "
+                f"{stats['receita_total'] or 0:>12.2f} {stats['ticket_medio']:>9.2f}"
+            )
+            for linha in resultado["servicos_stats"]:
+                servicos[linha["servico__nome"]] = (
+                    servicos.get(linha["servico__nome"], 0) + linha["total_servicos"]
+                )
+
+        ticket = receita / total if total else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'total':<20} {total:>9} {receita:>12.2f} {ticket:>9.2f}"
+            )
+        )
+        mais_vendidos = sorted(servicos.items(), key=lambda item: -item[1])[:5]
+        if mais_vendidos:
+            self.stdout.write("\nServiços mais realizados na rede:")
+            for nome, quantidade in mais_vendidos:
+                self.stdout.write(f"  {nome}: {quantidade}")
@@ -0,0 +1,145 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from appointments.models import Agendamento, Profissional
+from appointments.services.plano_service import PlanoService
+from appointments.utils import get_local_today, normalizar_sql
+
+# Problemas aceitos por página, com o motivo (revise ao mudar a consulta)
+ACEITOS = {
+    "relatorio_servicos": {
+        "ordenacao": "agrupa e ordena o resultado agregado do período, já "
+        "filtrado pelo índice (status, data_hora)",
+    },
+    "relatorio_servicos (profissional)": {
+        "ordenacao": "idem relatorio_servicos",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa as páginas mais acessadas, captura os SELECTs e verifica o plano "
+        "de execução de cada um; falha se alguma consulta varrer a tabela ou "
+        "ordenar em B-tree temporária, e sugere um índice composto"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sem-analyze",
+            action="store_true",
+            help="Não atualizar as estatísticas do planejador (ANALYZE) antes",
+        )
+        parser.add_argument(
+            "--verbose-planos",
+            action="store_true",
+            help="Mostrar o plano de todas as consultas, não só das com problema",
+        )
+
+    def paginas(self):
+        """(nome, url, parâmetros GET) das consultas críticas"""
+        profissional = Profissional.objects.filter(ativo=True).first()
+        if profissional is None or not Agendamento.objects.exists():
+            raise CommandError(
+                "Banco sem dados: rode populate_data (de preferência em escala)"
+            )
+        hoje = get_local_today()
+        periodo = {
+            "data_inicio": (hoje - timedelta(days=30)).isoformat(),
+            "data_fim": hoje.isoformat(),
+        }
+        lista = reverse("appointments:agendamento_list")
+        relatorio = reverse("appointments:relatorio_servicos")
+        return [
+            ("dashboard", reverse("appointments:dashboard"), {}),
+            ("agendamento_list", lista, {}),
+            ("agendamento_list (status)", lista, {"status": "CONCLUIDO", **periodo}),
+            (
+                "agendamento_list (profissional)",
+                lista,
+                {"profissional": profissional.pk, **periodo},
+            ),
+            ("relatorio_servicos", relatorio, {}),
+            (
+                "relatorio_servicos (profissional)",
+                relatorio,
+                {"profissional": profissional.pk},
+            ),
+            (
+                "api_horarios_disponiveis",
+                reverse("appointments:api_horarios_disponiveis"),
+                {
+                    "profissional_id": profissional.pk,
+                    "data": (hoje + timedelta(days=1)).isoformat(),
+                },
+            ),
+            ("agenda_ics", reverse("appointments:agenda_ics"), {}),
+            (
+                "agenda_profissional_ics",
+                reverse("appointments:agenda_profissional_ics", args=[profissional.pk]),
+                {},
+            ),
+        ]
+
+    @staticmethod
+    def ler(client, url, parametros):
+        """GET que também consome respostas em streaming (consultam ao ler)"""
+        resposta = client.get(url, parametros)
+        if resposta.streaming:
+            b"".join(resposta.streaming_content)
+        return resposta
+
+    def handle(self, *args, **options):
+        if not options["sem_analyze"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        client = Client(HTTP_HOST="localhost")
+        falhas = 0
+        for nome, url, parametros in self.paginas():
+            consultas = PlanoService.capturar(lambda: self.ler(client, url, parametros))
+            aceitos = ACEITOS.get(nome, {})
+            problemas_pagina = 0
+
+            for sql, params, alias in consultas:
+                # O plano vem do banco que executou a consulta (réplica ou não)
+                plano = PlanoService.explicar(sql, params, using=alias)
+                problemas = [
+                    (tipo, descricao)
+                    for tipo, descricao in PlanoService.problemas(
+                        sql, plano, connections[alias].vendor
+                    )
+                    if tipo not in aceitos
+                ]
+                if not problemas and not options["verbose_planos"]:
+                    continue
+
+                problemas_pagina += len(problemas)
+                estilo = self.style.ERROR if problemas else self.style.NOTICE
+                self.stdout.write(estilo(f"  {nome}: {normalizar_sql(sql)[:200]}"))
+                for linha in plano:
+                    self.stdout.write(f"      {linha}")
+                for _, descricao in problemas:
+                    self.stdout.write(self.style.ERROR(f"    ✗ {descricao}"))
+                for coluna in PlanoService.colunas_em_funcoes(sql):
+                    self.stdout.write(
+                        f"    → {coluna} é filtrada dentro de uma função: use um "
+                        "intervalo (utils.filtro_periodo) para aproveitar o índice"
+                    )
+                if problemas:
+                    sugestao = PlanoService.sugerir_indice(sql)
+                    if sugestao:
+                        self.stdout.write(f"    → índice sugerido: {sugestao}")
+
+            falhas += problemas_pagina
+            if not problemas_pagina:
+                self.stdout.write(
+                    self.style.SUCCESS(f"✓ {nome} ({len(consultas)} consultas)")
+                )
+
+        if falhas:
+            raise CommandError(f"{falhas} problema(s) de plano de execução")
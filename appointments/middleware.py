@@ -0,0 +1,361 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends.django import Template
+from django.urls import get_script_prefix, set_script_prefix
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .routers import encerrar_requisicao, iniciar_requisicao
+from .saloes import ativar_salao, resolver_salao
+from .services.metricas_service import MetricasService
+from .services.rastreamento_service import SERVIDOR, RastreamentoService, Span
+from .services.referencia_service import ReferenciaService
+from .utils import normalizar_sql
+
+logger = logging.getLogger("appointments.perfil")
+
+# Medição da requisição atual (None fora do PerfilMiddleware)
+_medicao = ContextVar("medicao_requisicao", default=None)
+
+
+def _sem_alteracao(response):
+    return response
+
+
+class MiddlewareHibrido:
+    """Base dos middlewares que rodam em WSGI e em ASGI
+
+    Em ASGI um middleware só síncrono obriga o Django a levar a requisição
+    para uma thread e voltar. As subclasses implementam processar(request),
+    um context manager em volta da view que produz a função aplicada à
+    resposta; o mesmo código serve aos dois modos.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._chamar_async(request)
+        with self.processar(request) as finalizar:
+            return finalizar(self.get_response(request))
+
+    async def _chamar_async(self, request):
+        with self.processar(request) as finalizar:
+            return finalizar(await self.get_response(request))
+
+    def processar(self, request):
+        raise NotImplementedError
+
+
+class WhiteNoiseHibridoMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise que não torna síncrona a cadeia de middlewares no ASGI:
+    só a entrega de um arquivo estático vai para uma thread"""
+
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._chamar_async(request)
+        return super().__call__(request)
+
+    async def _chamar_async(self, request):
+        if self.autorefresh:
+            arquivo = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            arquivo = self.files.get(request.path_info)
+        if arquivo is not None:
+            return await sync_to_async(self.serve)(arquivo, request)
+        return await self.get_response(request)
+
+
+class ReferenciaCacheMiddleware(MiddlewareHibrido):
+    """Abre o mapa de identidade de dados de referência por requisição"""
+
+    @contextmanager
+    def processar(self, request):
+        token = ReferenciaService.iniciar_requisicao()
+        try:
+            yield _sem_alteracao
+        finally:
+            ReferenciaService.encerrar_requisicao(token)
+
+
+class SalaoMiddleware(MiddlewareHibrido):
+    """Ativa o salão da requisição (host ou caminho, ver appointments.saloes)"""
+
+    def __init__(self, get_response):
+        if not settings.SALOES:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    @contextmanager
+    def processar(self, request):
+        salao, prefixo = resolver_salao(request)
+        prefixo_original = get_script_prefix()
+        if prefixo:
+            # /centro/agendamentos/ resolve como /agendamentos/ e o reverse()
+            # devolve as URLs já com o prefixo do salão
+            request.path_info = request.path_info[len(prefixo) :] or "/"
+            set_script_prefix(request.META.get("SCRIPT_NAME", "") + prefixo)
+        request.salao = salao
+        try:
+            with ativar_salao(salao):
+                yield _sem_alteracao
+        finally:
+            set_script_prefix(prefixo_original)
+
+
+class LeituraReplicaMiddleware(MiddlewareHibrido):
+    """Fixa no primário, por alguns segundos, as sessões que acabaram de
+    escrever (as views marcadas com ler_da_replica leem o que gravaram)"""
+
+    def __init__(self, get_response):
+        if not settings.DB_ALIAS_LEITURA:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    @contextmanager
+    def processar(self, request):
+        token = iniciar_requisicao(request)
+        try:
+            yield _sem_alteracao
+        finally:
+            encerrar_requisicao(request, token)
+
+
+class MetricasMiddleware(MiddlewareHibrido):
+    """Contagem e duração das requisições por view (rota nomeada)"""
+
+    @contextmanager
+    def processar(self, request):
+        inicio = time.perf_counter()
+
+        def finalizar(response):
+            duracao = time.perf_counter() - inicio
+            rota = getattr(request, "resolver_match", None)
+            view = rota.view_name if rota else "nao_encontrada"
+            MetricasService.incrementar(
+                "salao_http_requisicoes_total",
+                view=view,
+                metodo=request.method,
+                status=response.status_code,
+            )
+            MetricasService.observar("salao_http_duracao_segundos", duracao, view=view)
+            return response
+
+        yield finalizar
+
+
+def _render_rastreado(render):
+    """Envolve Template.render em um span (só a renderização mais externa,
+    como em _render_medido)"""
+
+    def wrapper(self, context=None, request=None):
+        atual = RastreamentoService.span_atual()
+        # Fora de rastro, rastro não amostrado ou já dentro de um template
+        if not isinstance(atual, Span) or atual.tipo == "template":
+            return render(self, context, request)
+        with RastreamentoService.span(
+            f"render {self.template.name}", tipo="template"
+        ):
+            return render(self, context, request)
+
+    wrapper.rastreado = True
+    return wrapper
+
+
+class RastreamentoMiddleware(MiddlewareHibrido):
+    """Span raiz de cada requisição (os demais são filhos dele)"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if not getattr(Template.render, "rastreado", False):
+            Template.render = _render_rastreado(Template.render)
+
+    @contextmanager
+    def processar(self, request):
+        if not RastreamentoService.ativo():
+            yield _sem_alteracao
+            return
+        with RastreamentoService.span(
+            f"{request.method} {request.path}",
+            kind=SERVIDOR,
+            **{"http.method": request.method, "http.target": request.path},
+        ) as span:
+
+            def finalizar(response):
+                if span is not None:
+                    rota = getattr(request, "resolver_match", None)
+                    if rota:
+                        # Nome pela rota, para agrupar /agendamentos/1/, /2/...
+                        span.nome = f"{request.method} {rota.view_name}"
+                    span.definir(**{"http.status_code": response.status_code})
+                return response
+
+            yield finalizar
+
+
+class MedicaoRequisicao:
+    """Consultas SQL e tempo de template de uma requisição
+
+    Usada como execute_wrapper em todas as conexões: guarda só o texto do
+    SQL (normalizado apenas se a requisição entrar no log de lentas).
+    """
+
+    def __init__(self):
+        self.consultas = []
+        self.tempo_sql = 0.0
+        self.tempo_template = 0.0
+        self.renderizando = False
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo_sql += time.perf_counter() - inicio
+            self.consultas.append(sql)
+
+
+def _render_medido(render):
+    """Envolve Template.render para somar o tempo de template (sem o SQL
+    disparado durante a renderização, que já é contado como db)
+
+    Widgets de formulário também renderizam templates: só a renderização
+    mais externa é medida, para não contar o mesmo tempo duas vezes.
+    """
+
+    def wrapper(self, context=None, request=None):
+        medicao = _medicao.get()
+        if medicao is None or medicao.renderizando:
+            return render(self, context, request)
+        medicao.renderizando = True
+        inicio, sql_antes = time.perf_counter(), medicao.tempo_sql
+        try:
+            return render(self, context, request)
+        finally:
+            medicao.renderizando = False
+            decorrido = time.perf_counter() - inicio
+            medicao.tempo_template += decorrido - (medicao.tempo_sql - sql_antes)
+
+    wrapper.medido = True
+    return wrapper
+
+
+class PerfilMiddleware:
+    """Server-Timing (db, template, app), log de requisições lentas e cProfile
+    sob demanda (?_perfil=1 ou cabeçalho X-Perfil, só para staff)
+
+    Só síncrono (o cProfile precisa da view na mesma thread): no ASGI cada
+    requisição passaria pela thread de código síncrono, por isso fica
+    desligado por padrão (PERFIL_ATIVO). O Server-Timing só vai para staff
+    (ou para todos com DEBUG): expõe o tempo de banco de cada página.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFIL_ATIVO:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if not getattr(Template.render, "medido", False):
+            Template.render = _render_medido(Template.render)
+
+    def __call__(self, request):
+        medicao = MedicaoRequisicao()
+        token = _medicao.set(medicao)
+        perfil = None
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pilha:
+                for conexao in connections.all():
+                    pilha.enter_context(conexao.execute_wrapper(medicao))
+                if self._perfil_solicitado(request):
+                    perfil = cProfile.Profile()
+                    response = perfil.runcall(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        total = time.perf_counter() - inicio
+
+        if settings.DEBUG or self._staff(request):
+            response["Server-Timing"] = self._server_timing(medicao, total)
+        if total * 1000 >= settings.PERFIL_LIMITE_LENTO_MS:
+            self._registrar_lenta(request, response, medicao, total)
+        if perfil is not None:
+            return self._resposta_perfil(perfil)
+        return response
+
+    @staticmethod
+    def _staff(request):
+        usuario = getattr(request, "user", None)
+        return bool(usuario and usuario.is_staff)
+
+    @staticmethod
+    def _perfil_solicitado(request):
+        if "_perfil" not in request.GET and "X-Perfil" not in request.headers:
+            return False
+        return PerfilMiddleware._staff(request)
+
+    @staticmethod
+    def _server_timing(medicao, total):
+        app = max(total - medicao.tempo_sql - medicao.tempo_template, 0)
+        consultas = len(medicao.consultas)
+        return ", ".join(
+            [
+                f'db;dur={medicao.tempo_sql * 1000:.1f};desc="{consultas} consultas"',
+                f"tpl;dur={medicao.tempo_template * 1000:.1f}",
+                f"app;dur={app * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+    @staticmethod
+    def _registrar_lenta(request, response, medicao, total):
+        digitais = Counter(normalizar_sql(sql) for sql in medicao.consultas)
+        logger.warning(
+            json.dumps(
+                {
+                    "metodo": request.method,
+                    "caminho": request.path,
+                    "status": response.status_code,
+                    "total_ms": round(total * 1000, 1),
+                    "db_ms": round(medicao.tempo_sql * 1000, 1),
+                    "tpl_ms": round(medicao.tempo_template * 1000, 1),
+                    "consultas": len(medicao.consultas),
+                    "sql": [
+                        {"vezes": vezes, "sql": sql}
+                        for sql, vezes in digitais.most_common()
+                    ],
+                },
+                ensure_ascii=False,
+            )
+        )
+
+    @staticmethod
+    def _resposta_perfil(perfil):
+        saida = io.StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(50)
+        return HttpResponse(saida.getvalue(), content_type="text/plain; charset=utf-8")
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_alter_servico_duracao_minutos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicoagendamento',
+            name='data_acao',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data da Ação'),
+        ),
+    ]
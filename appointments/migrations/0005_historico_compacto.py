@@ -0,0 +1,275 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+TIPOS_ACAO = {
+    "CRIADO": 1,
+    "STATUS_ALTERADO": 2,
+    "DADOS_ALTERADOS": 3,
+    "CANCELADO": 4,
+    "REAGENDADO": 5,
+}
+
+STATUS = {
+    "AGENDADO": 1,
+    "CONFIRMADO": 2,
+    "EM_ANDAMENTO": 3,
+    "CONCLUIDO": 4,
+    "CANCELADO": 5,
+    "NAO_COMPARECEU": 6,
+}
+
+# Textos padrão gravados até aqui (agora renderizados na exibição)
+DESCRICOES_STATUS = {
+    "AGENDADO": "Agendamento confirmado e agendado",
+    "CONFIRMADO": "Cliente confirmou o agendamento",
+    "EM_ANDAMENTO": "Atendimento iniciado",
+    "CONCLUIDO": "Atendimento finalizado com sucesso",
+    "CANCELADO": "Agendamento foi cancelado",
+    "NAO_COMPARECEU": "Cliente não compareceu ao agendamento",
+}
+
+ROTULOS_ACAO = {
+    "CRIADO": "Agendamento Criado",
+    "STATUS_ALTERADO": "Status Alterado",
+    "DADOS_ALTERADOS": "Dados Alterados",
+    "CANCELADO": "Cancelado",
+    "REAGENDADO": "Reagendado",
+}
+
+TAMANHO_LOTE = 1000
+
+
+def _descricao_padrao(evento):
+    if evento.tipo_acao == "CRIADO":
+        return (
+            f"Agendamento criado para {evento.agendamento.cliente.nome} "
+            f"com {evento.agendamento.profissional.nome}"
+        )
+    if evento.tipo_acao == "STATUS_ALTERADO" and evento.status_novo:
+        return DESCRICOES_STATUS.get(evento.status_novo)
+    return ROTULOS_ACAO.get(evento.tipo_acao)
+
+
+def compactar_historico(apps, schema_editor):
+    HistoricoAgendamento = apps.get_model("appointments", "HistoricoAgendamento")
+    Usuario = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+    # Modelos históricos não têm USERNAME_FIELD; o projeto usa o User padrão
+    usuarios = dict(Usuario.objects.values_list("username", "pk"))
+    campos = [
+        "tipo_acao_codigo",
+        "status_anterior_codigo",
+        "status_novo_codigo",
+        "usuario_ref",
+        "descricao_personalizada",
+        "observacoes",
+    ]
+
+    pendentes = []
+    eventos = HistoricoAgendamento.objects.select_related(
+        "agendamento__cliente", "agendamento__profissional"
+    ).order_by("pk")
+    for evento in eventos.iterator(chunk_size=TAMANHO_LOTE):
+        evento.tipo_acao_codigo = TIPOS_ACAO[evento.tipo_acao]
+        evento.status_anterior_codigo = STATUS.get(evento.status_anterior)
+        evento.status_novo_codigo = STATUS.get(evento.status_novo)
+
+        # O texto da criação traz os nomes da época: sempre preservado
+        if evento.tipo_acao == "CRIADO" or evento.descricao != _descricao_padrao(
+            evento
+        ):
+            evento.descricao_personalizada = evento.descricao
+
+        if evento.usuario and evento.usuario != "Sistema":
+            evento.usuario_ref_id = usuarios.get(evento.usuario)
+            if evento.usuario_ref_id is None:
+                # Nome sem usuário correspondente: preservado nas observações
+                evento.observacoes = "\n".join(
+                    filter(None, [evento.observacoes, f"Registrado por {evento.usuario}"])
+                )
+
+        pendentes.append(evento)
+        if len(pendentes) >= TAMANHO_LOTE:
+            HistoricoAgendamento.objects.bulk_update(pendentes, campos)
+            pendentes = []
+
+    if pendentes:
+        HistoricoAgendamento.objects.bulk_update(pendentes, campos)
+
+
+def expandir_historico(apps, schema_editor):
+    HistoricoAgendamento = apps.get_model("appointments", "HistoricoAgendamento")
+    tipos = {codigo: nome for nome, codigo in TIPOS_ACAO.items()}
+    status = {codigo: nome for nome, codigo in STATUS.items()}
+
+    pendentes = []
+    eventos = HistoricoAgendamento.objects.select_related(
+        "agendamento__cliente", "agendamento__profissional", "usuario_ref"
+    ).order_by("pk")
+    for evento in eventos.iterator(chunk_size=TAMANHO_LOTE):
+        evento.tipo_acao = tipos[evento.tipo_acao_codigo]
+        evento.status_anterior = status.get(evento.status_anterior_codigo)
+        evento.status_novo = status.get(evento.status_novo_codigo)
+        evento.descricao = evento.descricao_personalizada or _descricao_padrao(evento)
+        evento.usuario = (
+            evento.usuario_ref.username if evento.usuario_ref_id else "Sistema"
+        )
+        pendentes.append(evento)
+
+    HistoricoAgendamento.objects.bulk_update(
+        pendentes,
+        ["tipo_acao", "status_anterior", "status_novo", "descricao", "usuario"],
+        batch_size=TAMANHO_LOTE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("appointments", "0004_historico_data_acao_default"),
+    ]
+
+    operations = [
+        # 1. Colunas compactas ao lado das antigas
+        migrations.AddField(
+            model_name="historicoagendamento",
+            name="tipo_acao_codigo",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="historicoagendamento",
+            name="status_anterior_codigo",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="historicoagendamento",
+            name="status_novo_codigo",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="historicoagendamento",
+            name="usuario_ref",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicoagendamento",
+            name="descricao_personalizada",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="Só preenchida quando difere do texto padrão da ação",
+                verbose_name="Descrição Personalizada",
+            ),
+            preserve_default=False,
+        ),
+        # Colunas antigas anuláveis, para que a reversão consiga recriá-las
+        migrations.AlterField(
+            model_name="historicoagendamento",
+            name="tipo_acao",
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name="historicoagendamento",
+            name="descricao",
+            field=models.TextField(max_length=500, null=True),
+        ),
+        # 2. Conversão dos dados existentes
+        migrations.RunPython(compactar_historico, expandir_historico),
+        # 3. Remoção das colunas de texto
+        migrations.RemoveField(model_name="historicoagendamento", name="tipo_acao"),
+        migrations.RemoveField(model_name="historicoagendamento", name="descricao"),
+        migrations.RemoveField(
+            model_name="historicoagendamento", name="status_anterior"
+        ),
+        migrations.RemoveField(model_name="historicoagendamento", name="status_novo"),
+        migrations.RemoveField(model_name="historicoagendamento", name="usuario"),
+        # 4. Nomes definitivos
+        migrations.RenameField(
+            model_name="historicoagendamento",
+            old_name="tipo_acao_codigo",
+            new_name="tipo_acao",
+        ),
+        migrations.RenameField(
+            model_name="historicoagendamento",
+            old_name="status_anterior_codigo",
+            new_name="status_anterior",
+        ),
+        migrations.RenameField(
+            model_name="historicoagendamento",
+            old_name="status_novo_codigo",
+            new_name="status_novo",
+        ),
+        migrations.RenameField(
+            model_name="historicoagendamento",
+            old_name="usuario_ref",
+            new_name="usuario",
+        ),
+        migrations.AlterField(
+            model_name="historicoagendamento",
+            name="tipo_acao",
+            field=models.PositiveSmallIntegerField(
+                choices=[
+                    (1, "Agendamento Criado"),
+                    (2, "Status Alterado"),
+                    (3, "Dados Alterados"),
+                    (4, "Cancelado"),
+                    (5, "Reagendado"),
+                ],
+                verbose_name="Tipo de Ação",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historicoagendamento",
+            name="status_anterior",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                choices=[
+                    (1, "Agendado"),
+                    (2, "Confirmado"),
+                    (3, "Em Andamento"),
+                    (4, "Concluído"),
+                    (5, "Cancelado"),
+                    (6, "Não Compareceu"),
+                ],
+                null=True,
+                verbose_name="Status Anterior",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historicoagendamento",
+            name="status_novo",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                choices=[
+                    (1, "Agendado"),
+                    (2, "Confirmado"),
+                    (3, "Em Andamento"),
+                    (4, "Concluído"),
+                    (5, "Cancelado"),
+                    (6, "Não Compareceu"),
+                ],
+                null=True,
+                verbose_name="Status Novo",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historicoagendamento",
+            name="usuario",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Quem fez a alteração (vazio = Sistema)",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Usuário",
+            ),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0005_historico_compacto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendamentoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data_hora', models.DateTimeField(db_index=True, verbose_name='Data e Hora')),
+                ('status', models.CharField(choices=[('AGENDADO', 'Agendado'), ('CONFIRMADO', 'Confirmado'), ('EM_ANDAMENTO', 'Em Andamento'), ('CONCLUIDO', 'Concluído'), ('CANCELADO', 'Cancelado'), ('NAO_COMPARECEU', 'Não Compareceu')], max_length=20, verbose_name='Status')),
+                ('observacoes', models.TextField(blank=True, verbose_name='Observações')),
+                ('preco_final', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Preço Final')),
+                ('data_cadastro', models.DateTimeField(verbose_name='Data de Cadastro')),
+                ('data_atualizacao', models.DateTimeField(verbose_name='Data de Atualização')),
+                ('data_arquivamento', models.DateTimeField(auto_now_add=True, verbose_name='Data de Arquivamento')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.cliente', verbose_name='Cliente')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.profissional', verbose_name='Profissional')),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.servico', verbose_name='Serviço')),
+            ],
+            options={
+                'verbose_name': 'Agendamento Arquivado',
+                'verbose_name_plural': 'Agendamentos Arquivados',
+                'ordering': ['-data_hora'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoDiarioServico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de Atendimentos')),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.profissional', verbose_name='Profissional')),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.servico', verbose_name='Serviço')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Serviço',
+                'verbose_name_plural': 'Resumos Diários de Serviços',
+                'ordering': ['data'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HistoricoAgendamentoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo_acao', models.PositiveSmallIntegerField(choices=[(1, 'Agendamento Criado'), (2, 'Status Alterado'), (3, 'Dados Alterados'), (4, 'Cancelado'), (5, 'Reagendado')], verbose_name='Tipo de Ação')),
+                ('descricao_personalizada', models.TextField(blank=True, verbose_name='Descrição Personalizada')),
+                ('status_anterior', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Agendado'), (2, 'Confirmado'), (3, 'Em Andamento'), (4, 'Concluído'), (5, 'Cancelado'), (6, 'Não Compareceu')], null=True, verbose_name='Status Anterior')),
+                ('status_novo', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Agendado'), (2, 'Confirmado'), (3, 'Em Andamento'), (4, 'Concluído'), (5, 'Cancelado'), (6, 'Não Compareceu')], null=True, verbose_name='Status Novo')),
+                ('data_acao', models.DateTimeField(verbose_name='Data da Ação')),
+                ('observacoes', models.TextField(blank=True, verbose_name='Observações')),
+                ('agendamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico', to='appointments.agendamentoarquivado', verbose_name='Agendamento')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Histórico Arquivado',
+                'verbose_name_plural': 'Históricos Arquivados',
+                'ordering': ['-data_acao'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumodiarioservico',
+            constraint=models.UniqueConstraint(fields=('data', 'servico', 'profissional'), name='unique_resumo_diario_servico'),
+        ),
+    ]
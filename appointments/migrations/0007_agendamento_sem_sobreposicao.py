@@ -0,0 +1,52 @@
+from django.db import migrations
+
+NOME = "agendamento_sem_sobreposicao"
+
+# Mesmos status da unique_profissional_datetime_active
+STATUS_INATIVOS = ("CANCELADO", "NAO_COMPARECEU")
+
+# Todos os serviços duram 60 minutos (Servico.duracao_minutos). A faixa é
+# montada em UTC: timestamptz + interval não é IMMUTABLE e não pode ser usado
+# em índice, já timestamp (sem fuso) + interval pode.
+FAIXA = (
+    "tsrange(data_hora AT TIME ZONE 'UTC', "
+    "(data_hora AT TIME ZONE 'UTC') + interval '60 minutes')"
+)
+
+
+def criar_restricao(apps, schema_editor):
+    """Só no PostgreSQL: no SQLite a unique_profissional_datetime_active
+    continua sendo a única garantia no banco"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    tabela = apps.get_model("appointments", "Agendamento")._meta.db_table
+    inativos = ", ".join(f"'{status}'" for status in STATUS_INATIVOS)
+    # btree_gist: operador = do profissional_id dentro de um índice gist
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE {schema_editor.quote_name(tabela)} "
+        f"ADD CONSTRAINT {NOME} EXCLUDE USING gist "
+        f"(profissional_id WITH =, {FAIXA} WITH &&) "
+        f"WHERE (status NOT IN ({inativos}))"
+    )
+
+
+def remover_restricao(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    tabela = apps.get_model("appointments", "Agendamento")._meta.db_table
+    schema_editor.execute(
+        f"ALTER TABLE {schema_editor.quote_name(tabela)} "
+        f"DROP CONSTRAINT IF EXISTS {NOME}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0006_arquivamento"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_restricao, remover_restricao),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_agendamento_sem_sobreposicao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['data_atualizacao'], name='appointment_data_at_db408a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['ativo', 'data_atualizacao'], name='appointment_ativo_c96b8d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['data_atualizacao'], name='appointment_data_at_906be3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profissional',
+            index=models.Index(fields=['ativo', 'data_atualizacao'], name='appointment_ativo_342c38_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servico',
+            index=models.Index(fields=['ativo', 'data_atualizacao'], name='appointment_ativo_715d65_idx'),
+        ),
+    ]
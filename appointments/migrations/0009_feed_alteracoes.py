@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0008_indices_data_atualizacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroExcluido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=30, verbose_name='Model')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID do Registro')),
+                ('data_exclusao', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data de Exclusão')),
+            ],
+            options={
+                'verbose_name': 'Registro Excluído',
+                'verbose_name_plural': 'Registros Excluídos',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='agendamento',
+            name='appointment_data_at_db408a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cliente',
+            name='appointment_data_at_906be3_idx',
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='appointment_data_at_6f3e5d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='appointment_data_at_289989_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profissional',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='appointment_data_at_e5354e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servico',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='appointment_data_at_1d4e0a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroexcluido',
+            index=models.Index(fields=['modelo', 'data_exclusao', 'objeto_id'], name='appointment_modelo_ce177c_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_feed_alteracoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoSaida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destino', models.CharField(max_length=50, verbose_name='Destino')),
+                ('tipo', models.CharField(max_length=40, verbose_name='Tipo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID do Agendamento')),
+                ('dados', models.JSONField(default=dict, verbose_name='Dados')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Pendente'), (2, 'Entregue'), (3, 'Falhou')], default=1, verbose_name='Status')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima Tentativa')),
+                ('ultimo_erro', models.CharField(blank=True, max_length=200, verbose_name='Último Erro')),
+                ('data_criacao', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data de Criação')),
+                ('data_entrega', models.DateTimeField(blank=True, null=True, verbose_name='Data de Entrega')),
+            ],
+            options={
+                'verbose_name': 'Evento de Saída',
+                'verbose_name_plural': 'Eventos de Saída',
+                'indexes': [models.Index(fields=['status', 'destino', 'proxima_tentativa'], name='appointment_status_406cf2_idx')],
+            },
+        ),
+    ]
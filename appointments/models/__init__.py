@@ -1,9 +1,16 @@
 # Imports centralizados para manter compatibilidade
 from .agendamento import Agendamento
+from .arquivo import (
+    AgendamentoArquivado,
+    HistoricoAgendamentoArquivado,
+    ResumoDiarioServico,
+)
 from .cliente import Cliente
 from .historico import HistoricoAgendamento
+from .integracao import EventoSaida
 from .profissional import Profissional
 from .servico import Servico
+from .sincronizacao import RegistroExcluido
 
 __all__ = [
     "Cliente",
@@ -11,4 +18,9 @@ __all__ = [
     "Profissional",
     "Agendamento",
     "HistoricoAgendamento",
+    "AgendamentoArquivado",
+    "HistoricoAgendamentoArquivado",
+    "ResumoDiarioServico",
+    "RegistroExcluido",
+    "EventoSaida",
 ]
@@ -55,9 +55,13 @@ class Agendamento(models.Model):
             models.Index(fields=["status", "data_hora"]),
             # Índice composto para relatórios de serviços concluídos
             models.Index(fields=["status", "data_hora", "servico"]),
+            # Última alteração (ETag das páginas) e cursor do feed de alterações
+            models.Index(fields=["data_atualizacao", "id"]),
         ]
         constraints = [
             # Evita agendamentos duplicados para o mesmo profissional no mesmo horário
+            # (no PostgreSQL a agendamento_sem_sobreposicao, da migração 0007,
+            # também recusa horários sobrepostos)
             models.UniqueConstraint(
                 fields=["profissional", "data_hora"],
                 condition=~models.Q(status__in=["CANCELADO", "NAO_COMPARECEU"]),
@@ -66,18 +70,27 @@ class Agendamento(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.cliente.nome} - {self.servico.nome} - {self.data_hora.strftime('%d/%m/%Y %H:%M')}"
+        return f"{self.cliente.nome} - {self._get_servico().nome} - {self.data_hora.strftime('%d/%m/%Y %H:%M')}"
 
     def save(self, *args, **kwargs):
         # TODO: Talvez remover esse campo preco_final futuramente
         # Se preço final não foi definido, usa o preço do serviço
         if self.preco_final is None:
-            self.preco_final = self.servico.preco
+            self.preco_final = self._get_servico().preco
         super().save(*args, **kwargs)
 
+    def _get_servico(self):
+        """Serviço já carregado ou lido do cache de referência (sem nova consulta)"""
+        if Agendamento.servico.is_cached(self):
+            return self.servico
+
+        from ..services.referencia_service import ReferenciaService
+
+        return ReferenciaService.servico(self.servico_id) or self.servico
+
     @property
     def data_hora_fim(self):
         """Calcula o horário de fim baseado na duração do serviço"""
         from datetime import timedelta
 
-        return self.data_hora + timedelta(minutes=self.servico.duracao_minutos)
+        return self.data_hora + timedelta(minutes=self._get_servico().duracao_minutos)
@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.db import models
+
+from .agendamento import Agendamento
+from .historico import HistoricoAgendamento
+
+
+class AgendamentoArquivado(models.Model):
+    """Agendamento finalizado movido da tabela principal pelo arquivamento
+
+    Mantém o mesmo ID do agendamento original e só o índice de data, já que
+    as consultas do dia a dia não passam por aqui.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(
+        "Cliente", on_delete=models.CASCADE, related_name="+", verbose_name="Cliente"
+    )
+    profissional = models.ForeignKey(
+        "Profissional",
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Profissional",
+    )
+    servico = models.ForeignKey(
+        "Servico", on_delete=models.CASCADE, related_name="+", verbose_name="Serviço"
+    )
+
+    data_hora = models.DateTimeField("Data e Hora", db_index=True)
+    status = models.CharField(
+        "Status", max_length=20, choices=Agendamento.STATUS_CHOICES
+    )
+    observacoes = models.TextField("Observações", blank=True)
+    preco_final = models.DecimalField(
+        "Preço Final", max_digits=8, decimal_places=2, null=True, blank=True
+    )
+
+    data_cadastro = models.DateTimeField("Data de Cadastro")
+    data_atualizacao = models.DateTimeField("Data de Atualização")
+    data_arquivamento = models.DateTimeField("Data de Arquivamento", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Agendamento Arquivado"
+        verbose_name_plural = "Agendamentos Arquivados"
+        ordering = ["-data_hora"]
+
+    def __str__(self):
+        return f"{self.cliente.nome} - {self.servico.nome} - {self.data_hora.strftime('%d/%m/%Y %H:%M')}"
+
+
+class HistoricoAgendamentoArquivado(models.Model):
+    """Histórico dos agendamentos arquivados (mesmo formato compacto)"""
+
+    id = models.BigIntegerField(primary_key=True)
+    agendamento = models.ForeignKey(
+        AgendamentoArquivado,
+        on_delete=models.CASCADE,
+        related_name="historico",
+        verbose_name="Agendamento",
+    )
+    tipo_acao = models.PositiveSmallIntegerField(
+        "Tipo de Ação", choices=HistoricoAgendamento.TipoAcao.choices
+    )
+    descricao_personalizada = models.TextField("Descrição Personalizada", blank=True)
+    status_anterior = models.PositiveSmallIntegerField(
+        "Status Anterior",
+        choices=HistoricoAgendamento.Status.choices,
+        blank=True,
+        null=True,
+    )
+    status_novo = models.PositiveSmallIntegerField(
+        "Status Novo",
+        choices=HistoricoAgendamento.Status.choices,
+        blank=True,
+        null=True,
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        blank=True,
+        null=True,
+        verbose_name="Usuário",
+    )
+    data_acao = models.DateTimeField("Data da Ação")
+    observacoes = models.TextField("Observações", blank=True)
+
+    class Meta:
+        verbose_name = "Histórico Arquivado"
+        verbose_name_plural = "Históricos Arquivados"
+        ordering = ["-data_acao"]
+
+
+class ResumoDiarioServico(models.Model):
+    """Totais diários dos atendimentos concluídos que já foram arquivados
+
+    Os relatórios somam estes totais aos agendamentos da tabela principal,
+    então períodos que cruzam a data de corte continuam completos.
+    """
+
+    data = models.DateField("Data")
+    servico = models.ForeignKey(
+        "Servico", on_delete=models.CASCADE, related_name="+", verbose_name="Serviço"
+    )
+    profissional = models.ForeignKey(
+        "Profissional",
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Profissional",
+    )
+    total = models.PositiveIntegerField("Total de Atendimentos", default=0)
+    receita = models.DecimalField(
+        "Receita", max_digits=12, decimal_places=2, default=0
+    )
+
+    class Meta:
+        verbose_name = "Resumo Diário de Serviço"
+        verbose_name_plural = "Resumos Diários de Serviços"
+        ordering = ["data"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["data", "servico", "profissional"],
+                name="unique_resumo_diario_servico",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} - {self.servico.nome} ({self.total})"
@@ -24,6 +24,11 @@ class Cliente(models.Model):
             models.Index(fields=["nome"]),
             models.Index(fields=["telefone"]),
             models.Index(fields=["ativo"]),
+            # Versão da lista (ativos): MAX/COUNT só no índice
+            models.Index(fields=["ativo", "data_atualizacao"]),
+            # Última alteração de qualquer cliente (ETag da lista de agendamentos)
+            # e cursor do feed de alterações
+            models.Index(fields=["data_atualizacao", "id"]),
         ]
 
     def __str__(self):
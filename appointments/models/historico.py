@@ -1,8 +1,42 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+# Texto exibido para cada novo status (renderizado na exibição, não gravado)
+DESCRICOES_STATUS = {
+    "AGENDADO": "Agendamento confirmado e agendado",
+    "CONFIRMADO": "Cliente confirmou o agendamento",
+    "EM_ANDAMENTO": "Atendimento iniciado",
+    "CONCLUIDO": "Atendimento finalizado com sucesso",
+    "CANCELADO": "Agendamento foi cancelado",
+    "NAO_COMPARECEU": "Cliente não compareceu ao agendamento",
+}
 
 
 class HistoricoAgendamento(models.Model):
-    """Model para registrar histórico de mudanças nos agendamentos"""
+    """Model para registrar histórico de mudanças nos agendamentos
+
+    Armazenamento compacto: ação e status como inteiros pequenos, usuário
+    como FK (nulo = "Sistema") e descrição renderizada na exibição; só textos
+    fora do padrão são gravados em descricao_personalizada. A criação grava
+    sempre o texto com os nomes da época (descricao_criacao).
+    """
+
+    class TipoAcao(models.IntegerChoices):
+        CRIADO = 1, "Agendamento Criado"
+        STATUS_ALTERADO = 2, "Status Alterado"
+        DADOS_ALTERADOS = 3, "Dados Alterados"
+        CANCELADO = 4, "Cancelado"
+        REAGENDADO = 5, "Reagendado"
+
+    class Status(models.IntegerChoices):
+        # Mesmos nomes de Agendamento.STATUS_CHOICES
+        AGENDADO = 1, "Agendado"
+        CONFIRMADO = 2, "Confirmado"
+        EM_ANDAMENTO = 3, "Em Andamento"
+        CONCLUIDO = 4, "Concluído"
+        CANCELADO = 5, "Cancelado"
+        NAO_COMPARECEU = 6, "Não Compareceu"
 
     agendamento = models.ForeignKey(
         "Agendamento",
@@ -11,55 +45,36 @@ class HistoricoAgendamento(models.Model):
         verbose_name="Agendamento",
     )
 
-    TIPO_ACAO_CHOICES = [
-        ("CRIADO", "Agendamento Criado"),
-        ("STATUS_ALTERADO", "Status Alterado"),
-        ("DADOS_ALTERADOS", "Dados Alterados"),
-        ("CANCELADO", "Cancelado"),
-        ("REAGENDADO", "Reagendado"),
-    ]
-
-    tipo_acao = models.CharField(
-        "Tipo de Ação", max_length=20, choices=TIPO_ACAO_CHOICES
+    tipo_acao = models.PositiveSmallIntegerField(
+        "Tipo de Ação", choices=TipoAcao.choices
     )
 
-    descricao = models.TextField("Descrição", max_length=500)
-
-    status_anterior = models.CharField(
-        "Status Anterior",
-        max_length=20,
-        choices=[
-            ("AGENDADO", "Agendado"),
-            ("CONFIRMADO", "Confirmado"),
-            ("EM_ANDAMENTO", "Em Andamento"),
-            ("CONCLUIDO", "Concluído"),
-            ("CANCELADO", "Cancelado"),
-            ("NAO_COMPARECEU", "Não Compareceu"),
-        ],
+    descricao_personalizada = models.TextField(
+        "Descrição Personalizada",
         blank=True,
-        null=True,
+        help_text="Só preenchida quando difere do texto padrão da ação",
     )
 
-    status_novo = models.CharField(
-        "Status Novo",
-        max_length=20,
-        choices=[
-            ("AGENDADO", "Agendado"),
-            ("CONFIRMADO", "Confirmado"),
-            ("EM_ANDAMENTO", "Em Andamento"),
-            ("CONCLUIDO", "Concluído"),
-            ("CANCELADO", "Cancelado"),
-            ("NAO_COMPARECEU", "Não Compareceu"),
-        ],
-        blank=True,
-        null=True,
+    status_anterior = models.PositiveSmallIntegerField(
+        "Status Anterior", choices=Status.choices, blank=True, null=True
+    )
+
+    status_novo = models.PositiveSmallIntegerField(
+        "Status Novo", choices=Status.choices, blank=True, null=True
     )
 
-    usuario = models.CharField(
-        "Usuário", max_length=100, default="Sistema", help_text="Quem fez a alteração"
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        blank=True,
+        null=True,
+        verbose_name="Usuário",
+        help_text="Quem fez a alteração (vazio = Sistema)",
     )
 
-    data_acao = models.DateTimeField("Data da Ação", auto_now_add=True)
+    # Preenchida no registro do evento (e não no INSERT, que pode ser adiado)
+    data_acao = models.DateTimeField("Data da Ação", default=timezone.now)
 
     observacoes = models.TextField("Observações", blank=True)
 
@@ -73,3 +88,45 @@ class HistoricoAgendamento(models.Model):
 
     def __str__(self):
         return f"{self.agendamento} - {self.get_tipo_acao_display()}"
+
+    @classmethod
+    def codigo_status(cls, status):
+        """Código inteiro de um status de Agendamento (ex.: "CONCLUIDO" → 4)"""
+        return cls.Status[status].value if status else None
+
+    @property
+    def acao(self):
+        """Nome da ação (ex.: "STATUS_ALTERADO"), para comparação nos templates"""
+        return self.TipoAcao(self.tipo_acao).name
+
+    @property
+    def status_anterior_nome(self):
+        return self.Status(self.status_anterior).name if self.status_anterior else None
+
+    @property
+    def status_novo_nome(self):
+        return self.Status(self.status_novo).name if self.status_novo else None
+
+    @staticmethod
+    def descricao_criacao(agendamento):
+        """Texto da criação, gravado no registro: renomear o cliente ou o
+        profissional depois não reescreve o histórico"""
+        return (
+            f"Agendamento criado para {agendamento.cliente.nome} "
+            f"com {agendamento.profissional.nome}"
+        )
+
+    @property
+    def descricao_padrao(self):
+        """Texto padrão da ação (não depende de dados que podem mudar)"""
+        if self.tipo_acao == self.TipoAcao.STATUS_ALTERADO and self.status_novo:
+            return DESCRICOES_STATUS[self.status_novo_nome]
+        return self.get_tipo_acao_display()
+
+    @property
+    def descricao(self):
+        return self.descricao_personalizada or self.descricao_padrao
+
+    @property
+    def nome_usuario(self):
+        return self.usuario.get_username() if self.usuario_id else "Sistema"
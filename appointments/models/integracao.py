@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+
+class EventoSaida(models.Model):
+    """Evento de agendamento aguardando entrega a um webhook (outbox)
+
+    Gravado na mesma transação da alteração, uma linha por destino de
+    settings.WEBHOOKS; o comando despachar_webhooks entrega e marca.
+    """
+
+    class Status(models.IntegerChoices):
+        PENDENTE = 1, "Pendente"
+        ENTREGUE = 2, "Entregue"
+        FALHOU = 3, "Falhou"
+
+    destino = models.CharField("Destino", max_length=50)
+    tipo = models.CharField("Tipo", max_length=40)
+    # Sem FK: o evento sobrevive à exclusão ou ao arquivamento do agendamento
+    objeto_id = models.BigIntegerField("ID do Agendamento")
+    dados = models.JSONField("Dados", default=dict)
+    status = models.PositiveSmallIntegerField(
+        "Status", choices=Status.choices, default=Status.PENDENTE
+    )
+    tentativas = models.PositiveSmallIntegerField("Tentativas", default=0)
+    proxima_tentativa = models.DateTimeField("Próxima Tentativa", default=timezone.now)
+    ultimo_erro = models.CharField("Último Erro", max_length=200, blank=True)
+    data_criacao = models.DateTimeField("Data de Criação", default=timezone.now)
+    data_entrega = models.DateTimeField("Data de Entrega", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Evento de Saída"
+        verbose_name_plural = "Eventos de Saída"
+        indexes = [
+            # Fila do despachante: pendentes vencidos de cada destino
+            models.Index(fields=["status", "destino", "proxima_tentativa"]),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.objeto_id} → {self.destino}"
@@ -36,6 +36,10 @@ class Profissional(models.Model):
         indexes = [
             models.Index(fields=["nome"]),
             models.Index(fields=["ativo"]),
+            # Versão da lista (ativos): MAX/COUNT só no índice
+            models.Index(fields=["ativo", "data_atualizacao"]),
+            # Cursor do feed de alterações
+            models.Index(fields=["data_atualizacao", "id"]),
         ]
 
     def __str__(self):
@@ -47,6 +47,10 @@ class Servico(models.Model):
             models.Index(fields=["categoria"]),
             models.Index(fields=["ativo"]),
             models.Index(fields=["preco"]),
+            # Versão da lista (ativos): MAX/COUNT só no índice
+            models.Index(fields=["ativo", "data_atualizacao"]),
+            # Cursor do feed de alterações
+            models.Index(fields=["data_atualizacao", "id"]),
         ]
 
     def __str__(self):
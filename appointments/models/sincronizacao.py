@@ -0,0 +1,26 @@
+from django.db import models
+from django.utils import timezone
+
+
+class RegistroExcluido(models.Model):
+    """Lápide de um registro excluído, lida pelo feed de alterações
+
+    Guarda só o model e o ID; as lápides mais antigas que
+    settings.FEED_RETENCAO_DIAS são removidas por limpar_exclusoes, que deixa
+    por model uma marca (objeto_id=0) com a última lápide removida.
+    """
+
+    modelo = models.CharField("Model", max_length=30)
+    objeto_id = models.BigIntegerField("ID do Registro")
+    data_exclusao = models.DateTimeField("Data de Exclusão", default=timezone.now)
+
+    class Meta:
+        verbose_name = "Registro Excluído"
+        verbose_name_plural = "Registros Excluídos"
+        indexes = [
+            # Cursor do feed: (data_exclusao, objeto_id) dentro de cada model
+            models.Index(fields=["modelo", "data_exclusao", "objeto_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} (excluído)"
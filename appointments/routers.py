@@ -0,0 +1,125 @@
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .saloes import alias_do_salao, salao_atual, saloes
+
+PRIMARIO = "default"
+
+# Alias das leituras do trecho atual (None: primário)
+_alias_leitura = ContextVar("alias_leitura", default=None)
+# Estado da requisição atual (None fora do LeituraReplicaMiddleware)
+_requisicao = ContextVar("roteamento_requisicao", default=None)
+
+CHAVE_SESSAO = "_ultima_escrita"
+
+
+class EstadoRequisicao:
+    """Se a requisição fica no primário (escrita recente) e se escreveu"""
+
+    def __init__(self, fixar_no_primario):
+        self.fixar_no_primario = fixar_no_primario
+        self.escreveu = False
+
+
+class LeituraEscritaRouter:
+    """Escritas sempre no primário; leituras vão para o alias de leitura
+    (settings.DB_ALIAS_LEITURA) só dentro de usar_leitura()
+
+    Com um salão ativo (appointments.saloes) leituras e escritas vão para o
+    banco do salão; a réplica de leitura vale só para o banco default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if salao_atual() is not None:
+            return alias_do_salao(salao_atual())
+        return _alias_leitura.get()
+
+    def db_for_write(self, model, **hints):
+        estado = _requisicao.get()
+        if estado is not None:
+            estado.escreveu = True
+        return banco_escrita()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e primário têm os mesmos dados; entre salões, nunca
+        bancos = {obj1._state.db, obj2._state.db} - {None}
+        return len(bancos) <= 1 or bancos <= {PRIMARIO, settings.DB_ALIAS_LEITURA}
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARIO or db in {alias_do_salao(slug) for slug in saloes()}
+
+
+def banco_escrita():
+    """Alias que recebe as escritas agora: o do salão ativo ou o primário
+
+    Use em transaction.atomic(using=...) e on_commit(..., using=...).
+    """
+    return alias_do_salao(salao_atual())
+
+
+def alias_leitura():
+    """Alias que as leituras usariam agora (None: primário)"""
+    return _alias_leitura.get()
+
+
+@contextmanager
+def usar_leitura():
+    """Ler do alias de leitura, salvo se a sessão escreveu há pouco (ler o
+    que acabou de gravar) ou se não há réplica configurada"""
+    estado = _requisicao.get()
+    alias = getattr(settings, "DB_ALIAS_LEITURA", None)
+    if estado is not None and estado.fixar_no_primario:
+        alias = None
+    token = _alias_leitura.set(alias)
+    try:
+        yield
+    finally:
+        _alias_leitura.reset(token)
+
+
+@contextmanager
+def usar_primario():
+    """Ler do primário mesmo dentro de usar_leitura() (ex.: ao preencher
+    caches compartilhados, que não podem guardar dados atrasados)"""
+    token = _alias_leitura.set(None)
+    try:
+        yield
+    finally:
+        _alias_leitura.reset(token)
+
+
+def ler_da_replica(view):
+    """Decorator de views só de leitura (relatórios, listas, dashboard)
+
+    TemplateResponses são renderizadas aqui dentro: os querysets das
+    ListViews só são avaliados no template.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with usar_leitura():
+            response = view(*args, **kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+    return wrapper
+
+
+def iniciar_requisicao(request):
+    """Fixar no primário as sessões que escreveram nos últimos
+    DB_LEITURA_FIXAR_S segundos"""
+    ultima = getattr(request, "session", {}).get(CHAVE_SESSAO)
+    recente = ultima is not None and time.time() - ultima < settings.DB_LEITURA_FIXAR_S
+    return _requisicao.set(EstadoRequisicao(recente))
+
+
+def encerrar_requisicao(request, token):
+    estado = _requisicao.get()
+    _requisicao.reset(token)
+    if estado.escreveu and hasattr(request, "session"):
+        request.session[CHAVE_SESSAO] = time.time()
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Salão (unidade) atendido no contexto atual (None: banco default)
+_salao = ContextVar("salao", default=None)
+
+
+def saloes():
+    """Slugs configurados em settings.SALOES"""
+    return list(getattr(settings, "SALOES", []))
+
+
+def alias_do_salao(slug):
+    """Alias do banco de um salão (o default quando slug é None)"""
+    return f"salao_{slug}" if slug else "default"
+
+
+def salao_atual():
+    return _salao.get()
+
+
+@contextmanager
+def ativar_salao(slug):
+    """Direcionar consultas, transações e cache para o banco do salão"""
+    if slug is not None and slug not in saloes():
+        raise ValueError(f"Salão desconhecido: {slug}")
+    token = _salao.set(slug)
+    try:
+        yield
+    finally:
+        _salao.reset(token)
+
+
+def resolver_salao(request):
+    """Salão de uma requisição e o prefixo de caminho que o identificou
+
+    SALAO_RESOLUCAO="host": primeiro rótulo do host (centro.exemplo.com);
+    "caminho": primeiro segmento (/centro/agendamentos/). Sem salão
+    correspondente a requisição usa o banco default.
+    """
+    if getattr(settings, "SALAO_RESOLUCAO", "host") == "caminho":
+        segmento = request.path_info.lstrip("/").split("/", 1)[0]
+        if segmento in saloes():
+            return segmento, f"/{segmento}"
+        return None, ""
+    rotulo = request.get_host().split(":", 1)[0].split(".", 1)[0]
+    return (rotulo if rotulo in saloes() else None), ""
+
+
+def chave_cache(key, key_prefix, version):
+    """KEY_FUNCTION do cache: separa as chaves de cada salão"""
+    return f"{key_prefix}:{version}:{_salao.get() or '-'}:{key}"
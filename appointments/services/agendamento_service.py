@@ -1,50 +1,75 @@
+from django.db import transaction
 from django.utils import timezone
 
 from ..models import Agendamento, HistoricoAgendamento
+from ..routers import banco_escrita
+from ..utils import filtro_periodo
+from .auditoria_service import AuditoriaService
+from .compatibilidade_service import CompatibilidadeService
+from .metricas_service import MetricasService
+from .rastreamento_service import RastreamentoService
+from .transicao_service import TransicaoService
+from .webhook_service import WebhookService
 
 
 class AgendamentoService:
     """Service para lógica de negócio relacionada a agendamentos"""
 
     @staticmethod
+    @RastreamentoService.rastrear()
     def criar_agendamento(
         cliente, profissional, servico, data_hora, observacoes=None, preco_final=None
     ):
         """Criar um novo agendamento com validações"""
 
         # Validações de negócio
+        if not CompatibilidadeService.profissional_realiza(profissional.pk, servico.pk):
+            AgendamentoService._recusar("servico_incompativel")
+            raise ValueError(f"{profissional.nome} não realiza o serviço {servico.nome}")
+
         if not AgendamentoService.profissional_disponivel(
             profissional, data_hora, servico
         ):
+            AgendamentoService._recusar("indisponivel")
             raise ValueError(
                 "Profissional não está disponível neste horário ou há conflito com outro agendamento"
             )
 
         if data_hora <= timezone.now():
+            AgendamentoService._recusar("data_passada")
             raise ValueError("Não é possível agendar para data/hora passada")
 
-        # Criar agendamento
-        agendamento = Agendamento.objects.create(
-            cliente=cliente,
-            profissional=profissional,
-            servico=servico,
-            data_hora=data_hora,
-            observacoes=observacoes or "",
-            preco_final=preco_final,
-        )
-
-        # Criar histórico
-        HistoricoAgendamento.objects.create(
-            agendamento=agendamento,
-            tipo_acao="CRIADO",
-            descricao=f"Agendamento criado para {cliente.nome} com {profissional.nome}",
-            status_novo=agendamento.status,
-            usuario="Sistema",
-        )
+        with transaction.atomic(using=banco_escrita()):
+            # Criar agendamento
+            agendamento = Agendamento.objects.create(
+                cliente=cliente,
+                profissional=profissional,
+                servico=servico,
+                data_hora=data_hora,
+                observacoes=observacoes or "",
+                preco_final=preco_final,
+            )
+
+            # Criar histórico
+            AuditoriaService.registrar(
+                agendamento.pk,
+                HistoricoAgendamento.TipoAcao.CRIADO,
+                status_novo=agendamento.status,
+                descricao=HistoricoAgendamento.descricao_criacao(agendamento),
+            )
+            WebhookService.publicar(
+                "agendamento.criado",
+                [(agendamento.pk, WebhookService.dados_agendamento(agendamento))],
+            )
 
         return agendamento
 
     @staticmethod
+    def _recusar(motivo):
+        MetricasService.incrementar("salao_agendamentos_recusados_total", motivo=motivo)
+
+    @staticmethod
+    @RastreamentoService.rastrear()
     def profissional_disponivel(profissional, data_hora, servico=None):
         """Verificar se profissional está disponível (todos os serviços têm 60min)"""
         from datetime import timedelta
@@ -75,55 +100,19 @@ class AgendamentoService:
         return not conflito
 
     @staticmethod
-    def alterar_status(agendamento, novo_status, usuario="Sistema"):
+    @RastreamentoService.rastrear()
+    def alterar_status(agendamento, novo_status, usuario=None):
         """Alterar status do agendamento com validações"""
+        return TransicaoService.transicionar(agendamento, novo_status, usuario)
 
-        status_anterior = agendamento.status
-
-        # Validações específicas
-        if (
-            novo_status == "EM_ANDAMENTO"
-            and agendamento.data_hora.date() < timezone.now().date()
-        ):
-            raise ValueError(
-                'Não é possível marcar como "Em Andamento" agendamentos de datas passadas'
-            )
-
-        if novo_status == "CONCLUIDO" and status_anterior not in [
-            "CONFIRMADO",
-            "EM_ANDAMENTO",
-        ]:
-            raise ValueError(
-                "Só é possível concluir agendamentos confirmados ou em andamento"
-            )
-
-        agendamento.status = novo_status
-        agendamento.save()
-
-        # Criar histórico
-        descricoes = {
-            "AGENDADO": "Agendamento confirmado e agendado",
-            "CONFIRMADO": "Cliente confirmou o agendamento",
-            "EM_ANDAMENTO": "Atendimento iniciado",
-            "CONCLUIDO": "Atendimento finalizado com sucesso",
-            "CANCELADO": "Agendamento foi cancelado",
-            "NAO_COMPARECEU": "Cliente não compareceu ao agendamento",
-        }
-
-        HistoricoAgendamento.objects.create(
-            agendamento=agendamento,
-            tipo_acao="STATUS_ALTERADO",
-            descricao=descricoes.get(
-                novo_status, f"Status alterado para {agendamento.get_status_display()}"
-            ),
-            status_anterior=status_anterior,
-            status_novo=novo_status,
-            usuario=usuario,
-        )
-
-        return agendamento
+    @staticmethod
+    @RastreamentoService.rastrear()
+    def alterar_status_em_lote(agendamentos, novo_status, usuario=None):
+        """Alterar o status de vários agendamentos; retorna os IDs alterados"""
+        return TransicaoService.transicionar_em_lote(agendamentos, novo_status, usuario)
 
     @staticmethod
+    @RastreamentoService.rastrear()
     def get_horarios_disponiveis(profissional, data):
         """Obter horários disponíveis para um profissional em uma data (todos os serviços têm 60min)"""
 
@@ -148,7 +137,7 @@ class AgendamentoService:
         # Buscar agendamentos já marcados nesta data (simples: só horário exato)
         agendamentos_ocupados = Agendamento.objects.filter(
             profissional=profissional,
-            data_hora__date=data,
+            **filtro_periodo(data, data),
             status__in=["AGENDADO", "CONFIRMADO", "EM_ANDAMENTO"],
         ).values_list("data_hora__time", flat=True)
 
@@ -0,0 +1,201 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from ..models import (
+    Agendamento,
+    AgendamentoArquivado,
+    HistoricoAgendamento,
+    HistoricoAgendamentoArquivado,
+    ResumoDiarioServico,
+)
+from ..routers import banco_escrita
+from ..utils import (
+    filtro_periodo,
+    get_inicio_do_dia,
+    get_local_today,
+    subtrair_meses,
+)
+
+
+class ArquivoService:
+    """Arquivamento de agendamentos finalizados e leitura dos totais arquivados"""
+
+    STATUS_FINALIZADOS = ("CONCLUIDO", "CANCELADO", "NAO_COMPARECEU")
+
+    @staticmethod
+    def data_corte(meses=None):
+        """Agendamentos antes desta data (local) podem ser arquivados"""
+        if meses is None:
+            meses = settings.ARQUIVO_MESES
+        return subtrair_meses(get_local_today(), meses)
+
+    @staticmethod
+    def candidatos(data_corte):
+        """Agendamentos finalizados anteriores à data de corte"""
+        return Agendamento.objects.filter(
+            status__in=ArquivoService.STATUS_FINALIZADOS,
+            data_hora__lt=get_inicio_do_dia(data_corte),
+        )
+
+    @staticmethod
+    def arquivar_lote(data_corte, tamanho=500):
+        """Mover um lote para as tabelas de arquivo; retorna quantos foram movidos
+
+        Cada lote é uma transação: cópia, resumo diário e exclusão acontecem
+        juntos, então interromper o processo nunca deixa um lote pela metade
+        e basta rodar de novo para continuar de onde parou.
+        """
+        with transaction.atomic(using=banco_escrita()):
+            agendamentos = list(
+                ArquivoService.candidatos(data_corte)
+                .select_for_update()
+                .order_by("pk")[:tamanho]
+            )
+            if not agendamentos:
+                return 0
+            ids = [agendamento.pk for agendamento in agendamentos]
+
+            AgendamentoArquivado.objects.bulk_create(
+                [
+                    AgendamentoArquivado(
+                        id=agendamento.pk,
+                        cliente_id=agendamento.cliente_id,
+                        profissional_id=agendamento.profissional_id,
+                        servico_id=agendamento.servico_id,
+                        data_hora=agendamento.data_hora,
+                        status=agendamento.status,
+                        observacoes=agendamento.observacoes,
+                        preco_final=agendamento.preco_final,
+                        data_cadastro=agendamento.data_cadastro,
+                        data_atualizacao=agendamento.data_atualizacao,
+                    )
+                    for agendamento in agendamentos
+                ]
+            )
+
+            historico = HistoricoAgendamento.objects.filter(agendamento_id__in=ids)
+            HistoricoAgendamentoArquivado.objects.bulk_create(
+                [
+                    HistoricoAgendamentoArquivado(
+                        id=evento.pk,
+                        agendamento_id=evento.agendamento_id,
+                        tipo_acao=evento.tipo_acao,
+                        descricao_personalizada=evento.descricao_personalizada,
+                        status_anterior=evento.status_anterior,
+                        status_novo=evento.status_novo,
+                        usuario_id=evento.usuario_id,
+                        data_acao=evento.data_acao,
+                        observacoes=evento.observacoes,
+                    )
+                    for evento in historico
+                ],
+                batch_size=tamanho,
+            )
+
+            ArquivoService._acumular_resumo(
+                [a for a in agendamentos if a.status == "CONCLUIDO"]
+            )
+
+            historico.delete()
+            Agendamento.objects.filter(pk__in=ids).delete()
+
+        return len(agendamentos)
+
+    @staticmethod
+    def _acumular_resumo(concluidos):
+        """Somar os atendimentos concluídos do lote aos resumos diários"""
+        totais = {}
+        for agendamento in concluidos:
+            chave = (
+                timezone.localtime(agendamento.data_hora).date(),
+                agendamento.servico_id,
+                agendamento.profissional_id,
+            )
+            total, receita = totais.get(chave, (0, Decimal("0")))
+            totais[chave] = (total + 1, receita + (agendamento.preco_final or 0))
+        if not totais:
+            return
+
+        existentes = {
+            (r.data, r.servico_id, r.profissional_id): r
+            for r in ResumoDiarioServico.objects.filter(
+                data__in={chave[0] for chave in totais}
+            )
+        }
+        novos = []
+        for (data, servico_id, profissional_id), (total, receita) in totais.items():
+            resumo = existentes.get((data, servico_id, profissional_id))
+            if resumo is None:
+                novos.append(
+                    ResumoDiarioServico(
+                        data=data,
+                        servico_id=servico_id,
+                        profissional_id=profissional_id,
+                        total=total,
+                        receita=receita,
+                    )
+                )
+            else:
+                resumo.total += total
+                resumo.receita += receita
+
+        ResumoDiarioServico.objects.bulk_update(
+            [r for chave, r in existentes.items() if chave in totais],
+            ["total", "receita"],
+        )
+        ResumoDiarioServico.objects.bulk_create(novos)
+
+    @staticmethod
+    def resumo_periodo(data_inicio, data_fim, profissional_id=None):
+        """Totais arquivados do período, uma linha por dia/serviço/profissional"""
+        resumos = ResumoDiarioServico.objects.filter(
+            data__gte=data_inicio, data__lte=data_fim
+        )
+        if profissional_id:
+            resumos = resumos.filter(profissional_id=profissional_id)
+        return list(
+            resumos.values(
+                "data",
+                "servico__nome",
+                "servico__categoria",
+                "profissional__nome",
+                "total",
+                "receita",
+            )
+        )
+
+    @staticmethod
+    def contagens_periodo(data_inicio, data_fim, profissional_id=None):
+        """Totais dos agendamentos arquivados do período, por status (o
+        resumo diário só guarda os concluídos)"""
+        arquivados = AgendamentoArquivado.objects.filter(
+            **filtro_periodo(data_inicio, data_fim)
+        )
+        if profissional_id:
+            arquivados = arquivados.filter(profissional_id=profissional_id)
+        return arquivados.aggregate(
+            total=Count("id"),
+            concluidos=Count("id", filter=Q(status="CONCLUIDO")),
+            cancelados=Count("id", filter=Q(status="CANCELADO")),
+            receita=Sum("preco_final", filter=Q(status="CONCLUIDO")),
+        )
+
+    @staticmethod
+    def somar_por(
+        estatisticas, arquivados, campos, total="total_servicos", receita="receita_total"
+    ):
+        """Somar os totais arquivados às estatísticas (values/annotate) do período"""
+        somadas = {tuple(e[campo] for campo in campos): dict(e) for e in estatisticas}
+        for linha in arquivados:
+            chave = tuple(linha[campo] for campo in campos)
+            estatistica = somadas.setdefault(
+                chave,
+                {**dict(zip(campos, chave)), total: 0, receita: Decimal("0")},
+            )
+            estatistica[total] += linha["total"]
+            estatistica[receita] = (estatistica[receita] or 0) + linha["receita"]
+        return list(somadas.values())
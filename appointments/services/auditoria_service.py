@@ -0,0 +1,324 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Agendamento, HistoricoAgendamento
+from ..routers import banco_escrita
+from ..saloes import ativar_salao, salao_atual
+from .rastreamento_service import RastreamentoService
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_EVENTO = (
+    "agendamento_id",
+    "tipo_acao",
+    "descricao_personalizada",
+    "status_anterior",
+    "status_novo",
+    "usuario_id",
+)
+
+# Eventos de uma transação sem confirmação no processo em execução depois
+# deste prazo são de uma transação desfeita (nenhuma dura tanto)
+PRAZO_TRANSACAO_S = 300
+
+
+class AuditoriaService:
+    """Pipeline de gravação do histórico de agendamentos
+
+    No modo "sincrono" o histórico é gravado na própria transação. No modo
+    "spool" cada evento é anexado (com fsync) a um arquivo JSONL do processo
+    antes do commit, e uma linha de confirmação após o commit; uma thread em
+    segundo plano grava os confirmados em lote, tirando o INSERT do caminho
+    da requisição sem perder eventos em caso de queda. Eventos sem
+    confirmação deixados por um processo que caiu são gravados se o
+    agendamento existir. A entrega é "pelo menos uma vez": uma queda entre o
+    bulk_create e a remoção do arquivo pode repetir o último lote.
+    """
+
+    _lock = threading.Lock()
+    _lock_flush = threading.Lock()
+    _pid = None
+
+    @staticmethod
+    def modo():
+        return getattr(settings, "AUDITORIA_MODO", "sincrono")
+
+    @staticmethod
+    def registrar(
+        agendamento_id,
+        tipo_acao,
+        status_anterior=None,
+        status_novo=None,
+        usuario=None,
+        descricao="",
+    ):
+        """Registrar um evento de histórico
+
+        tipo_acao é um HistoricoAgendamento.TipoAcao; os status são os de
+        Agendamento (ex.: "CONCLUIDO"); usuario é um User ou None (Sistema);
+        descricao só deve ser informada quando foge do texto padrão da ação
+        (na criação, HistoricoAgendamento.descricao_criacao).
+        """
+        AuditoriaService.registrar_varios(
+            [
+                {
+                    "agendamento_id": agendamento_id,
+                    "tipo_acao": tipo_acao,
+                    "status_anterior": status_anterior,
+                    "status_novo": status_novo,
+                    "usuario": usuario,
+                    "descricao": descricao,
+                }
+            ]
+        )
+
+    @staticmethod
+    @RastreamentoService.rastrear()
+    def registrar_varios(eventos):
+        """Registrar vários eventos (dicts com os argumentos de registrar)"""
+        if not eventos:
+            return
+
+        momento = timezone.now()
+        eventos = [
+            {
+                "agendamento_id": evento["agendamento_id"],
+                "tipo_acao": int(evento["tipo_acao"]),
+                "descricao_personalizada": evento.get("descricao") or "",
+                "status_anterior": HistoricoAgendamento.codigo_status(
+                    evento.get("status_anterior")
+                ),
+                "status_novo": HistoricoAgendamento.codigo_status(
+                    evento.get("status_novo")
+                ),
+                "usuario_id": getattr(evento.get("usuario"), "pk", None),
+                "data_acao": momento,
+            }
+            for evento in eventos
+        ]
+
+        if AuditoriaService.modo() != "spool":
+            AuditoriaService._gravar(eventos)
+            return
+
+        # Gravado antes do commit: uma queda logo após o commit não perde o
+        # evento; a confirmação separa os de transações desfeitas
+        transacao = uuid.uuid4().hex
+        AuditoriaService._anexar_ao_spool(eventos, salao_atual(), transacao)
+        transaction.on_commit(
+            lambda: AuditoriaService._confirmar_no_spool(transacao),
+            using=banco_escrita(),
+        )
+
+    # Gravação no banco
+
+    @staticmethod
+    def _gravar(eventos, ignorar_orfaos=False):
+        """Gravar eventos com bulk_create; retorna quantos foram gravados"""
+        if ignorar_orfaos:
+            # O agendamento pode ter sido excluído antes do flush
+            ids = {evento["agendamento_id"] for evento in eventos}
+            existentes = set(
+                Agendamento.objects.filter(pk__in=ids).values_list("pk", flat=True)
+            )
+            eventos = [e for e in eventos if e["agendamento_id"] in existentes]
+
+            # O usuário também pode ter sido excluído (vira "Sistema")
+            usuarios = {e["usuario_id"] for e in eventos if e["usuario_id"]}
+            if usuarios:
+                Usuario = get_user_model()
+                existentes = set(
+                    Usuario.objects.filter(pk__in=usuarios).values_list("pk", flat=True)
+                )
+                for evento in eventos:
+                    if evento["usuario_id"] not in existentes:
+                        evento["usuario_id"] = None
+
+        HistoricoAgendamento.objects.bulk_create(
+            [HistoricoAgendamento(**evento) for evento in eventos],
+            batch_size=getattr(settings, "AUDITORIA_TAMANHO_LOTE", 500),
+        )
+        return len(eventos)
+
+    # Spool local
+
+    @staticmethod
+    def _diretorio():
+        diretorio = Path(getattr(settings, "AUDITORIA_SPOOL_DIR"))
+        diretorio.mkdir(parents=True, exist_ok=True)
+        return diretorio
+
+    @staticmethod
+    def _arquivo_processo(pid=None):
+        return AuditoriaService._diretorio() / f"auditoria-{pid or os.getpid()}.jsonl"
+
+    @staticmethod
+    def _anexar_ao_spool(eventos, salao=None, transacao=None):
+        """Anexar eventos ao arquivo do processo e garantir a thread de flush"""
+        AuditoriaService._anexar_linhas(
+            {
+                **evento,
+                "data_acao": evento["data_acao"].isoformat(),
+                "salao": salao,
+                "transacao": transacao,
+            }
+            for evento in eventos
+        )
+
+    @staticmethod
+    def _confirmar_no_spool(transacao):
+        """Marcar no spool a transação como confirmada no banco"""
+        # Sem fsync: se a linha se perder numa queda, o evento é recuperado
+        # pela regra dos processos encerrados
+        AuditoriaService._anexar_linhas([{"confirmada": transacao}], fsync=False)
+
+    @staticmethod
+    def _anexar_linhas(registros, fsync=True):
+        linhas = "".join(
+            json.dumps(registro, ensure_ascii=False) + "\n" for registro in registros
+        ).encode("utf-8")
+
+        with AuditoriaService._lock:
+            AuditoriaService._iniciar_thread()
+            fd = os.open(
+                AuditoriaService._arquivo_processo(),
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                0o644,
+            )
+            try:
+                os.write(fd, linhas)
+                if fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _iniciar_thread():
+        """Iniciar (ou reiniciar após fork) a thread de flush do processo"""
+        if AuditoriaService._pid == os.getpid():
+            return
+        AuditoriaService._pid = os.getpid()
+        threading.Thread(
+            target=AuditoriaService._executar_thread,
+            name="auditoria-flush",
+            daemon=True,
+        ).start()
+        atexit.register(AuditoriaService.descarregar)
+
+    @staticmethod
+    def _executar_thread():
+        intervalo = getattr(settings, "AUDITORIA_INTERVALO", 2.0)
+        while True:
+            time.sleep(intervalo)
+            try:
+                AuditoriaService.descarregar()
+            except Exception:
+                logger.exception("Falha ao gravar o spool de auditoria")
+            finally:
+                # A thread não passa pelo ciclo de requisição do Django
+                connections.close_all()
+
+    @staticmethod
+    def descarregar():
+        """Gravar no banco os eventos do spool deste processo"""
+        return AuditoriaService._descarregar_pid(os.getpid())
+
+    @staticmethod
+    def recuperar_orfaos():
+        """Gravar spools de processos que não estão mais em execução"""
+        pids = {
+            int(arquivo.stem.split("-", 1)[1])
+            for arquivo in AuditoriaService._diretorio().glob("auditoria-*.*")
+        }
+        return sum(
+            AuditoriaService._descarregar_pid(pid)
+            for pid in sorted(pids)
+            if pid == os.getpid() or not AuditoriaService._processo_ativo(pid)
+        )
+
+    @staticmethod
+    def _descarregar_pid(pid):
+        with AuditoriaService._lock_flush:
+            arquivo = AuditoriaService._arquivo_processo(pid)
+            processando = arquivo.with_suffix(".processando")
+            total = 0
+            # Transações ainda abertas só existem no processo em execução
+            vivo = pid == os.getpid()
+            # Sobra de um flush anterior que falhou ou foi interrompido
+            if processando.exists():
+                total += AuditoriaService._processar_arquivo(processando, vivo)
+
+            with AuditoriaService._lock:
+                if not arquivo.exists():
+                    return total
+                # Novos eventos passam a ir para um arquivo novo
+                os.replace(arquivo, processando)
+            return total + AuditoriaService._processar_arquivo(processando, vivo)
+
+    @staticmethod
+    def _processo_ativo(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _processar_arquivo(arquivo, vivo=False):
+        """Gravar um arquivo do spool e removê-lo após o commit
+
+        No processo em execução (vivo), eventos ainda sem confirmação voltam
+        ao spool até o commit ou até PRAZO_TRANSACAO_S (transação desfeita).
+        """
+        registros, confirmadas = [], set()
+        with open(arquivo, encoding="utf-8") as entrada:
+            for linha in entrada:
+                try:
+                    dados = json.loads(linha)
+                except ValueError:
+                    # Última linha truncada por uma queda no meio da escrita
+                    logger.warning("Linha inválida ignorada em %s", arquivo)
+                    continue
+                if "confirmada" in dados:
+                    confirmadas.add(dados["confirmada"])
+                else:
+                    registros.append(dados)
+
+        eventos_por_salao, pendentes = {}, []
+        limite = timezone.now() - timedelta(seconds=PRAZO_TRANSACAO_S)
+        for dados in registros:
+            data_acao = parse_datetime(dados["data_acao"])
+            transacao = dados.get("transacao")
+            if vivo and transacao and transacao not in confirmadas:
+                if data_acao > limite:
+                    pendentes.append(dados)
+                continue
+            evento = {campo: dados.get(campo) for campo in CAMPOS_EVENTO}
+            evento["descricao_personalizada"] = evento["descricao_personalizada"] or ""
+            evento["data_acao"] = data_acao
+            eventos_por_salao.setdefault(dados.get("salao"), []).append(evento)
+        if pendentes:
+            AuditoriaService._anexar_linhas(pendentes)
+
+        gravados = 0
+        for salao, eventos in eventos_por_salao.items():
+            # Cada evento vai para o banco do salão onde aconteceu
+            with ativar_salao(salao), transaction.atomic(using=banco_escrita()):
+                gravados += AuditoriaService._gravar(eventos, ignorar_orfaos=True)
+        os.remove(arquivo)
+        return gravados
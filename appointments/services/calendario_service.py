@@ -0,0 +1,169 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+from ..models import Agendamento
+from ..utils import get_inicio_do_dia, get_local_today
+
+# Cancelados e faltas saem da agenda (o app remove o evento na próxima leitura)
+STATUS_AGENDA = ("AGENDADO", "CONFIRMADO", "EM_ANDAMENTO", "CONCLUIDO")
+
+# Eventos por bloco enviado ao servidor (e por ida ao banco do iterator)
+TAMANHO_BLOCO = 200
+
+# Colunas lidas por evento (o resto do agendamento e dos cadastros fica no banco)
+CAMPOS_EVENTO = (
+    "id",
+    "data_hora",
+    "status",
+    "observacoes",
+    "data_atualizacao",
+    "cliente__nome",
+    "profissional__nome",
+    "servico__nome",
+    "servico__duracao_minutos",
+)
+
+
+class CalendarioService:
+    """Agenda em iCalendar (RFC 5545) para assinatura em apps de calendário
+
+    Janela móvel de settings.AGENDA_ICS_DIAS_PASSADOS dias para trás a
+    AGENDA_ICS_DIAS_FUTUROS à frente; horários em UTC (sem VTIMEZONE).
+    """
+
+    @staticmethod
+    def janela():
+        """(início, fim) da janela, alinhados à meia-noite local"""
+        hoje = get_local_today()
+        return (
+            get_inicio_do_dia(hoje - timedelta(days=settings.AGENDA_ICS_DIAS_PASSADOS)),
+            get_inicio_do_dia(hoje + timedelta(days=settings.AGENDA_ICS_DIAS_FUTUROS)),
+        )
+
+    @staticmethod
+    def agendamentos(profissional_id=None):
+        """Agendamentos da janela pelo índice de data_hora (ou de
+        profissional + data_hora)"""
+        inicio, fim = CalendarioService.janela()
+        queryset = Agendamento.objects.filter(
+            data_hora__gte=inicio, data_hora__lt=fim, status__in=STATUS_AGENDA
+        )
+        if profissional_id is not None:
+            queryset = queryset.filter(profissional_id=profissional_id)
+        return queryset
+
+    @staticmethod
+    def eventos(queryset):
+        """Queryset dos eventos: só as colunas usadas, na ordem da agenda"""
+        return (
+            queryset.select_related("cliente", "profissional", "servico")
+            .only(*CAMPOS_EVENTO)
+            .order_by("data_hora")
+        )
+
+    @staticmethod
+    def corpo(eventos, nome, dominio):
+        """Calendário em blocos de texto, lendo os eventos com iterator():
+        memória constante, qualquer que seja o tamanho da agenda"""
+        yield CalendarioService.cabecalho(nome)
+        bloco = []
+        for agendamento in eventos.iterator(chunk_size=TAMANHO_BLOCO):
+            bloco.append(CalendarioService.evento(agendamento, dominio))
+            if len(bloco) == TAMANHO_BLOCO:
+                yield "".join(bloco)
+                bloco = []
+        yield "".join(bloco) + CalendarioService.rodape()
+
+    @staticmethod
+    async def corpo_async(eventos, nome, dominio):
+        """Mesmo conteúdo de corpo(), para o servidor ASGI: o Django 4.2
+        carrega inteiro na memória um iterador síncrono servido em ASGI"""
+        yield CalendarioService.cabecalho(nome)
+        bloco = []
+        async for agendamento in eventos.aiterator(chunk_size=TAMANHO_BLOCO):
+            bloco.append(CalendarioService.evento(agendamento, dominio))
+            if len(bloco) == TAMANHO_BLOCO:
+                yield "".join(bloco)
+                bloco = []
+        yield "".join(bloco) + CalendarioService.rodape()
+
+    @staticmethod
+    def cabecalho(nome):
+        return CalendarioService._linhas(
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Salon Management//Agenda//PT-BR",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{CalendarioService._texto(nome)}",
+            f"X-WR-TIMEZONE:{settings.TIME_ZONE}",
+            # Sugestão de intervalo de atualização aos apps
+            "REFRESH-INTERVAL;VALUE=DURATION:PT15M",
+            "X-PUBLISHED-TTL:PT15M",
+        )
+
+    @staticmethod
+    def rodape():
+        return CalendarioService._linhas("END:VCALENDAR")
+
+    @staticmethod
+    def evento(agendamento, dominio):
+        """VEVENT de um agendamento (texto com CRLF, linhas dobradas)"""
+        fim = agendamento.data_hora + timedelta(
+            minutes=agendamento.servico.duracao_minutos or 60
+        )
+        resumo = f"{agendamento.servico.nome} - {agendamento.cliente.nome}"
+        descricao = f"Profissional: {agendamento.profissional.nome}"
+        if agendamento.observacoes:
+            descricao += f"\n{agendamento.observacoes}"
+        status = "TENTATIVE" if agendamento.status == "AGENDADO" else "CONFIRMED"
+        return CalendarioService._linhas(
+            "BEGIN:VEVENT",
+            f"UID:agendamento-{agendamento.pk}@{dominio}",
+            f"DTSTAMP:{CalendarioService._utc(agendamento.data_atualizacao)}",
+            f"LAST-MODIFIED:{CalendarioService._utc(agendamento.data_atualizacao)}",
+            f"DTSTART:{CalendarioService._utc(agendamento.data_hora)}",
+            f"DTEND:{CalendarioService._utc(fim)}",
+            f"SUMMARY:{CalendarioService._texto(resumo)}",
+            f"DESCRIPTION:{CalendarioService._texto(descricao)}",
+            f"STATUS:{status}",
+            "END:VEVENT",
+        )
+
+    @staticmethod
+    def _utc(momento):
+        return momento.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    @staticmethod
+    def _texto(valor):
+        """Escapar um valor TEXT (barra, ponto e vírgula, vírgula e quebras)"""
+        return (
+            str(valor)
+            .replace("\\", "\\\\")
+            .replace(";", "\\;")
+            .replace(",", "\\,")
+            .replace("\r\n", "\n")
+            .replace("\n", "\\n")
+        )
+
+    @staticmethod
+    def _linhas(*linhas):
+        return "".join(CalendarioService._dobrar(linha) + "\r\n" for linha in linhas)
+
+    @staticmethod
+    def _dobrar(linha):
+        """Quebrar linhas com mais de 75 bytes (continuação começa com espaço)"""
+        if len(linha.encode("utf-8")) <= 75:
+            return linha
+        partes, atual, tamanho = [], "", 0
+        for caractere in linha:
+            bytes_caractere = len(caractere.encode("utf-8"))
+            # A primeira linha tem 75 bytes; as seguintes, espaço + 74
+            if tamanho + bytes_caractere > (75 if not partes else 74):
+                partes.append(atual)
+                atual, tamanho = "", 0
+            atual += caractere
+            tamanho += bytes_caractere
+        partes.append(atual)
+        return "\r\n ".join(partes)
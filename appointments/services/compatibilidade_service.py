@@ -0,0 +1,104 @@
+from django.core.cache import cache
+
+from ..models import Profissional
+from ..routers import usar_primario
+from .metricas_service import MetricasService
+
+
+class CompatibilidadeService:
+    """Matriz profissional → serviços que ele realiza, mantida em cache"""
+
+    CHAVE_VERSAO = "compatibilidade:versao"
+    CHAVE_MATRIZ = "compatibilidade:matriz:{versao}"
+
+    @staticmethod
+    def get_versao():
+        """Versão atual da matriz (incrementada a cada alteração de especialidades)"""
+        versao = cache.get(CompatibilidadeService.CHAVE_VERSAO)
+        if versao is None:
+            versao = 1
+            cache.add(CompatibilidadeService.CHAVE_VERSAO, versao, timeout=None)
+        return versao
+
+    @staticmethod
+    def invalidar():
+        """Invalidar a matriz atual; a próxima leitura reconstrói a partir do banco"""
+        try:
+            cache.incr(CompatibilidadeService.CHAVE_VERSAO)
+        except ValueError:
+            # Chave ainda não existe (cache vazio ou expirado)
+            cache.set(CompatibilidadeService.CHAVE_VERSAO, 2, timeout=None)
+
+    @staticmethod
+    def get_matriz():
+        """Retorna {"versao", "servicos": {prof_id: frozenset}, "categorias": {prof_id: tuple}}"""
+        versao = CompatibilidadeService.get_versao()
+        chave = CompatibilidadeService.CHAVE_MATRIZ.format(versao=versao)
+
+        matriz = cache.get(chave)
+        MetricasService.incrementar(
+            "salao_cache_total",
+            cache="compatibilidade",
+            resultado="miss" if matriz is None else "hit",
+        )
+        if matriz is None:
+            # Vai para o cache compartilhado: montada sempre a partir do primário
+            with usar_primario():
+                matriz = CompatibilidadeService._construir_matriz(versao)
+            cache.set(chave, matriz, timeout=None)
+        return matriz
+
+    @staticmethod
+    def _construir_matriz(versao):
+        """Montar a matriz com uma única consulta na tabela intermediária"""
+        servicos = {}
+        categorias = {}
+
+        relacoes = Profissional.especialidades.through.objects.values_list(
+            "profissional_id", "servico_id", "servico__categoria"
+        )
+        for profissional_id, servico_id, categoria in relacoes:
+            servicos.setdefault(profissional_id, set()).add(servico_id)
+            categorias.setdefault(profissional_id, set()).add(categoria)
+
+        return {
+            "versao": versao,
+            "servicos": {
+                prof_id: frozenset(ids) for prof_id, ids in servicos.items()
+            },
+            # Ordenadas como o antigo {% regroup %} (Servico.Meta.ordering)
+            "categorias": {
+                prof_id: tuple(sorted(cats)) for prof_id, cats in categorias.items()
+            },
+        }
+
+    @staticmethod
+    def servicos_do_profissional(profissional_id):
+        """IDs dos serviços que o profissional realiza"""
+        matriz = CompatibilidadeService.get_matriz()
+        return matriz["servicos"].get(profissional_id, frozenset())
+
+    @staticmethod
+    def categorias_do_profissional(profissional_id):
+        """Categorias das especialidades do profissional, em ordem alfabética"""
+        matriz = CompatibilidadeService.get_matriz()
+        return matriz["categorias"].get(profissional_id, ())
+
+    @staticmethod
+    def profissional_realiza(profissional_id, servico_id):
+        """Verificar se o profissional realiza o serviço (sem consultar o banco)"""
+        return servico_id in CompatibilidadeService.servicos_do_profissional(
+            profissional_id
+        )
+
+    @staticmethod
+    def como_dict():
+        """Representação compacta para JSON: {"versao": n, "matriz": {"id": [ids]}}"""
+        matriz = CompatibilidadeService.get_matriz()
+        return {
+            "versao": matriz["versao"],
+            "matriz": {
+                str(prof_id): sorted(ids)
+                for prof_id, ids in matriz["servicos"].items()
+            },
+        }
@@ -0,0 +1,95 @@
+import gzip
+import posixpath
+import re
+
+import rcssmin
+import rjsmin
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele o WhiteNoise gera só .gz
+    brotli = None
+
+# url(...) em CSS, com ou sem aspas
+URL_CSS = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+# Referências que não são caminhos relativos a reescrever
+URL_EXTERNA = re.compile(r"^(data:|[a-z]+:|//|/|#)", re.IGNORECASE)
+
+
+class EstaticosService:
+    """Pacotes de CSS/JS definidos em settings.PACOTES_ESTATICOS"""
+
+    PASTA_DIST = "dist"
+
+    @staticmethod
+    def caminho_pacote(nome):
+        """Caminho estático do pacote montado (dist/app.css)"""
+        return f"{EstaticosService.PASTA_DIST}/{nome}"
+
+    @staticmethod
+    def arquivos(nome):
+        """Arquivos estáticos que as páginas carregam para o pacote"""
+        try:
+            origens = settings.PACOTES_ESTATICOS[nome]
+        except KeyError:
+            raise ValueError(f"Pacote estático desconhecido: {nome}")
+        if settings.ESTATICOS_EMPACOTADOS:
+            return [EstaticosService.caminho_pacote(nome)]
+        return list(origens)
+
+    @staticmethod
+    def ler_origem(caminho):
+        arquivo = finders.find(caminho)
+        if arquivo is None:
+            raise ValueError(f"Arquivo estático não encontrado: {caminho}")
+        with open(arquivo, encoding="utf-8") as f:
+            return f.read()
+
+    @staticmethod
+    def reescrever_urls(css, origem, destino):
+        """Ajustar url() relativas de um CSS movido de origem para destino"""
+        pasta_origem = posixpath.dirname(origem)
+        pasta_destino = posixpath.dirname(destino)
+
+        def trocar(match):
+            url = match.group(2).strip()
+            if URL_EXTERNA.match(url):
+                return match.group(0)
+            caminho, sufixo = re.match(r"([^?#]*)(.*)", url).groups()
+            absoluto = posixpath.normpath(posixpath.join(pasta_origem, caminho))
+            relativo = posixpath.relpath(absoluto, pasta_destino or ".")
+            return f'url("{relativo}{sufixo}")'
+
+        return URL_CSS.sub(trocar, css)
+
+    @staticmethod
+    def montar(nome):
+        """Conteúdo do pacote: origens concatenadas, minificando as que ainda
+        não são .min (comentários /*! de licença são mantidos)"""
+        destino = EstaticosService.caminho_pacote(nome)
+        partes = []
+        for origem in settings.PACOTES_ESTATICOS[nome]:
+            conteudo = EstaticosService.ler_origem(origem)
+            minificado = ".min." in posixpath.basename(origem)
+            if nome.endswith(".css"):
+                conteudo = EstaticosService.reescrever_urls(conteudo, origem, destino)
+                if not minificado:
+                    conteudo = rcssmin.cssmin(conteudo, keep_bang_comments=True)
+            elif not minificado:
+                conteudo = rjsmin.jsmin(conteudo, keep_bang_comments=True)
+            partes.append(conteudo.strip())
+        # ";" separa scripts que não terminam em ponto e vírgula
+        return ("\n" if nome.endswith(".css") else ";\n").join(partes) + "\n"
+
+    @staticmethod
+    def tamanhos(conteudo):
+        """Bytes sem compressão, com gzip e com brotli (None sem o módulo)"""
+        if isinstance(conteudo, str):
+            conteudo = conteudo.encode("utf-8")
+        return {
+            "bruto": len(conteudo),
+            "gzip": len(gzip.compress(conteudo, compresslevel=9)),
+            "brotli": len(brotli.compress(conteudo)) if brotli else None,
+        }
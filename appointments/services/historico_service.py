@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+from ..models import HistoricoAgendamento
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class HistoricoService:
+    """Linha do tempo do histórico, paginada por chave (data_acao, id)"""
+
+    TAMANHO_PAGINA = 20
+
+    # Apenas as colunas exibidas na linha do tempo
+    CAMPOS = (
+        "id",
+        "agendamento_id",
+        "tipo_acao",
+        "descricao_personalizada",
+        "status_anterior",
+        "status_novo",
+        "usuario__username",
+        "data_acao",
+        "observacoes",
+    )
+
+    @staticmethod
+    def codificar_cursor(evento):
+        """Cursor opaco "<microssegundos>-<id>" do último evento exibido"""
+        micros = (evento.data_acao - _EPOCA) // timedelta(microseconds=1)
+        return f"{micros}-{evento.pk}"
+
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """Retorna (data_acao, id); ValueError se o cursor for inválido"""
+        micros, pk = cursor.split("-")
+        try:
+            return _EPOCA + timedelta(microseconds=int(micros)), int(pk)
+        except OverflowError:
+            raise ValueError(f"Cursor fora do intervalo: {cursor}")
+
+    @staticmethod
+    def pagina(agendamento, cursor=None, tamanho=None):
+        """Eventos mais recentes primeiro; retorna (eventos, próximo cursor ou None)
+
+        Uma consulta por página, independente do tamanho do histórico. Cada
+        evento recebe o próprio agendamento, já carregado pela view.
+        """
+        tamanho = tamanho or HistoricoService.TAMANHO_PAGINA
+        eventos = (
+            HistoricoAgendamento.objects.filter(agendamento_id=agendamento.pk)
+            .select_related("usuario")
+            .only(*HistoricoService.CAMPOS)
+            .order_by("-data_acao", "-id")
+        )
+        if cursor:
+            data_acao, pk = HistoricoService.decodificar_cursor(cursor)
+            eventos = eventos.filter(
+                Q(data_acao__lt=data_acao) | Q(data_acao=data_acao, id__lt=pk)
+            )
+
+        eventos = list(eventos[: tamanho + 1])
+        for evento in eventos:
+            evento.agendamento = agendamento
+
+        if len(eventos) > tamanho:
+            eventos = eventos[:tamanho]
+            return eventos, HistoricoService.codificar_cursor(eventos[-1])
+        return eventos, None
@@ -0,0 +1,251 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.db.models import Count
+
+from ..models import Agendamento
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# nome: (tipo, descrição[, buckets do histograma])
+METRICAS = {
+    "salao_http_requisicoes_total": (
+        "counter",
+        "Requisições atendidas, por view, método e status",
+    ),
+    "salao_http_duracao_segundos": (
+        "histogram",
+        "Duração das requisições, por view",
+        BUCKETS_DURACAO,
+    ),
+    "salao_agendamentos_criados_total": ("counter", "Agendamentos criados"),
+    "salao_agendamentos_recusados_total": (
+        "counter",
+        "Tentativas de agendamento recusadas, por motivo",
+    ),
+    "salao_transicoes_status_total": (
+        "counter",
+        "Alterações de status aplicadas, por status novo",
+    ),
+    "salao_transicoes_recusadas_total": (
+        "counter",
+        "Alterações de status recusadas, por motivo",
+    ),
+    "salao_admin_acoes_total": (
+        "counter",
+        "Agendamentos processados por ações do admin, por ação e resultado",
+    ),
+    "salao_cache_total": ("counter", "Leituras de cache, por cache e resultado"),
+    "salao_agendamentos_status": (
+        "gauge",
+        "Agendamentos nas tabelas principais, por status",
+    ),
+}
+
+
+class MetricasService:
+    """Registro de métricas (contadores, medidores e histogramas)
+
+    Os incrementos ficam em memória (protegidos por lock) e são somados ao
+    total do processo. Com METRICAS_ARQUIVO configurado, uma thread em
+    segundo plano soma os incrementos de cada processo em um SQLite local
+    compartilhado, e /metrics lê o total de todos os workers de lá.
+    Medidores são calculados na hora da coleta.
+    """
+
+    _lock = threading.Lock()
+    _pendentes = {}
+    _acumulado = {}
+    _pid = None
+
+    @staticmethod
+    def incrementar(nome, valor=1, **rotulos):
+        """Somar valor a um contador"""
+        chave = (nome, MetricasService._rotulos(rotulos))
+        with MetricasService._lock:
+            MetricasService._iniciar_thread()
+            pendentes = MetricasService._pendentes
+            pendentes[chave] = pendentes.get(chave, 0) + valor
+
+    @staticmethod
+    def observar(nome, valor, **rotulos):
+        """Registrar uma observação em um histograma (ex.: duração em segundos)"""
+        buckets = METRICAS[nome][2]
+        base = MetricasService._rotulos(rotulos)
+        # Buckets cumulativos; os que não recebem a observação somam 0 para
+        # que todos apareçam na exposição
+        incrementos = [
+            ((f"{nome}_bucket", base + (("le", str(limite)),)), int(valor <= limite))
+            for limite in buckets
+        ]
+        incrementos += [
+            ((f"{nome}_bucket", base + (("le", "+Inf"),)), 1),
+            ((f"{nome}_count", base), 1),
+            ((f"{nome}_sum", base), valor),
+        ]
+        with MetricasService._lock:
+            MetricasService._iniciar_thread()
+            pendentes = MetricasService._pendentes
+            for chave, incremento in incrementos:
+                pendentes[chave] = pendentes.get(chave, 0) + incremento
+
+    @staticmethod
+    def _rotulos(rotulos):
+        return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+    @staticmethod
+    def _arquivo():
+        return getattr(settings, "METRICAS_ARQUIVO", "")
+
+    @staticmethod
+    def _iniciar_thread():
+        """Iniciar (ou reiniciar após fork) a thread que grava no arquivo"""
+        if MetricasService._pid == os.getpid() or not MetricasService._arquivo():
+            return
+        MetricasService._pid = os.getpid()
+        threading.Thread(
+            target=MetricasService._executar_thread,
+            name="metricas-flush",
+            daemon=True,
+        ).start()
+        atexit.register(MetricasService.descarregar)
+
+    @staticmethod
+    def _executar_thread():
+        intervalo = getattr(settings, "METRICAS_INTERVALO", 5.0)
+        while True:
+            time.sleep(intervalo)
+            try:
+                MetricasService.descarregar()
+            except Exception:
+                logger.exception("Falha ao gravar as métricas")
+
+    @staticmethod
+    def _conectar():
+        conexao = sqlite3.connect(MetricasService._arquivo(), timeout=5)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS serie ("
+            "nome TEXT NOT NULL, rotulos TEXT NOT NULL, valor REAL NOT NULL, "
+            "PRIMARY KEY (nome, rotulos))"
+        )
+        return conexao
+
+    @staticmethod
+    def descarregar():
+        """Somar os incrementos pendentes ao total (do processo ou do arquivo)"""
+        with MetricasService._lock:
+            pendentes, MetricasService._pendentes = MetricasService._pendentes, {}
+            if not MetricasService._arquivo():
+                acumulado = MetricasService._acumulado
+                for chave, valor in pendentes.items():
+                    acumulado[chave] = acumulado.get(chave, 0) + valor
+                return
+        if not pendentes:
+            return
+
+        try:
+            with closing(MetricasService._conectar()) as conexao, conexao:
+                conexao.executemany(
+                    "INSERT INTO serie (nome, rotulos, valor) VALUES (?, ?, ?) "
+                    "ON CONFLICT (nome, rotulos) "
+                    "DO UPDATE SET valor = valor + excluded.valor",
+                    [
+                        (nome, json.dumps(rotulos), valor)
+                        for (nome, rotulos), valor in pendentes.items()
+                    ],
+                )
+        except sqlite3.Error:
+            # Devolve os incrementos para a próxima tentativa
+            with MetricasService._lock:
+                for chave, valor in pendentes.items():
+                    MetricasService._pendentes[chave] = (
+                        MetricasService._pendentes.get(chave, 0) + valor
+                    )
+            raise
+
+    @staticmethod
+    def valores():
+        """Totais atuais: {(série, rotulos): valor}"""
+        MetricasService.descarregar()
+        if not MetricasService._arquivo():
+            with MetricasService._lock:
+                return dict(MetricasService._acumulado)
+        with closing(MetricasService._conectar()) as conexao:
+            return {
+                (nome, tuple(map(tuple, json.loads(rotulos)))): valor
+                for nome, rotulos, valor in conexao.execute(
+                    "SELECT nome, rotulos, valor FROM serie"
+                )
+            }
+
+    @staticmethod
+    def medidores():
+        """Medidores calculados na coleta"""
+        por_status = (
+            Agendamento.objects.order_by()
+            .values_list("status")
+            .annotate(total=Count("id"))
+        )
+        return {
+            ("salao_agendamentos_status", (("status", status),)): total
+            for status, total in por_status
+        }
+
+    @staticmethod
+    def exportar():
+        """Texto no formato de exposição do Prometheus"""
+        valores = {**MetricasService.valores(), **MetricasService.medidores()}
+
+        linhas = []
+        for nome, (tipo, descricao, *_) in METRICAS.items():
+            series = [
+                (serie, rotulos, valor)
+                for (serie, rotulos), valor in valores.items()
+                if serie == nome
+                or (tipo == "histogram" and serie.rsplit("_", 1)[0] == nome)
+            ]
+            if not series:
+                continue
+            linhas.append(f"# HELP {nome} {descricao}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for serie, rotulos, valor in sorted(series, key=MetricasService._ordem):
+                linhas.append(
+                    f"{serie}{MetricasService._formatar_rotulos(rotulos)} "
+                    f"{MetricasService._formatar_valor(valor)}"
+                )
+        return "\n".join(linhas) + "\n"
+
+    @staticmethod
+    def _ordem(item):
+        """Séries agrupadas por rótulos, com os buckets em ordem crescente"""
+        serie, rotulos, _ = item
+        le = dict(rotulos).get("le")
+        sem_le = tuple(r for r in rotulos if r[0] != "le")
+        return (sem_le, serie, float(le) if le is not None else 0.0)
+
+    @staticmethod
+    def _formatar_rotulos(rotulos):
+        if not rotulos:
+            return ""
+        pares = ",".join(
+            '{}="{}"'.format(
+                chave,
+                valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+            )
+            for chave, valor in rotulos
+        )
+        return "{" + pares + "}"
+
+    @staticmethod
+    def _formatar_valor(valor):
+        return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
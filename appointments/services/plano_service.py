@@ -0,0 +1,142 @@
+import re
+from contextlib import ExitStack
+
+from django.apps import apps
+from django.db import connections
+
+from ..models import Profissional, Servico
+
+# Tabelas pequenas e em cache (ReferenciaService): varrer é mais barato que indexar
+TABELAS_REFERENCIA = {
+    Profissional._meta.db_table,
+    Servico._meta.db_table,
+    Profissional.especialidades.through._meta.db_table,
+}
+
+_TABELAS_SQL = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"')
+_SCAN_SQLITE = re.compile(r"^SCAN (\w+)(?: AS \w+)?(?: USING (COVERING )?INDEX (\w+))?")
+_SORT_SQLITE = re.compile(r"^USE TEMP B-TREE FOR (.+)$")
+_SCAN_POSTGRES = re.compile(r"Seq Scan on (\w+)")
+_SORT_POSTGRES = re.compile(r"->\s+Sort\b|^Sort\b")
+
+
+class PlanoService:
+    """Plano de execução das consultas e detecção de varreduras e ordenações"""
+
+    @staticmethod
+    def capturar(funcao):
+        """Executar funcao e devolver os SELECTs executados como (sql, params,
+        alias), de todas as conexões (a réplica de leitura inclusive)"""
+        consultas = []
+
+        def capturar_select(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith("SELECT"):
+                consultas.append((sql, params, context["connection"].alias))
+            return execute(sql, params, many, context)
+
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(capturar_select))
+            funcao()
+        return consultas
+
+    @staticmethod
+    def explicar(sql, params, using="default"):
+        """Linhas do plano (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no PostgreSQL)"""
+        conexao = connections[using]
+        prefixo = conexao.ops.explain_query_prefix()
+        with conexao.cursor() as cursor:
+            cursor.execute(f"{prefixo} {sql}", params)
+            linhas = cursor.fetchall()
+        if conexao.vendor == "sqlite":
+            # (id, parent, notused, detail)
+            return [linha[-1] for linha in linhas]
+        return [linha[0] for linha in linhas]
+
+    @staticmethod
+    def problemas(sql, plano, vendor="sqlite"):
+        """Lista de (tipo, descrição) para varreduras e ordenações temporárias
+
+        tipo é "varredura" (tabela inteira), "varredura_indice" (índice inteiro
+        percorrido apesar do WHERE) ou "ordenacao" (B-tree temporária/Sort).
+        Consultas só em tabelas de referência são ignoradas.
+        """
+        if set(_TABELAS_SQL.findall(sql)) <= TABELAS_REFERENCIA:
+            return []
+
+        encontrados = []
+        for linha in plano:
+            linha = linha.strip()
+            if vendor == "sqlite":
+                scan = _SCAN_SQLITE.match(linha)
+                sort = _SORT_SQLITE.match(linha)
+            else:
+                scan = _SCAN_POSTGRES.search(linha)
+                sort = _SORT_POSTGRES.search(linha)
+
+            if scan and scan.group(1) not in TABELAS_REFERENCIA:
+                tabela = scan.group(1)
+                if vendor != "sqlite" or not scan.group(3):
+                    encontrados.append(("varredura", f"varredura completa de {tabela}"))
+                elif not scan.group(2) and " WHERE " in sql:
+                    # Índice percorrido inteiro: o filtro não usa nenhuma coluna dele
+                    encontrados.append(
+                        (
+                            "varredura_indice",
+                            f"{tabela} percorrida inteira pelo índice {scan.group(3)}",
+                        )
+                    )
+            elif sort:
+                detalhe = sort.group(1) if vendor == "sqlite" else "Sort"
+                encontrados.append(("ordenacao", f"ordenação temporária ({detalhe})"))
+        return encontrados
+
+    @staticmethod
+    def _where(sql):
+        restante = sql.partition(" WHERE ")[2]
+        return re.split(r"\b(?:ORDER BY|GROUP BY|LIMIT)\b", restante)[0]
+
+    @staticmethod
+    def colunas_em_funcoes(sql):
+        """Colunas filtradas dentro de uma função (ex.: campo__date), o que
+        impede o uso de qualquer índice nelas"""
+        return re.findall(r'\w+\(\s*"\w+"\."(\w+)"', PlanoService._where(sql))
+
+    @staticmethod
+    def sugerir_indice(sql):
+        """Índice composto proposto para a tabela principal da consulta
+
+        Colunas de igualdade primeiro, depois a primeira de intervalo e por
+        fim as do ORDER BY — a ordem que permite buscar e já ler ordenado.
+        """
+        tabelas = _TABELAS_SQL.findall(sql)
+        if not tabelas:
+            return None
+        tabela = tabelas[0]
+        coluna = rf'"{tabela}"\."(\w+)"'
+        where = PlanoService._where(sql)
+        order = sql.partition(" ORDER BY ")[2]
+
+        igualdade = re.findall(coluna + r"\s*(?:=|IN\b)", where)
+        intervalo = re.findall(coluna + r"\s*(?:>=|<=|>|<|BETWEEN\b)", where)
+        ordenacao = re.findall(coluna, order)
+
+        colunas = []
+        for nome in igualdade + intervalo[:1] + ordenacao:
+            if nome not in colunas:
+                colunas.append(nome)
+        if not colunas:
+            return None
+
+        modelo = next(
+            (m for m in apps.get_models() if m._meta.db_table == tabela), None
+        )
+        if modelo is not None:
+            por_coluna = {
+                campo.column: campo.name
+                for campo in modelo._meta.concrete_fields
+            }
+            colunas = [por_coluna.get(nome, nome) for nome in colunas]
+            tabela = modelo.__name__
+        campos = ", ".join(f'"{nome}"' for nome in colunas)
+        return f"{tabela}: models.Index(fields=[{campos}])"
@@ -0,0 +1,254 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from ..utils import normalizar_sql
+
+# Tipos de span do OTLP
+INTERNO, SERVIDOR, CLIENTE = 1, 2, 3
+# Status do OTLP
+STATUS_OK, STATUS_ERRO = 1, 2
+
+# Tabela principal de um comando SQL, para o nome do span ("SELECT tabela")
+_TABELA_SQL = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+"?(\w+)', re.IGNORECASE)
+
+# Marca um rastro descartado pela amostragem: os spans internos não são
+# registrados nem começam um rastro novo
+NAO_AMOSTRADO = object()
+
+# Span aberto no contexto atual (None fora de qualquer rastro)
+_span_atual = ContextVar("span_atual", default=None)
+
+
+class Rastro:
+    """Spans terminados de um rastro, gravados quando o span raiz termina"""
+
+    def __init__(self):
+        self.id = os.urandom(16).hex()
+        self.spans = []
+        self.encerrado = False
+        self.lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("rastro", "id", "pai", "nome", "tipo", "kind", "inicio", "atributos")
+
+    def __init__(self, rastro, pai, nome, tipo, kind, atributos):
+        self.rastro = rastro
+        self.id = os.urandom(8).hex()
+        self.pai = pai
+        self.nome = nome
+        self.tipo = tipo
+        self.kind = kind
+        self.inicio = time.time_ns()
+        self.atributos = atributos
+
+    def definir(self, **atributos):
+        """Acrescentar atributos (ex.: status HTTP, conhecido só no fim)"""
+        self.atributos.update(atributos)
+
+
+class RastreamentoService:
+    """Spans locais (formato OTLP/JSON) gravados em NDJSON
+
+    Desligado sem RASTREAMENTO_ARQUIVO. A decisão de amostragem é tomada no
+    span raiz (RASTREAMENTO_AMOSTRAGEM) e vale para o rastro inteiro; cada
+    linha do arquivo é um ExportTraceServiceRequest com os spans de um
+    rastro, pronto para ferramentas offline (ver rastros_flamegraph).
+    """
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def ativo():
+        return bool(getattr(settings, "RASTREAMENTO_ARQUIVO", ""))
+
+    @staticmethod
+    def span_atual():
+        """Span aberto (None fora de rastro, NAO_AMOSTRADO se descartado)"""
+        return _span_atual.get()
+
+    @staticmethod
+    @contextmanager
+    def span(nome, tipo="interno", kind=INTERNO, **atributos):
+        """Abrir um span filho do atual (ou a raiz de um rastro novo)
+
+        Produz o Span, ou None quando o rastreamento está desligado ou o
+        rastro não foi amostrado.
+        """
+        pai = _span_atual.get()
+        if pai is NAO_AMOSTRADO or (pai is None and not RastreamentoService.ativo()):
+            yield None
+            return
+        if pai is None and random.random() >= settings.RASTREAMENTO_AMOSTRAGEM:
+            token = _span_atual.set(NAO_AMOSTRADO)
+            try:
+                yield None
+            finally:
+                _span_atual.reset(token)
+            return
+
+        rastro = pai.rastro if pai is not None else Rastro()
+        span = Span(rastro, pai and pai.id, nome, tipo, kind, atributos)
+        token = _span_atual.set(span)
+        erro = None
+        try:
+            yield span
+        except BaseException as e:
+            erro = e
+            raise
+        finally:
+            _span_atual.reset(token)
+            RastreamentoService._terminar(span, erro)
+
+    @staticmethod
+    def rastrear(nome=None, **atributos):
+        """Decorator: executar a função dentro de um span (nome padrão: o
+        __qualname__, ex. "AgendamentoService.criar_agendamento")"""
+
+        def decorator(funcao):
+            nome_span = nome or funcao.__qualname__
+
+            @functools.wraps(funcao)
+            def wrapper(*args, **kwargs):
+                if _span_atual.get() is None and not RastreamentoService.ativo():
+                    return funcao(*args, **kwargs)
+                with RastreamentoService.span(nome_span, **atributos):
+                    return funcao(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def propagar(funcao):
+        """Envolver funcao para rodar em outra thread (ThreadPoolExecutor) no
+        rastro atual: executor.submit(RastreamentoService.propagar(f), ...)"""
+        contexto = contextvars.copy_context()
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            # Cópia por chamada: o mesmo wrapper pode rodar em várias threads
+            return contexto.copy().run(funcao, *args, **kwargs)
+
+        return wrapper
+
+    @staticmethod
+    def consulta(execute, sql, params, many, context):
+        """execute_wrapper instalado em todas as conexões (signals.py)"""
+        if not isinstance(_span_atual.get(), Span):
+            return execute(sql, params, many, context)
+        conexao = context["connection"]
+        tabela = _TABELA_SQL.search(sql)
+        operacao = sql.lstrip().split(None, 1)[0].upper()
+        with RastreamentoService.span(
+            f"{operacao} {tabela.group(1)}" if tabela else operacao,
+            tipo="db",
+            kind=CLIENTE,
+            **{
+                "db.system": conexao.vendor,
+                "db.name": conexao.alias,
+                "db.statement": normalizar_sql(sql),
+            },
+        ):
+            return execute(sql, params, many, context)
+
+    @staticmethod
+    def _terminar(span, erro):
+        fim = time.time_ns()
+        dados = {
+            "traceId": span.rastro.id,
+            "spanId": span.id,
+            "name": span.nome,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.inicio),
+            "endTimeUnixNano": str(fim),
+            "attributes": RastreamentoService._atributos(span.atributos),
+            "status": (
+                {"code": STATUS_ERRO, "message": f"{type(erro).__name__}: {erro}"}
+                if erro is not None
+                else {"code": STATUS_OK}
+            ),
+        }
+        if span.pai:
+            dados["parentSpanId"] = span.pai
+
+        rastro = span.rastro
+        with rastro.lock:
+            rastro.spans.append(dados)
+            # Spans de threads que terminam depois da raiz saem em linha própria
+            if span.pai and not rastro.encerrado:
+                return
+            rastro.encerrado = True
+            spans, rastro.spans = rastro.spans, []
+        RastreamentoService._gravar(spans)
+
+    @staticmethod
+    def _atributos(atributos):
+        convertidos = []
+        for chave, valor in atributos.items():
+            if isinstance(valor, bool):
+                convertido = {"boolValue": valor}
+            elif isinstance(valor, int):
+                # int64 é serializado como string no JSON do OTLP
+                convertido = {"intValue": str(valor)}
+            elif isinstance(valor, float):
+                convertido = {"doubleValue": valor}
+            else:
+                convertido = {"stringValue": str(valor)}
+            convertidos.append({"key": chave, "value": convertido})
+        return convertidos
+
+    @staticmethod
+    def _gravar(spans):
+        """Anexar uma linha (um write com O_APPEND, seguro entre processos)"""
+        linha = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": RastreamentoService._atributos(
+                                {
+                                    "service.name": settings.RASTREAMENTO_SERVICO,
+                                    "process.pid": os.getpid(),
+                                }
+                            )
+                        },
+                        "scopeSpans": [
+                            {"scope": {"name": "appointments"}, "spans": spans}
+                        ],
+                    }
+                ]
+            },
+            ensure_ascii=False,
+        )
+        with RastreamentoService._lock:
+            fd = os.open(
+                settings.RASTREAMENTO_ARQUIVO,
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                0o644,
+            )
+            try:
+                os.write(fd, (linha + "\n").encode("utf-8"))
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def ler(caminho):
+        """Spans de um arquivo NDJSON, na ordem em que foram gravados"""
+        with open(caminho, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                if not linha.strip():
+                    continue
+                for recurso in json.loads(linha)["resourceSpans"]:
+                    for escopo in recurso["scopeSpans"]:
+                        yield from escopo["spans"]
@@ -0,0 +1,144 @@
+import copy
+import threading
+import time
+from contextvars import ContextVar
+
+from django.core.cache import cache
+
+from ..models import Agendamento, Profissional, Servico
+from ..routers import usar_primario
+from ..saloes import salao_atual
+from .metricas_service import MetricasService
+
+# Mapa de identidade da requisição atual (None fora de uma requisição)
+_mapa_requisicao = ContextVar("referencias_requisicao", default=None)
+
+
+class ReferenciaService:
+    """Cache de dados de referência (profissionais, serviços, status)
+
+    Duas camadas: um mapa de identidade por requisição, ativado pelo
+    ReferenciaCacheMiddleware, e uma camada por processo validada pela
+    versão guardada no cache do Django (incrementada a cada save/delete).
+    """
+
+    CHAVE_VERSAO = "referencias:versao"
+
+    _processo = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def iniciar_requisicao():
+        """Abrir um mapa de identidade vazio para a requisição"""
+        return _mapa_requisicao.set({})
+
+    @staticmethod
+    def encerrar_requisicao(token):
+        """Descartar o mapa de identidade da requisição"""
+        _mapa_requisicao.reset(token)
+
+    @staticmethod
+    def get_versao():
+        """Versão atual dos dados de referência (lida uma vez por requisição)"""
+        mapa = _mapa_requisicao.get()
+        if mapa is not None and "versao" in mapa:
+            return mapa["versao"]
+
+        versao = cache.get(ReferenciaService.CHAVE_VERSAO)
+        if versao is None:
+            # Valor inicial único: um cache reiniciado nunca repete versões antigas
+            cache.add(ReferenciaService.CHAVE_VERSAO, time.time_ns(), timeout=None)
+            versao = cache.get(ReferenciaService.CHAVE_VERSAO)
+
+        if mapa is not None:
+            mapa["versao"] = versao
+        return versao
+
+    @staticmethod
+    def invalidar():
+        """Invalidar as duas camadas após alteração em profissionais ou serviços"""
+        try:
+            cache.incr(ReferenciaService.CHAVE_VERSAO)
+        except ValueError:
+            cache.set(ReferenciaService.CHAVE_VERSAO, time.time_ns(), timeout=None)
+
+        mapa = _mapa_requisicao.get()
+        if mapa is not None:
+            mapa.clear()
+
+    @staticmethod
+    def _obter(nome, carregar):
+        """Ler da requisição, depois do processo e, por último, do banco"""
+        mapa = _mapa_requisicao.get()
+        if mapa is not None and nome in mapa:
+            return mapa[nome]
+
+        versao = ReferenciaService.get_versao()
+        # A camada do processo é compartilhada entre os salões
+        chave = (salao_atual(), nome)
+        entrada = ReferenciaService._processo.get(chave)
+        acerto = entrada is not None and entrada[0] == versao
+        MetricasService.incrementar(
+            "salao_cache_total",
+            cache=f"referencia:{nome}",
+            resultado="hit" if acerto else "miss",
+        )
+        if not acerto:
+            # A camada do processo é compartilhada: nunca preencher da réplica
+            with usar_primario():
+                dados = carregar()
+            with ReferenciaService._lock:
+                ReferenciaService._processo[chave] = (versao, dados)
+        else:
+            dados = entrada[1]
+
+        if mapa is not None:
+            # Cópias por requisição: nenhuma view altera instâncias compartilhadas
+            dados = {pk: copy.copy(obj) for pk, obj in dados.items()}
+            mapa[nome] = dados
+        return dados
+
+    @staticmethod
+    def _profissionais_por_id():
+        return ReferenciaService._obter(
+            "profissionais",
+            lambda: {p.pk: p for p in Profissional.objects.order_by("nome")},
+        )
+
+    @staticmethod
+    def _servicos_por_id():
+        return ReferenciaService._obter(
+            "servicos",
+            lambda: {s.pk: s for s in Servico.objects.order_by("categoria", "nome")},
+        )
+
+    @staticmethod
+    def profissionais_ativos():
+        """Profissionais ativos ordenados por nome"""
+        return [p for p in ReferenciaService._profissionais_por_id().values() if p.ativo]
+
+    @staticmethod
+    def profissional_ativo(profissional_id):
+        """Profissional ativo pelo ID, ou None"""
+        try:
+            profissional = ReferenciaService._profissionais_por_id().get(
+                int(profissional_id)
+            )
+        except (TypeError, ValueError):
+            return None
+        return profissional if profissional is not None and profissional.ativo else None
+
+    @staticmethod
+    def servicos_ativos():
+        """Serviços ativos ordenados por categoria e nome"""
+        return [s for s in ReferenciaService._servicos_por_id().values() if s.ativo]
+
+    @staticmethod
+    def servico(servico_id):
+        """Serviço pelo ID (inclusive inativos), ou None"""
+        return ReferenciaService._servicos_por_id().get(servico_id)
+
+    @staticmethod
+    def status_choices():
+        """Choices de status do agendamento"""
+        return Agendamento.STATUS_CHOICES
@@ -1,36 +1,43 @@
 from datetime import datetime, timedelta
 
-from django.db.models import Count, Sum
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 
 from ..models import Agendamento
+from ..utils import filtro_periodo, get_local_today
+from .arquivo_service import ArquivoService
+from .rastreamento_service import RastreamentoService
 
 
 class RelatorioService:
-    """Service para geração de relatórios"""
+    """Service para geração de relatórios
+
+    Períodos anteriores à data de corte do arquivamento somam os totais já
+    arquivados (ArquivoService), então todos os chamadores os recebem.
+    """
 
     @staticmethod
+    @RastreamentoService.rastrear()
     def relatorio_servicos_concluidos(
         data_inicio=None, data_fim=None, profissional_id=None
     ):
         """Gerar relatório de serviços concluídos"""
 
-        # Data padrão: último mês
+        # Data padrão: último mês (datas locais)
         if not data_inicio:
-            data_inicio = (timezone.now() - timedelta(days=30)).date()
+            data_inicio = get_local_today() - timedelta(days=30)
         elif isinstance(data_inicio, str):
             data_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").date()
 
         if not data_fim:
-            data_fim = timezone.now().date()
+            data_fim = get_local_today()
         elif isinstance(data_fim, str):
             data_fim = datetime.strptime(data_fim, "%Y-%m-%d").date()
 
         # Query base
         queryset = Agendamento.objects.filter(
-            status="CONCLUIDO",
-            data_hora__date__gte=data_inicio,
-            data_hora__date__lte=data_fim,
+            status="CONCLUIDO", **filtro_periodo(data_inicio, data_fim)
         ).select_related("servico", "profissional", "cliente")
 
         if profissional_id:
@@ -56,6 +63,44 @@ class RelatorioService:
             receita_total=Sum("preco_final"),
         )
 
+        # Evolução diária (data local; DATE() no SQL usaria a data em UTC)
+        agendamentos_por_dia = (
+            queryset.annotate(data=TruncDate("data_hora"))
+            .values("data")
+            .annotate(total=Count("id"), receita=Sum("preco_final"))
+            .order_by("data")
+        )
+
+        # Períodos anteriores à data de corte: somar os totais já arquivados
+        arquivados = ArquivoService.resumo_periodo(
+            data_inicio, data_fim, profissional_id
+        )
+        if arquivados:
+            servicos_stats = sorted(
+                ArquivoService.somar_por(
+                    servicos_stats, arquivados, ("servico__nome", "servico__categoria")
+                ),
+                key=lambda e: -e["total_servicos"],
+            )
+            profissionais_stats = sorted(
+                ArquivoService.somar_por(
+                    profissionais_stats, arquivados, ("profissional__nome",)
+                ),
+                key=lambda e: -e["total_servicos"],
+            )
+            agendamentos_por_dia = sorted(
+                ArquivoService.somar_por(
+                    agendamentos_por_dia, arquivados, ("data",), "total", "receita"
+                ),
+                key=lambda e: e["data"],
+            )
+            stats_gerais["total_agendamentos"] += sum(
+                linha["total"] for linha in arquivados
+            )
+            stats_gerais["receita_total"] = (stats_gerais["receita_total"] or 0) + sum(
+                linha["receita"] for linha in arquivados
+            )
+
         # Calcular ticket médio
         if stats_gerais["total_agendamentos"] > 0:
             stats_gerais["ticket_medio"] = (
@@ -64,14 +109,6 @@ class RelatorioService:
         else:
             stats_gerais["ticket_medio"] = 0
 
-        # Evolução diária
-        agendamentos_por_dia = (
-            queryset.extra(select={"data": "DATE(data_hora)"})
-            .values("data")
-            .annotate(total=Count("id"), receita=Sum("preco_final"))
-            .order_by("data")
-        )
-
         return {
             "servicos_stats": servicos_stats,
             "profissionais_stats": profissionais_stats,
@@ -83,30 +120,30 @@ class RelatorioService:
         }
 
     @staticmethod
+    @RastreamentoService.rastrear()
     def dashboard_stats(data=None):
         """Estatísticas para o dashboard"""
 
         if not data:
-            data = timezone.now().date()
+            data = get_local_today()
 
         # Agendamentos do dia
         agendamentos_dia = Agendamento.objects.filter(
-            data_hora__date=data
+            **filtro_periodo(data, data)
         ).select_related("cliente", "profissional", "servico")
 
-        # Estatísticas básicas
-        stats = {
-            "agendamentos_hoje": agendamentos_dia.count(),
-            "agendamentos_confirmados": agendamentos_dia.filter(
-                status="CONFIRMADO"
-            ).count(),
-            "agendamentos_concluidos": agendamentos_dia.filter(
-                status="CONCLUIDO"
-            ).count(),
-            "agendamentos_cancelados": agendamentos_dia.filter(
-                status="CANCELADO"
-            ).count(),
-        }
+        # Estatísticas básicas em uma consulta (FILTER no PostgreSQL)
+        stats = agendamentos_dia.aggregate(
+            agendamentos_hoje=Count("id"),
+            agendamentos_confirmados=Count("id", filter=Q(status="CONFIRMADO")),
+            agendamentos_concluidos=Count("id", filter=Q(status="CONCLUIDO")),
+            agendamentos_cancelados=Count("id", filter=Q(status="CANCELADO")),
+        )
+        # Dias anteriores à data de corte já podem ter sido arquivados
+        arquivados = ArquivoService.contagens_periodo(data, data)
+        stats["agendamentos_hoje"] += arquivados["total"]
+        stats["agendamentos_concluidos"] += arquivados["concluidos"]
+        stats["agendamentos_cancelados"] += arquivados["cancelados"]
 
         # Próximos agendamentos
         proximos_agendamentos = (
@@ -124,40 +161,63 @@ class RelatorioService:
         }
 
     @staticmethod
+    @RastreamentoService.rastrear()
     def relatorio_profissional(profissional_id, periodo_dias=30):
         """Relatório específico de um profissional"""
 
-        data_inicio = timezone.now().date() - timedelta(days=periodo_dias)
-        data_fim = timezone.now().date()
+        data_fim = get_local_today()
+        data_inicio = data_fim - timedelta(days=periodo_dias)
 
         agendamentos = Agendamento.objects.filter(
-            profissional_id=profissional_id,
-            data_hora__date__gte=data_inicio,
-            data_hora__date__lte=data_fim,
+            profissional_id=profissional_id, **filtro_periodo(data_inicio, data_fim)
         ).select_related("servico", "cliente")
 
-        # Estatísticas
-        total_agendamentos = agendamentos.count()
+        # Estatísticas em uma consulta (FILTER no PostgreSQL)
+        totais = agendamentos.aggregate(
+            total=Count("id"),
+            concluidos=Count("id", filter=Q(status="CONCLUIDO")),
+            cancelados=Count("id", filter=Q(status="CANCELADO")),
+            receita=Sum("preco_final", filter=Q(status="CONCLUIDO")),
+        )
         concluidos = agendamentos.filter(status="CONCLUIDO")
-        cancelados = agendamentos.filter(status="CANCELADO")
-
-        receita_total = concluidos.aggregate(total=Sum("preco_final"))["total"] or 0
 
         # Serviços mais realizados
         servicos_realizados = (
             concluidos.values("servico__nome")
-            .annotate(quantidade=Count("id"))
-            .order_by("-quantidade")[:5]
+            .annotate(quantidade=Count("id"), receita=Sum("preco_final"))
+            .order_by("-quantidade")
         )
 
+        # Períodos anteriores à data de corte: somar os totais já arquivados
+        arquivados = ArquivoService.contagens_periodo(
+            data_inicio, data_fim, profissional_id
+        )
+        if arquivados["total"]:
+            for campo in ("total", "concluidos", "cancelados"):
+                totais[campo] += arquivados[campo]
+            totais["receita"] = (totais["receita"] or 0) + (arquivados["receita"] or 0)
+            servicos_realizados = sorted(
+                ArquivoService.somar_por(
+                    servicos_realizados,
+                    ArquivoService.resumo_periodo(
+                        data_inicio, data_fim, profissional_id
+                    ),
+                    ("servico__nome",),
+                    "quantidade",
+                    "receita",
+                ),
+                key=lambda e: -e["quantidade"],
+            )
+        total_agendamentos = totais["total"]
+
         return {
             "total_agendamentos": total_agendamentos,
-            "total_concluidos": concluidos.count(),
-            "total_cancelados": cancelados.count(),
-            "receita_total": receita_total,
-            "servicos_realizados": servicos_realizados,
+            "total_concluidos": totais["concluidos"],
+            "total_cancelados": totais["cancelados"],
+            "receita_total": totais["receita"] or 0,
+            "servicos_realizados": list(servicos_realizados)[:5],
             "taxa_conclusao": (
-                (concluidos.count() / total_agendamentos * 100)
+                (totais["concluidos"] / total_agendamentos * 100)
                 if total_agendamentos > 0
                 else 0
             ),
@@ -0,0 +1,238 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from ..models import Agendamento, Cliente, Profissional, RegistroExcluido, Servico
+from ..routers import banco_escrita
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Recurso do feed: (model, colunas enviadas, relações m2m enviadas como IDs)
+FEEDS = {
+    "agendamentos": (
+        Agendamento,
+        (
+            "id",
+            "cliente_id",
+            "profissional_id",
+            "servico_id",
+            "data_hora",
+            "status",
+            "preco_final",
+            "observacoes",
+            "data_atualizacao",
+        ),
+        (),
+    ),
+    "clientes": (
+        Cliente,
+        (
+            "id",
+            "nome",
+            "telefone",
+            "email",
+            "endereco",
+            "data_nascimento",
+            "observacoes",
+            "data_atualizacao",
+        ),
+        (),
+    ),
+    "profissionais": (
+        Profissional,
+        (
+            "id",
+            "nome",
+            "telefone",
+            "email",
+            "horario_inicio",
+            "horario_fim",
+            "dias_semana",
+            "data_atualizacao",
+        ),
+        ("especialidades",),
+    ),
+    "servicos": (
+        Servico,
+        (
+            "id",
+            "nome",
+            "descricao",
+            "preco",
+            "duracao_minutos",
+            "categoria",
+            "data_atualizacao",
+        ),
+        (),
+    ),
+}
+
+
+class CursorExpirado(Exception):
+    """Cursor anterior a lápides já removidas: sincronizar do início"""
+
+
+class SincronizacaoService:
+    """Feed de alterações por model, paginado por chave (data_atualizacao, id)
+
+    Cada página traz os registros incluídos ou alterados depois do cursor e
+    as lápides (exclusões e inativações), na ordem da chave.
+    """
+
+    TAMANHO_PAGINA = 500
+    TAMANHO_MAXIMO = 2000
+
+    @staticmethod
+    def codificar_cursor(momento, pk, limpeza=None):
+        """Cursor opaco "<microssegundos>-<id>" (mesmo formato do histórico),
+        seguido de "-<microssegundos>" da última limpeza conhecida, se houver"""
+        cursor = f"{(momento - _EPOCA) // timedelta(microseconds=1)}-{pk}"
+        if limpeza is not None:
+            cursor += f"-{(limpeza - _EPOCA) // timedelta(microseconds=1)}"
+        return cursor
+
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """Retorna (momento, id, limpeza); ValueError se o cursor for inválido"""
+        micros, pk, *limpeza = cursor.split("-")
+        if len(limpeza) > 1:
+            raise ValueError(f"Cursor inválido: {cursor}")
+        try:
+            return (
+                _EPOCA + timedelta(microseconds=int(micros)),
+                int(pk),
+                _EPOCA + timedelta(microseconds=int(limpeza[0])) if limpeza else None,
+            )
+        except OverflowError:
+            raise ValueError(f"Cursor fora do intervalo: {cursor}")
+
+    @staticmethod
+    def registrar_exclusao(model, pk, using=None):
+        RegistroExcluido.objects.using(using).create(
+            modelo=model._meta.model_name, objeto_id=pk
+        )
+
+    @staticmethod
+    def limpar_exclusoes(dias=None):
+        """Remover lápides fora da retenção; retorna quantas foram removidas
+
+        Para cada model a última lápide removida fica registrada como marca
+        (objeto_id=0): cursores até ela perderam exclusões e expiram.
+        """
+        dias = settings.FEED_RETENCAO_DIAS if dias is None else dias
+        limite = timezone.now() - timedelta(days=dias)
+        antigas = RegistroExcluido.objects.filter(
+            data_exclusao__lt=limite, objeto_id__gt=0
+        )
+        with transaction.atomic(using=banco_escrita()):
+            marcas = antigas.values("modelo").annotate(ultima=Max("data_exclusao"))
+            for marca in marcas:
+                RegistroExcluido.objects.update_or_create(
+                    modelo=marca["modelo"],
+                    objeto_id=0,
+                    defaults={"data_exclusao": marca["ultima"]},
+                )
+            removidas, _ = antigas.delete()
+        return removidas
+
+    @staticmethod
+    def pagina(recurso, cursor=None, tamanho=None):
+        """{"campos", "itens", "excluidos", "cursor", "mais"} do recurso
+
+        itens são listas na ordem de campos; excluidos, IDs a remover (o
+        cliente aplica as exclusões antes dos itens). Duas consultas por
+        página, pelos índices (data_atualizacao, id) e da lápide.
+        """
+        model, campos, relacoes = FEEDS[recurso]
+        tamanho = min(
+            tamanho or SincronizacaoService.TAMANHO_PAGINA,
+            SincronizacaoService.TAMANHO_MAXIMO,
+        )
+        agora = timezone.now()
+        ate = agora - timedelta(seconds=settings.FEED_ATRASO_S)
+        ativo = any(campo.name == "ativo" for campo in model._meta.fields)
+        colunas = (*campos, "ativo") if ativo else campos
+        posicao_data = campos.index("data_atualizacao")
+
+        vivos = model.objects.filter(data_atualizacao__lt=ate)
+        lapides = RegistroExcluido.objects.filter(
+            modelo=model._meta.model_name, data_exclusao__lt=ate
+        )
+        limpeza = (
+            RegistroExcluido.objects.filter(
+                modelo=model._meta.model_name, objeto_id=0
+            )
+            .values_list("data_exclusao", flat=True)
+            .first()
+        )
+        if cursor:
+            momento, pk, conhecida = SincronizacaoService.decodificar_cursor(cursor)
+            # Expira só se lápides posteriores ao cursor foram removidas depois
+            # que ele foi emitido (quem começou após a limpeza não as tinha)
+            if limpeza and momento <= limpeza and conhecida != limpeza:
+                raise CursorExpirado(cursor)
+            vivos = vivos.filter(
+                Q(data_atualizacao__gt=momento) | Q(data_atualizacao=momento, id__gt=pk)
+            )
+            lapides = lapides.filter(
+                Q(data_exclusao__gt=momento)
+                | Q(data_exclusao=momento, objeto_id__gt=pk)
+            )
+
+        # tamanho + 1 de cada fonte basta para a intercalação e para "mais"
+        eventos = [
+            ((linha[posicao_data], linha[0]), linha)
+            for linha in vivos.order_by("data_atualizacao", "id").values_list(
+                *colunas
+            )[: tamanho + 1]
+        ] + [
+            (chave, None)
+            for chave in lapides.filter(objeto_id__gt=0)
+            .order_by("data_exclusao", "objeto_id")
+            .values_list("data_exclusao", "objeto_id")[: tamanho + 1]
+        ]
+        eventos.sort(key=lambda evento: evento[0])
+        mais = len(eventos) > tamanho
+        eventos = eventos[:tamanho]
+
+        itens, excluidos = [], []
+        for (_, pk), linha in eventos:
+            if linha is None or (ativo and not linha[-1]):
+                excluidos.append(pk)
+            else:
+                itens.append(list(linha[: len(campos)]))
+        for relacao in relacoes if itens else ():
+            SincronizacaoService._anexar_relacao(model, relacao, itens)
+
+        # Ao esgotar o feed o cursor avança até "ate" (nada anterior falta):
+        # assim o cursor de uma tabela parada não envelhece com os eventos
+        chave = eventos[-1][0] if mais else (ate, 0)
+        novo_cursor = SincronizacaoService.codificar_cursor(*chave, limpeza)
+        return {
+            "campos": [*campos, *relacoes],
+            "itens": itens,
+            "excluidos": excluidos,
+            "cursor": novo_cursor,
+            "mais": mais,
+        }
+
+    @staticmethod
+    def _anexar_relacao(model, nome, itens):
+        """Acrescentar a cada item a lista de IDs da relação m2m (uma consulta)"""
+        campo = model._meta.get_field(nome)
+        origem = f"{campo.m2m_field_name()}_id"
+        destino = f"{campo.m2m_reverse_field_name()}_id"
+        ids = {}
+        for pk, relacionado in (
+            campo.remote_field.through.objects.filter(
+                **{f"{origem}__in": [item[0] for item in itens]}
+            )
+            .order_by(destino)
+            .values_list(origem, destino)
+        ):
+            ids.setdefault(pk, []).append(relacionado)
+        for item in itens:
+            item.append(ids.get(item[0], []))
@@ -0,0 +1,169 @@
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from ..models import Agendamento
+from ..routers import banco_escrita
+from ..utils import get_inicio_do_dia, get_local_today
+from .metricas_service import MetricasService
+
+# Transições permitidas: status atual → status de destino
+TRANSICOES = {
+    "AGENDADO": ("CONFIRMADO", "EM_ANDAMENTO", "CANCELADO", "NAO_COMPARECEU"),
+    "CONFIRMADO": (
+        "AGENDADO",
+        "EM_ANDAMENTO",
+        "CONCLUIDO",
+        "CANCELADO",
+        "NAO_COMPARECEU",
+    ),
+    "EM_ANDAMENTO": ("CONCLUIDO",),
+    "CONCLUIDO": (),
+    "CANCELADO": (),
+    "NAO_COMPARECEU": (),
+}
+
+# Restrições adicionais por destino: (mensagem, filtro sobre o agendamento)
+RESTRICOES = {
+    "EM_ANDAMENTO": (
+        'Não é possível marcar como "Em Andamento" agendamentos de datas passadas',
+        lambda: models.Q(data_hora__gte=get_inicio_do_dia(get_local_today())),
+    ),
+}
+
+# Evento único emitido (dentro da transação) a cada mudança de status.
+# Argumentos: transicoes=[(agendamento_id, status_anterior)], novo_status,
+# usuario, momento. Receivers: histórico, contadores, caches.
+status_alterado = Signal()
+
+
+class TransicaoInvalida(ValueError):
+    """Transição de status não permitida ou concorrente"""
+
+
+class TransicaoService:
+    """Máquina de estados do agendamento com compare-and-set atômico"""
+
+    # Limite de parâmetros por UPDATE (compatível com SQLite antigo)
+    TAMANHO_LOTE = 900
+
+    @staticmethod
+    def destinos_permitidos(status_atual):
+        """Status para os quais o agendamento pode ir a partir do atual"""
+        return TRANSICOES.get(status_atual, ())
+
+    @staticmethod
+    def origens_permitidas(novo_status):
+        """Status a partir dos quais se chega ao novo status"""
+        return [
+            origem for origem, destinos in TRANSICOES.items() if novo_status in destinos
+        ]
+
+    @staticmethod
+    def validar(agendamento, novo_status):
+        """Levantar TransicaoInvalida se a transição não for permitida"""
+        if novo_status not in TRANSICOES:
+            raise TransicaoInvalida("Status inválido")
+
+        if novo_status not in TransicaoService.destinos_permitidos(agendamento.status):
+            raise TransicaoInvalida(
+                f"Não é possível alterar de {agendamento.get_status_display()} "
+                f"para {dict(Agendamento.STATUS_CHOICES)[novo_status]}"
+            )
+
+        restricao = RESTRICOES.get(novo_status)
+        if restricao and (
+            timezone.localtime(agendamento.data_hora).date() < get_local_today()
+        ):
+            raise TransicaoInvalida(restricao[0])
+
+    @staticmethod
+    def transicionar(agendamento, novo_status, usuario=None):
+        """Alterar o status com UPDATE ... WHERE id=? AND status=?
+
+        Grava apenas status e data_atualizacao; se outra operação alterou o
+        status nesse meio tempo, nenhuma linha é afetada e a transição falha
+        em vez de sobrescrever a outra alteração.
+        """
+        try:
+            TransicaoService.validar(agendamento, novo_status)
+        except TransicaoInvalida:
+            MetricasService.incrementar(
+                "salao_transicoes_recusadas_total", motivo="regra"
+            )
+            raise
+
+        status_anterior = agendamento.status
+        agora = timezone.now()
+        with transaction.atomic(using=banco_escrita()):
+            alterados = Agendamento.objects.filter(
+                pk=agendamento.pk, status=status_anterior
+            ).update(status=novo_status, data_atualizacao=agora)
+            if not alterados:
+                MetricasService.incrementar(
+                    "salao_transicoes_recusadas_total", motivo="concorrencia"
+                )
+                raise TransicaoInvalida(
+                    "O agendamento foi alterado por outra operação. "
+                    "Recarregue a página e tente novamente."
+                )
+
+            status_alterado.send(
+                sender=Agendamento,
+                transicoes=[(agendamento.pk, status_anterior)],
+                novo_status=novo_status,
+                usuario=usuario,
+                momento=agora,
+            )
+
+        agendamento.status = novo_status
+        agendamento.data_atualizacao = agora
+        return agendamento
+
+    @staticmethod
+    def transicionar_em_lote(agendamentos, novo_status, usuario=None):
+        """Alterar o status de vários agendamentos de uma vez
+
+        Aceita um queryset ou uma lista de IDs. Só são alterados os
+        agendamentos cujo status atual permite a transição; os IDs afetados
+        são capturados (com bloqueio de linha onde o banco suporta) na mesma
+        transação do UPDATE condicional. Retorna a lista de IDs alterados.
+        """
+        if novo_status not in TRANSICOES:
+            raise TransicaoInvalida("Status inválido")
+        origens = TransicaoService.origens_permitidas(novo_status)
+
+        if isinstance(agendamentos, models.QuerySet):
+            queryset = agendamentos
+        else:
+            queryset = Agendamento.objects.filter(pk__in=list(agendamentos))
+
+        queryset = queryset.filter(status__in=origens)
+        restricao = RESTRICOES.get(novo_status)
+        if restricao:
+            queryset = queryset.filter(restricao[1]())
+
+        agora = timezone.now()
+        with transaction.atomic(using=banco_escrita()):
+            afetados = list(
+                queryset.select_for_update().order_by().values_list("id", "status")
+            )
+            if not afetados:
+                return []
+
+            tamanho = TransicaoService.TAMANHO_LOTE
+            for inicio in range(0, len(afetados), tamanho):
+                ids = [pk for pk, _ in afetados[inicio : inicio + tamanho]]
+                Agendamento.objects.filter(pk__in=ids, status__in=origens).update(
+                    status=novo_status, data_atualizacao=agora
+                )
+
+            status_alterado.send(
+                sender=Agendamento,
+                transicoes=afetados,
+                novo_status=novo_status,
+                usuario=usuario,
+                momento=agora,
+            )
+
+        return [pk for pk, _ in afetados]
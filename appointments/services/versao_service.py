@@ -0,0 +1,28 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+
+class VersaoService:
+    """Versões de conjuntos de registros (ETags e chaves de cache)
+
+    Todo save grava data_atualizacao (auto_now, e as atualizações em lote
+    também a preenchem): registros incluídos ou alterados aumentam a última
+    alteração do conjunto e os excluídos diminuem a quantidade.
+    """
+
+    @staticmethod
+    def do_conjunto(queryset, campo="data_atualizacao"):
+        """(última alteração, quantidade) do conjunto filtrado, em uma consulta"""
+        resultado = queryset.order_by().aggregate(ultima=Max(campo), total=Count("pk"))
+        return resultado["ultima"], resultado["total"]
+
+    @staticmethod
+    def ultima_alteracao(model):
+        """Última alteração da tabela inteira (MAX pelo índice)"""
+        return model.objects.aggregate(ultima=Max("data_atualizacao"))["ultima"]
+
+    @staticmethod
+    def etag(*partes):
+        """ETag (sem aspas) a partir das partes que definem o conteúdo"""
+        return hashlib.md5(repr(partes).encode(), usedforsecurity=False).hexdigest()
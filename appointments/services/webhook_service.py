@@ -0,0 +1,210 @@
+import hashlib
+import hmac
+import json
+import random
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from http.client import HTTPException
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import EventoSaida
+from ..saloes import salao_atual
+
+TIPOS_EVENTO = (
+    "agendamento.criado",
+    "agendamento.reagendado",
+    "agendamento.status_alterado",
+)
+
+
+class WebhookService:
+    """Tabela de saída (outbox) e entrega dos eventos aos webhooks
+
+    publicar() só grava linhas na transação corrente; a rede fica com o
+    comando despachar_webhooks, que usa reservar/enviar/confirmar/adiar.
+    A entrega é "pelo menos uma vez": o destino deduplica pelo id do evento.
+    """
+
+    @staticmethod
+    def destinos(tipo):
+        """Webhooks configurados que assinam o tipo de evento"""
+        return [
+            nome
+            for nome, destino in settings.WEBHOOKS.items()
+            if tipo in destino.get("eventos", TIPOS_EVENTO)
+        ]
+
+    @staticmethod
+    def concorrencia(destino):
+        return int(
+            settings.WEBHOOKS[destino].get(
+                "concorrencia", settings.WEBHOOK_CONCORRENCIA
+            )
+        )
+
+    @staticmethod
+    def dados_agendamento(agendamento):
+        return {
+            "cliente_id": agendamento.cliente_id,
+            "profissional_id": agendamento.profissional_id,
+            "servico_id": agendamento.servico_id,
+            "data_hora": timezone.localtime(agendamento.data_hora).isoformat(),
+            "status": agendamento.status,
+        }
+
+    @staticmethod
+    def publicar(tipo, eventos):
+        """Gravar eventos [(agendamento_id, dados)] para cada destino
+
+        Chamar dentro do transaction.atomic da alteração: o evento só existe
+        se a alteração for confirmada. Sem destinos não há consulta.
+        """
+        destinos = WebhookService.destinos(tipo)
+        if not destinos or not eventos:
+            return
+        agora = timezone.now()
+        EventoSaida.objects.bulk_create(
+            [
+                EventoSaida(
+                    destino=destino,
+                    tipo=tipo,
+                    objeto_id=pk,
+                    dados=dados,
+                    proxima_tentativa=agora,
+                    data_criacao=agora,
+                )
+                for destino in destinos
+                for pk, dados in eventos
+            ]
+        )
+
+    # Despacho
+
+    @staticmethod
+    def reservar(destino, limite):
+        """Pendentes vencidos do destino, reservados (proxima_tentativa
+        adiada) para que outro despachante não os envie ao mesmo tempo"""
+        agora = timezone.now()
+        pendentes = EventoSaida.objects.filter(
+            destino=destino,
+            status=EventoSaida.Status.PENDENTE,
+            proxima_tentativa__lte=agora,
+        )
+        ordem = pendentes.order_by("proxima_tentativa", "id")
+        ids = list(ordem.values_list("id", flat=True)[:limite])
+        if not ids:
+            return []
+        # Se o despachante cair, os eventos voltam para a fila após o prazo
+        prazo = agora + timedelta(seconds=settings.WEBHOOK_TIMEOUT_S * 3)
+        pendentes.filter(pk__in=ids).update(proxima_tentativa=prazo)
+        reservados = EventoSaida.objects.filter(pk__in=ids, proxima_tentativa=prazo)
+        return list(reservados.order_by("id"))
+
+    @staticmethod
+    def corpo(eventos):
+        """JSON de um lote (montado com o salão ativo, fora das threads)"""
+        return json.dumps(
+            {
+                "salao": salao_atual(),
+                "eventos": [
+                    {
+                        "id": evento.pk,
+                        "tipo": evento.tipo,
+                        "agendamento_id": evento.objeto_id,
+                        "data": evento.data_criacao.isoformat(),
+                        "tentativa": evento.tentativas + 1,
+                        "dados": evento.dados,
+                    }
+                    for evento in eventos
+                ],
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+    @staticmethod
+    def enviar(destino, corpo):
+        """POST do lote; retorna (erro, espera mínima em s) ou (None, None)
+
+        Não acessa o banco: roda nas threads do despachante.
+        """
+        configuracao = settings.WEBHOOKS[destino]
+        cabecalhos = {
+            "Content-Type": "application/json",
+            "User-Agent": "salon-management-webhooks",
+        }
+        if configuracao.get("segredo"):
+            assinatura = hmac.new(
+                configuracao["segredo"].encode(), corpo, hashlib.sha256
+            ).hexdigest()
+            cabecalhos["X-Webhook-Assinatura"] = f"sha256={assinatura}"
+        requisicao = Request(
+            configuracao["url"], data=corpo, headers=cabecalhos, method="POST"
+        )
+        try:
+            with urlopen(requisicao, timeout=settings.WEBHOOK_TIMEOUT_S) as resposta:
+                resposta.read()
+        except HTTPError as erro:
+            return f"HTTP {erro.code}", WebhookService._retry_after(erro.headers)
+        except (URLError, OSError, HTTPException) as erro:
+            motivo = str(getattr(erro, "reason", erro)) or type(erro).__name__
+            return motivo[:200], None
+        return None, None
+
+    @staticmethod
+    def _retry_after(cabecalhos):
+        """Segundos do cabeçalho Retry-After (429/503), se houver"""
+        valor = cabecalhos.get("Retry-After") if cabecalhos else None
+        if not valor:
+            return None
+        if valor.strip().isdigit():
+            return float(valor)
+        try:
+            momento = parsedate_to_datetime(valor)
+            return max((momento - timezone.now()).total_seconds(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def confirmar(eventos):
+        EventoSaida.objects.filter(pk__in=[evento.pk for evento in eventos]).update(
+            status=EventoSaida.Status.ENTREGUE,
+            tentativas=F("tentativas") + 1,
+            data_entrega=timezone.now(),
+            ultimo_erro="",
+        )
+
+    @staticmethod
+    def adiar(eventos, erro, espera_minima=None):
+        """Nova tentativa com backoff exponencial (com jitter); após
+        WEBHOOK_MAX_TENTATIVAS o evento fica como FALHOU"""
+        agora = timezone.now()
+        grupos = {}
+        for evento in eventos:
+            grupos.setdefault(evento.tentativas + 1, []).append(evento.pk)
+        for tentativas, ids in grupos.items():
+            atualizacao = {"tentativas": tentativas, "ultimo_erro": erro[:200]}
+            if tentativas >= settings.WEBHOOK_MAX_TENTATIVAS:
+                atualizacao["status"] = EventoSaida.Status.FALHOU
+            else:
+                espera = min(
+                    settings.WEBHOOK_BACKOFF_S * 2 ** (tentativas - 1),
+                    settings.WEBHOOK_BACKOFF_MAX_S,
+                ) * random.uniform(0.5, 1)
+                espera = max(espera, espera_minima or 0)
+                atualizacao["proxima_tentativa"] = agora + timedelta(seconds=espera)
+            EventoSaida.objects.filter(pk__in=ids).update(**atualizacao)
+
+    @staticmethod
+    def limpar_entregues(dias=None):
+        """Remover eventos entregues fora da retenção; retorna quantos"""
+        dias = settings.WEBHOOK_RETENCAO_DIAS if dias is None else dias
+        removidos, _ = EventoSaida.objects.filter(
+            status=EventoSaida.Status.ENTREGUE,
+            data_entrega__lt=timezone.now() - timedelta(days=dias),
+        ).delete()
+        return removidos
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Agendamento, Cliente, HistoricoAgendamento, Profissional, Servico
+from .services.auditoria_service import AuditoriaService
+from .services.compatibilidade_service import CompatibilidadeService
+from .services.metricas_service import MetricasService
+from .services.rastreamento_service import RastreamentoService
+from .services.referencia_service import ReferenciaService
+from .services.sincronizacao_service import SincronizacaoService
+from .services.transicao_service import status_alterado
+from .services.webhook_service import WebhookService
+
+
+@receiver(m2m_changed, sender=Profissional.especialidades.through)
+def especialidades_alteradas(sender, action, **kwargs):
+    """Reconstruir a matriz de compatibilidade quando as especialidades mudam"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        CompatibilidadeService.invalidar()
+
+
+@receiver(m2m_changed, sender=Profissional.especialidades.through)
+def profissionais_alterados(sender, action, instance, reverse, pk_set, **kwargs):
+    """Especialidades fazem parte do profissional no feed de alterações (e nas
+    ETags): atualizar data_atualizacao dos profissionais afetados"""
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        ids = [instance.pk]
+    elif reverse and action in ("post_add", "post_remove"):
+        ids = pk_set
+    elif reverse and action == "pre_clear":
+        # Depois do clear não há como saber quais profissionais tinham o serviço
+        ids = list(
+            sender.objects.filter(servico_id=instance.pk).values_list(
+                "profissional_id", flat=True
+            )
+        )
+    else:
+        return
+    Profissional.objects.filter(pk__in=ids).update(data_atualizacao=timezone.now())
+
+
+@receiver(post_save, sender=Servico)
+@receiver(post_delete, sender=Servico)
+@receiver(post_delete, sender=Profissional)
+def referencia_alterada(sender, **kwargs):
+    """Categoria alterada ou remoção em cascata da tabela intermediária"""
+    CompatibilidadeService.invalidar()
+
+
+@receiver(post_save, sender=Servico)
+@receiver(post_delete, sender=Servico)
+@receiver(post_save, sender=Profissional)
+@receiver(post_delete, sender=Profissional)
+def dados_referencia_alterados(sender, **kwargs):
+    """Invalidar o cache de profissionais e serviços"""
+    ReferenciaService.invalidar()
+
+
+@receiver(post_delete, sender=Agendamento)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Profissional)
+@receiver(post_delete, sender=Servico)
+def registrar_exclusao(sender, instance, using, **kwargs):
+    """Lápide para o feed de alterações (inclui exclusões em cascata e o
+    arquivamento de agendamentos)"""
+    SincronizacaoService.registrar_exclusao(sender, instance.pk, using)
+
+
+@receiver(status_alterado, sender=Agendamento)
+def registrar_historico_status(sender, transicoes, novo_status, usuario, **kwargs):
+    """Registrar o histórico de todas as transições de uma vez"""
+    AuditoriaService.registrar_varios(
+        [
+            {
+                "agendamento_id": agendamento_id,
+                "tipo_acao": HistoricoAgendamento.TipoAcao.STATUS_ALTERADO,
+                "status_anterior": status_anterior,
+                "status_novo": novo_status,
+                "usuario": usuario,
+            }
+            for agendamento_id, status_anterior in transicoes
+        ]
+    )
+
+
+@receiver(status_alterado, sender=Agendamento)
+def publicar_status(sender, transicoes, novo_status, **kwargs):
+    """Eventos de webhook na mesma transação da mudança de status"""
+    WebhookService.publicar(
+        "agendamento.status_alterado",
+        [
+            (agendamento_id, {"status_anterior": anterior, "status": novo_status})
+            for agendamento_id, anterior in transicoes
+        ],
+    )
+
+
+@receiver(post_save, sender=Agendamento)
+def contar_agendamento_criado(sender, created, **kwargs):
+    if created:
+        MetricasService.incrementar("salao_agendamentos_criados_total")
+
+
+@receiver(status_alterado, sender=Agendamento)
+def contar_transicoes(sender, transicoes, novo_status, **kwargs):
+    MetricasService.incrementar(
+        "salao_transicoes_status_total", len(transicoes), status=novo_status
+    )
+
+
+@receiver(connection_created)
+def rastrear_consultas(sender, connection, **kwargs):
+    """Spans das consultas SQL (o wrapper não faz nada fora de um rastro)"""
+    if RastreamentoService.consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, RastreamentoService.consulta)
+
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    """Pragmas do perfil de produção (settings.SQLITE_PRAGMAS)"""
+    if connection.vendor != "sqlite" or connection.is_in_memory_db():
+        return
+    somente_leitura = "mode=ro" in str(connection.settings_dict["NAME"])
+    with connection.cursor() as cursor:
+        for pragma, valor in settings.SQLITE_PRAGMAS.items():
+            # Só o primário pode mudar o journal_mode do arquivo
+            if pragma == "journal_mode" and somente_leitura:
+                continue
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
@@ -0,0 +1,11 @@
+from django import template
+
+from ..services.compatibilidade_service import CompatibilidadeService
+
+register = template.Library()
+
+
+@register.simple_tag
+def categorias_profissional(profissional):
+    """Categorias das especialidades do profissional, lidas da matriz em cache"""
+    return CompatibilidadeService.categorias_do_profissional(profissional.pk)
@@ -0,0 +1,19 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from ..services.estaticos_service import EstaticosService
+
+register = template.Library()
+
+
+@register.simple_tag
+def pacote(nome):
+    """<link> ou <script> do pacote (settings.PACOTES_ESTATICOS): o arquivo
+    montado com ESTATICOS_EMPACOTADOS, senão um por arquivo de origem"""
+    if nome.endswith(".css"):
+        modelo = '<link rel="stylesheet" href="{}">'
+    else:
+        modelo = '<script src="{}"></script>'
+    arquivos = EstaticosService.arquivos(nome)
+    return format_html_join("\n", modelo, ((static(a),) for a in arquivos))
@@ -1,13 +1,85 @@
+import hashlib
+import hmac
+import json
+import os
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-from django.test import Client, TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from salon_management.db.sqlite3.base import DatabaseWrapper
 
 from .forms import AgendamentoForm
-from .models import Agendamento, Cliente, Profissional, Servico
-from .utils import get_local_now, get_local_today
+from .management.commands.benchmark import percentil
+from .middleware import (
+    LeituraReplicaMiddleware,
+    ReferenciaCacheMiddleware,
+    SalaoMiddleware,
+)
+from .models import (
+    Agendamento,
+    AgendamentoArquivado,
+    Cliente,
+    EventoSaida,
+    HistoricoAgendamento,
+    HistoricoAgendamentoArquivado,
+    Profissional,
+    RegistroExcluido,
+    ResumoDiarioServico,
+    Servico,
+)
+from .routers import (
+    CHAVE_SESSAO,
+    LeituraEscritaRouter,
+    alias_leitura,
+    banco_escrita,
+    ler_da_replica,
+)
+from .saloes import ativar_salao, salao_atual
+from .services import auditoria_service
+from .services.agendamento_service import AgendamentoService
+from .services.arquivo_service import ArquivoService
+from .services.auditoria_service import AuditoriaService
+from .services.calendario_service import CalendarioService
+from .services.compatibilidade_service import CompatibilidadeService
+from .services.estaticos_service import EstaticosService
+from .services.historico_service import HistoricoService
+from .services.metricas_service import MetricasService
+from .services.plano_service import PlanoService
+from .services.rastreamento_service import RastreamentoService
+from .services.referencia_service import ReferenciaService
+from .services.relatorio_service import RelatorioService
+from .services.sincronizacao_service import SincronizacaoService
+from .services.transicao_service import TransicaoInvalida, TransicaoService
+from .services.webhook_service import WebhookService
+from .urls import urlpatterns
+from .utils import get_local_now, get_local_today, normalizar_sql
+from .views import api, api_async
 
 
 class ClienteModelTest(TestCase):
@@ -227,3 +299,1990 @@ class RelatorioViewTest(TestCase):
         response = client.get(reverse("appointments:relatorio_servicos"))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Relatório")
+
+
+class CompatibilidadeServiceTest(TestCase):
+    """Testes para a matriz de compatibilidade profissional → serviços"""
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            nome="Cliente Matriz", telefone="(11) 99999-9999"
+        )
+        self.corte = Servico.objects.create(
+            nome="Corte", preco=Decimal("30.00"), categoria="CABELO"
+        )
+        self.manicure = Servico.objects.create(
+            nome="Manicure", preco=Decimal("25.00"), categoria="UNHAS"
+        )
+        self.profissional = Profissional.objects.create(
+            nome="Prof Matriz", telefone="(11) 88888-8888", dias_semana="1,2,3,4,5,6,7"
+        )
+        self.profissional.especialidades.add(self.corte)
+
+    def test_matriz_reconstruida_quando_especialidades_mudam(self):
+        """Testa invalidação da matriz pelo sinal m2m_changed"""
+        self.assertTrue(
+            CompatibilidadeService.profissional_realiza(
+                self.profissional.pk, self.corte.pk
+            )
+        )
+        self.assertFalse(
+            CompatibilidadeService.profissional_realiza(
+                self.profissional.pk, self.manicure.pk
+            )
+        )
+
+        self.profissional.especialidades.add(self.manicure)
+        self.assertEqual(
+            CompatibilidadeService.categorias_do_profissional(self.profissional.pk),
+            ("CABELO", "UNHAS"),
+        )
+
+    def test_validacao_sem_consultas_com_cache_aquecido(self):
+        """Testa que a verificação não consulta o banco com a matriz em cache"""
+        CompatibilidadeService.get_matriz()
+        with self.assertNumQueries(0):
+            CompatibilidadeService.profissional_realiza(
+                self.profissional.pk, self.corte.pk
+            )
+
+    def test_form_rejeita_servico_nao_realizado(self):
+        """Testa que o formulário recusa serviço fora das especialidades"""
+        amanha = get_local_today() + timedelta(days=1)
+        form = AgendamentoForm(
+            data={
+                "cliente": self.cliente.id,
+                "profissional": self.profissional.id,
+                "servico": self.manicure.id,
+                "data": amanha,
+                "hora": time(10, 0),
+            }
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("não realiza o serviço", str(form.errors))
+
+    def test_service_rejeita_servico_nao_realizado(self):
+        """Testa que o service recusa serviço fora das especialidades"""
+        amanha = get_local_today() + timedelta(days=1)
+        data_hora = timezone.make_aware(datetime.combine(amanha, time(10, 0)))
+        with self.assertRaises(ValueError):
+            AgendamentoService.criar_agendamento(
+                self.cliente, self.profissional, self.manicure, data_hora
+            )
+
+    def test_api_compatibilidade(self):
+        """Testa o documento JSON da matriz e o ETag por versão"""
+        client = Client()
+        response = client.get(reverse("appointments:api_compatibilidade"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["matriz"][str(self.profissional.pk)], [self.corte.pk]
+        )
+
+        response = client.get(
+            reverse("appointments:api_compatibilidade"),
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class ReferenciaServiceTest(TestCase):
+    """Testes para o cache de dados de referência"""
+
+    def setUp(self):
+        self.servico = Servico.objects.create(
+            nome="Escova", preco=Decimal("35.00"), categoria="CABELO"
+        )
+        self.profissional = Profissional.objects.create(
+            nome="Prof Referência", telefone="(11) 88888-8888", dias_semana="1,2,3,4,5,6,7"
+        )
+        self.profissional.especialidades.add(self.servico)
+        self.cliente = Cliente.objects.create(
+            nome="Cliente Referência", telefone="(11) 99999-9999"
+        )
+
+    def test_mapa_de_identidade_por_requisicao(self):
+        """Testa que a mesma requisição reutiliza os objetos sem novas consultas"""
+        token = ReferenciaService.iniciar_requisicao()
+        try:
+            primeiro = ReferenciaService.profissionais_ativos()
+            ReferenciaService.servicos_ativos()
+            with self.assertNumQueries(0):
+                segundo = ReferenciaService.profissionais_ativos()
+                ReferenciaService.servico(self.servico.pk)
+            self.assertIs(primeiro[0], segundo[0])
+        finally:
+            ReferenciaService.encerrar_requisicao(token)
+
+    def test_invalidacao_ao_salvar(self):
+        """Testa que salvar um serviço invalida o cache do processo"""
+        self.assertEqual(ReferenciaService.servico(self.servico.pk).nome, "Escova")
+        self.servico.nome = "Escova Progressiva"
+        self.servico.save()
+        self.assertEqual(
+            ReferenciaService.servico(self.servico.pk).nome, "Escova Progressiva"
+        )
+
+    def test_criacao_pelo_formulario(self):
+        """Testa que o formulário valida as escolhas lidas do cache"""
+        amanha = get_local_today() + timedelta(days=1)
+        response = Client().post(
+            reverse("appointments:agendamento_create"),
+            {
+                "cliente": self.cliente.id,
+                "profissional": self.profissional.id,
+                "servico": self.servico.id,
+                "data": amanha.strftime("%Y-%m-%d"),
+                "hora": "10:00",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        agendamento = Agendamento.objects.get()
+        self.assertEqual(agendamento.preco_final, Decimal("35.00"))
+
+
+class AlteracaoStatusEmLoteTest(TestCase):
+    """Testes para a alteração de status em lote"""
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome="Cliente Lote", telefone="(11) 99999-9999")
+        servico = Servico.objects.create(
+            nome="Corte Lote", preco=Decimal("30.00"), categoria="CABELO"
+        )
+        profissional = Profissional.objects.create(
+            nome="Prof Lote", telefone="(11) 88888-8888"
+        )
+        inicio = timezone.make_aware(
+            datetime.combine(get_local_today() - timedelta(days=400), time(8, 0))
+        )
+        Agendamento.objects.bulk_create(
+            [
+                Agendamento(
+                    cliente=cliente,
+                    profissional=profissional,
+                    servico=servico,
+                    data_hora=inicio + timedelta(hours=i),
+                    status="CONFIRMADO" if i % 3 else "AGENDADO",
+                    preco_final=servico.preco,
+                )
+                for i in range(300)
+            ]
+        )
+
+    def test_lote_com_numero_fixo_de_consultas(self):
+        """Testa que 300 agendamentos são concluídos em poucas consultas"""
+        with CaptureQueriesContext(connection) as consultas:
+            alterados = AgendamentoService.alterar_status_em_lote(
+                Agendamento.objects.all(), "CONCLUIDO"
+            )
+        # savepoint, select, update, inserts (limite de parâmetros do SQLite), release
+        self.assertLessEqual(len(consultas), 6)
+
+        self.assertEqual(len(alterados), 200)
+        self.assertEqual(Agendamento.objects.filter(status="CONCLUIDO").count(), 200)
+        self.assertEqual(Agendamento.objects.filter(status="AGENDADO").count(), 100)
+        self.assertEqual(
+            HistoricoAgendamento.objects.filter(
+                status_anterior=HistoricoAgendamento.Status.CONFIRMADO,
+                status_novo=HistoricoAgendamento.Status.CONCLUIDO,
+            ).count(),
+            200,
+        )
+
+    def test_api_status_lote(self):
+        """Testa o endpoint JSON de alteração em lote"""
+        ids = list(Agendamento.objects.values_list("id", flat=True)[:3])
+        response = Client().post(
+            reverse("appointments:api_alterar_status_lote"),
+            data={"ids": ids, "status": "CANCELADO"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()["alterados"]), sorted(ids))
+        self.assertEqual(response.json()["ignorados"], [])
+
+        for corpo in ("[1, 2]", "null", '"ids"'):
+            response = Client().post(
+                reverse("appointments:api_alterar_status_lote"),
+                data=corpo,
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400, corpo)
+            self.assertEqual(response.json()["error"], "JSON inválido")
+
+    def test_status_invalido(self):
+        """Testa que destinos não suportados são recusados"""
+        with self.assertRaises(ValueError):
+            AgendamentoService.alterar_status_em_lote([1], "INEXISTENTE")
+
+
+class TransicaoServiceTest(TestCase):
+    """Testes da máquina de estados do agendamento"""
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome="Cliente CAS", telefone="(11) 99999-9999")
+        servico = Servico.objects.create(
+            nome="Corte CAS", preco=Decimal("30.00"), categoria="CABELO"
+        )
+        profissional = Profissional.objects.create(
+            nome="Prof CAS", telefone="(11) 88888-8888"
+        )
+        self.agendamento = Agendamento.objects.create(
+            cliente=cliente,
+            profissional=profissional,
+            servico=servico,
+            data_hora=timezone.now() + timedelta(days=1),
+        )
+
+    def test_transicao_grava_status_e_historico(self):
+        """Testa que a transição atualiza o status e registra o histórico"""
+        recepcao = User.objects.create_user(username="recepcao")
+        TransicaoService.transicionar(self.agendamento, "CONFIRMADO", usuario=recepcao)
+
+        self.agendamento.refresh_from_db()
+        self.assertEqual(self.agendamento.status, "CONFIRMADO")
+        historico = HistoricoAgendamento.objects.get(
+            tipo_acao=HistoricoAgendamento.TipoAcao.STATUS_ALTERADO
+        )
+        self.assertEqual(historico.status_anterior_nome, "AGENDADO")
+        self.assertEqual(historico.descricao, "Cliente confirmou o agendamento")
+        self.assertEqual(historico.descricao_personalizada, "")
+        self.assertEqual(historico.nome_usuario, "recepcao")
+
+    def test_transicao_nao_permitida(self):
+        """Testa que status terminais não podem ser alterados"""
+        TransicaoService.transicionar(self.agendamento, "CANCELADO")
+        with self.assertRaises(TransicaoInvalida):
+            TransicaoService.transicionar(self.agendamento, "CONFIRMADO")
+
+    def test_conflito_concorrente(self):
+        """Testa que uma cópia desatualizada não sobrescreve outra alteração"""
+        copia = Agendamento.objects.get(pk=self.agendamento.pk)
+        TransicaoService.transicionar(self.agendamento, "CANCELADO")
+
+        with self.assertRaises(TransicaoInvalida):
+            TransicaoService.transicionar(copia, "CONFIRMADO")
+
+        self.agendamento.refresh_from_db()
+        self.assertEqual(self.agendamento.status, "CANCELADO")
+        self.assertEqual(
+            HistoricoAgendamento.objects.filter(
+                tipo_acao=HistoricoAgendamento.TipoAcao.STATUS_ALTERADO
+            ).count(),
+            1,
+        )
+
+    def test_view_recusa_transicao_invalida(self):
+        """Testa a resposta AJAX da view para transições não permitidas"""
+        response = Client().post(
+            reverse("appointments:atualizar_status", args=[self.agendamento.pk]),
+            {"status": "CONCLUIDO"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.assertFalse(response.json()["success"])
+        self.agendamento.refresh_from_db()
+        self.assertEqual(self.agendamento.status, "AGENDADO")
+
+
+class AuditoriaServiceTest(TestCase):
+    """Testes do pipeline de auditoria"""
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome="Cliente Spool", telefone="(11) 99999-9999")
+        servico = Servico.objects.create(
+            nome="Corte Spool", preco=Decimal("30.00"), categoria="CABELO"
+        )
+        profissional = Profissional.objects.create(
+            nome="Prof Spool", telefone="(11) 88888-8888"
+        )
+        self.agendamento = Agendamento.objects.create(
+            cliente=cliente,
+            profissional=profissional,
+            servico=servico,
+            data_hora=timezone.now() + timedelta(days=1),
+        )
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+
+    def test_modo_sincrono_grava_na_hora(self):
+        """Testa que o modo padrão grava o histórico imediatamente"""
+        AuditoriaService.registrar(
+            self.agendamento.pk,
+            HistoricoAgendamento.TipoAcao.CRIADO,
+            descricao=HistoricoAgendamento.descricao_criacao(self.agendamento),
+        )
+
+        historico = HistoricoAgendamento.objects.get()
+        self.assertEqual(
+            historico.descricao, "Agendamento criado para Cliente Spool com Prof Spool"
+        )
+        self.assertEqual(historico.nome_usuario, "Sistema")
+
+        # Renomear o cliente não reescreve o histórico
+        self.agendamento.cliente.nome = "Cliente Renomeado"
+        self.agendamento.cliente.save()
+        historico = HistoricoAgendamento.objects.get()
+        self.assertEqual(
+            historico.descricao, "Agendamento criado para Cliente Spool com Prof Spool"
+        )
+
+    def test_spool_grava_apos_commit_e_descarregar(self):
+        """Testa que o spool grava em lote só os eventos confirmados"""
+        with self.settings(
+            AUDITORIA_MODO="spool", AUDITORIA_SPOOL_DIR=self.diretorio.name
+        ), mock.patch.object(AuditoriaService, "_iniciar_thread"):
+            with self.captureOnCommitCallbacks(execute=True):
+                AuditoriaService.registrar(
+                    self.agendamento.pk,
+                    HistoricoAgendamento.TipoAcao.CRIADO,
+                    descricao="Criado pela importação",
+                )
+                AuditoriaService.registrar(999999, HistoricoAgendamento.TipoAcao.CRIADO)
+                # Já está no disco antes do commit
+                self.assertEqual(len(os.listdir(self.diretorio.name)), 1)
+            self.assertEqual(HistoricoAgendamento.objects.count(), 0)
+
+            self.assertEqual(AuditoriaService.descarregar(), 1)
+
+        self.assertEqual(
+            HistoricoAgendamento.objects.get().descricao, "Criado pela importação"
+        )
+        self.assertEqual(os.listdir(self.diretorio.name), [])
+
+    def test_spool_sem_confirmacao(self):
+        """Testa que eventos sem commit esperam no processo em execução (e
+        são descartados após o prazo) e são recuperados de um processo que
+        caiu logo após o commit"""
+        with self.settings(
+            AUDITORIA_MODO="spool", AUDITORIA_SPOOL_DIR=self.diretorio.name
+        ), mock.patch.object(AuditoriaService, "_iniciar_thread"):
+            with self.captureOnCommitCallbacks(execute=False):
+                AuditoriaService.registrar(
+                    self.agendamento.pk, HistoricoAgendamento.TipoAcao.DADOS_ALTERADOS
+                )
+            self.assertEqual(AuditoriaService.descarregar(), 0)
+            self.assertEqual(len(os.listdir(self.diretorio.name)), 1)
+
+            depois = timezone.now() + timedelta(
+                seconds=auditoria_service.PRAZO_TRANSACAO_S + 1
+            )
+            with mock.patch("django.utils.timezone.now", return_value=depois):
+                self.assertEqual(AuditoriaService.descarregar(), 0)
+            self.assertEqual(os.listdir(self.diretorio.name), [])
+
+            with self.captureOnCommitCallbacks(execute=False):
+                AuditoriaService.registrar(
+                    self.agendamento.pk, HistoricoAgendamento.TipoAcao.DADOS_ALTERADOS
+                )
+            (arquivo,) = os.listdir(self.diretorio.name)
+            os.rename(
+                os.path.join(self.diretorio.name, arquivo),
+                os.path.join(self.diretorio.name, "auditoria-999999999.jsonl"),
+            )
+            self.assertEqual(AuditoriaService.recuperar_orfaos(), 1)
+
+    def test_recupera_spool_de_processo_encerrado(self):
+        """Testa a recuperação de arquivos deixados por um processo que caiu"""
+        evento = {
+            "agendamento_id": self.agendamento.pk,
+            "tipo_acao": HistoricoAgendamento.TipoAcao.CRIADO,
+            "data_acao": timezone.now().isoformat(),
+        }
+        caminho = os.path.join(self.diretorio.name, "auditoria-999999999.jsonl")
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            arquivo.write(json.dumps(evento) + "\n")
+            arquivo.write('{"agendamento_id": ')  # linha truncada pela queda
+
+        with self.settings(AUDITORIA_SPOOL_DIR=self.diretorio.name), self.assertLogs(
+            "appointments.services.auditoria_service", "WARNING"
+        ):
+            call_command("flush_auditoria", stdout=StringIO())
+
+        self.assertEqual(HistoricoAgendamento.objects.count(), 1)
+        self.assertFalse(os.path.exists(caminho))
+
+
+class ArquivamentoTest(TestCase):
+    """Testes do arquivamento de agendamentos antigos"""
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome="Cliente Antigo", telefone="(11) 99999-9999")
+        self.servico = Servico.objects.create(
+            nome="Corte Antigo", preco=Decimal("40.00"), categoria="CABELO"
+        )
+        self.profissional = Profissional.objects.create(
+            nome="Prof Antigo", telefone="(11) 88888-8888"
+        )
+        self.dia_antigo = get_local_today() - timedelta(days=400)
+        inicio = timezone.make_aware(datetime.combine(self.dia_antigo, time(9, 0)))
+        for i, status in enumerate(["CONCLUIDO", "CONCLUIDO", "CANCELADO", "AGENDADO"]):
+            agendamento = Agendamento.objects.create(
+                cliente=cliente,
+                profissional=self.profissional,
+                servico=self.servico,
+                data_hora=inicio + timedelta(hours=i),
+                status=status,
+            )
+            AuditoriaService.registrar(
+                agendamento.pk, HistoricoAgendamento.TipoAcao.CRIADO, status_novo=status
+            )
+
+    def test_arquivamento_em_lotes(self):
+        """Testa que só finalizados antigos saem das tabelas principais"""
+        call_command("arquivar_agendamentos", "--meses=6", "--lote=2", stdout=StringIO())
+
+        self.assertEqual(Agendamento.objects.get().status, "AGENDADO")
+        self.assertEqual(AgendamentoArquivado.objects.count(), 3)
+        self.assertEqual(HistoricoAgendamento.objects.count(), 1)
+        self.assertEqual(HistoricoAgendamentoArquivado.objects.count(), 3)
+
+        resumo = ResumoDiarioServico.objects.get()
+        self.assertEqual(resumo.data, self.dia_antigo)
+        self.assertEqual((resumo.total, resumo.receita), (2, Decimal("80.00")))
+
+    def test_relatorio_soma_dados_arquivados(self):
+        """Testa que o relatório cobre períodos anteriores à data de corte"""
+        call_command("arquivar_agendamentos", "--meses=6", stdout=StringIO())
+
+        response = Client().get(
+            reverse("appointments:relatorio_servicos"),
+            {
+                "data_inicio": self.dia_antigo.isoformat(),
+                "data_fim": get_local_today().isoformat(),
+            },
+        )
+        stats = response.context["stats_gerais"]
+        self.assertEqual(stats["total_agendamentos"], 2)
+        self.assertEqual(stats["receita_total"], Decimal("80.00"))
+        self.assertEqual(response.context["servicos_stats"][0]["total_servicos"], 2)
+
+
+class HistoricoTimelineTest(TestCase):
+    """Testes da linha do tempo paginada do histórico"""
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome="Cliente Linha", telefone="(11) 99999-9999")
+        servico = Servico.objects.create(
+            nome="Corte Linha", preco=Decimal("30.00"), categoria="CABELO"
+        )
+        profissional = Profissional.objects.create(
+            nome="Prof Linha", telefone="(11) 88888-8888"
+        )
+        self.agendamento = Agendamento.objects.create(
+            cliente=cliente,
+            profissional=profissional,
+            servico=servico,
+            data_hora=timezone.now() + timedelta(days=1),
+        )
+        self.client = Client()
+
+    def _registrar_eventos(self, quantidade):
+        usuario = User.objects.create_user(username=f"usuario{quantidade}")
+        AuditoriaService.registrar_varios(
+            [
+                {
+                    "agendamento_id": self.agendamento.pk,
+                    "tipo_acao": HistoricoAgendamento.TipoAcao.CRIADO,
+                    "usuario": usuario,
+                }
+                for _ in range(quantidade)
+            ]
+        )
+
+    def _consultas_detalhe(self):
+        url = reverse("appointments:agendamento_detail", args=[self.agendamento.pk])
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(consultas)
+
+    def test_detalhe_com_consultas_fixas(self):
+        """Testa que o detalhe não faz mais consultas com histórico maior"""
+        self._registrar_eventos(3)
+        poucos = self._consultas_detalhe()
+        self._registrar_eventos(60)
+        self.assertEqual(self._consultas_detalhe(), poucos)
+
+    def test_paginacao_por_chave(self):
+        """Testa que as páginas percorrem todo o histórico sem repetir eventos"""
+        self._registrar_eventos(45)
+        url = reverse("appointments:agendamento_historico", args=[self.agendamento.pk])
+
+        vistos = []
+        eventos, cursor = HistoricoService.pagina(self.agendamento)
+        vistos += [evento.pk for evento in eventos]
+        while cursor:
+            response = self.client.get(url, {"cursor": cursor})
+            vistos += [evento.pk for evento in response.context["historico"]]
+            cursor = response.context["proximo_cursor"]
+
+        self.assertEqual(len(vistos), 45)
+        self.assertEqual(len(set(vistos)), 45)
+        for cursor in ("invalido", f"{10 ** 20}-1"):
+            self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 400)
+
+
+class GeradorEmEscalaTest(TestCase):
+    """Testes do modo em escala do populate_data"""
+
+    def test_gera_agendamentos_no_expediente_sem_conflito(self):
+        """Testa contagens, expediente dos profissionais, horas cheias,
+        horários únicos e só clientes gerados nesta execução"""
+        anterior = Cliente.objects.create(nome="Anterior", telefone="(11) 90000-0000")
+        call_command(
+            "populate_data",
+            "--clients=30",
+            # Inclui os expedientes que começam na meia hora
+            "--professionals=10",
+            "--days=10",
+            "--future-days=0",
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Cliente.objects.count(), 31)
+        self.assertEqual(Profissional.objects.count(), 10)
+        agendamentos = list(Agendamento.objects.select_related("profissional"))
+        self.assertTrue(agendamentos)
+        self.assertFalse(Agendamento.objects.filter(cliente=anterior).exists())
+
+        ocupados = set()
+        for agendamento in agendamentos:
+            profissional = agendamento.profissional
+            inicio = timezone.localtime(agendamento.data_hora)
+            self.assertEqual(inicio.minute, 0)
+            self.assertIn(inicio.isoweekday(), profissional.lista_dias_semana)
+            self.assertGreaterEqual(inicio.time(), profissional.horario_inicio)
+            self.assertLessEqual(
+                timezone.localtime(agendamento.data_hora_fim).time(),
+                profissional.horario_fim,
+            )
+            ocupados.add((profissional.pk, agendamento.data_hora))
+        self.assertEqual(len(ocupados), len(agendamentos))
+
+
+class BenchmarkCommandTest(TestCase):
+    """Testes do comando benchmark"""
+
+    def _executar(self, *args):
+        call_command(
+            "benchmark",
+            "--clients=20",
+            "--professionals=2",
+            "--days=5",
+            "--requests=3",
+            "--warmup=0",
+            "--threads=1",
+            "--only",
+            "lista",
+            "detalhe",
+            *args,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+    def test_grava_resultados_e_compara_com_baseline(self):
+        """Testa o JSON de resultados e a falha quando a baseline é melhor"""
+        with tempfile.TemporaryDirectory() as pasta:
+            saida = os.path.join(pasta, "resultados.json")
+            self._executar(f"--output={saida}")
+            with open(saida, encoding="utf-8") as arquivo:
+                resultados = json.load(arquivo)
+
+            self.assertEqual(set(resultados["endpoints"]), {"lista", "detalhe"})
+            lista = resultados["endpoints"]["lista"]
+            self.assertEqual((lista["requisicoes"], lista["erros"]), (3, 0))
+            self.assertGreater(lista["consultas_media"], 0)
+
+            # Baseline com metade das consultas: regressão acima do limite
+            for metricas in resultados["endpoints"].values():
+                metricas["p95_ms"] = 0
+                metricas["consultas_media"] /= 2
+            baseline = os.path.join(pasta, "baseline.json")
+            with open(baseline, "w", encoding="utf-8") as arquivo:
+                json.dump(resultados, arquivo)
+
+            with self.assertRaisesMessage(CommandError, "consultas_media"):
+                self._executar(f"--baseline={baseline}", "--seed=7")
+
+    def test_percentil_posto_mais_proximo(self):
+        """Testa o posto ceil(p/100 * n), sem o arredondamento para o par"""
+        self.assertEqual(percentil([1, 2, 3, 4, 5], 50), 3)
+        self.assertEqual(percentil(list(range(1, 11)), 95), 10)
+        self.assertEqual(percentil(list(range(1, 21)), 95), 19)
+        self.assertEqual(percentil([], 99), 0.0)
+
+
+# Máximo de consultas SQL por página (GET), qualquer que seja o volume de dados.
+# Toda rota de appointments/urls.py precisa estar aqui ou em ROTAS_SEM_ORCAMENTO.
+# Listas e detalhe incluem a consulta de versão do GET condicional (ETag).
+ORCAMENTO_CONSULTAS = {
+    "dashboard": 5,
+    "agendamento_list": 4,
+    "agendamento_detail": 3,
+    "agendamento_create": 4,
+    "agendamento_edit": 5,
+    "agendamento_historico": 2,
+    "relatorio_servicos": 6,
+    "cliente_list": 2,
+    "cliente_create": 0,
+    "cliente_update": 1,
+    "profissional_list": 3,
+    "profissional_create": 1,
+    "profissional_update": 3,
+    "servico_list": 2,
+    "servico_create": 0,
+    "servico_update": 1,
+    "api_horarios_disponiveis": 2,
+    "api_compatibilidade": 1,
+    "api_alteracoes": 3,
+    "agenda_ics": 3,
+    "agenda_profissional_ics": 4,
+}
+
+# Rotas que só aceitam POST (cobertas pelos testes de status)
+ROTAS_SEM_ORCAMENTO = {"atualizar_status", "api_alterar_status_lote"}
+
+
+# Com 1.000 linhas os formulários passam do limite do log de requisições lentas
+@override_settings(PERFIL_LIMITE_LENTO_MS=60_000)
+class OrcamentoConsultasTest(TestCase):
+    """Testa que nenhuma página ultrapassa o orçamento de consultas nem cresce
+    com o volume de dados (N+1)"""
+
+    TAMANHOS = (10, 100, 1000)
+
+    def _gerar_dados(self, tamanho):
+        """tamanho linhas de cada model, com relações distintas por linha"""
+        categorias = [c for c, _ in Servico._meta.get_field("categoria").choices]
+        servicos = Servico.objects.bulk_create(
+            Servico(
+                nome=f"Serviço {i}",
+                categoria=categorias[i % len(categorias)],
+                preco=Decimal("50.00"),
+            )
+            for i in range(tamanho)
+        )
+        profissionais = Profissional.objects.bulk_create(
+            Profissional(
+                nome=f"Profissional {i}",
+                telefone="(11) 99999-9999",
+                horario_inicio=time(8, 0),
+                horario_fim=time(18, 0),
+            )
+            for i in range(tamanho)
+        )
+        Profissional.especialidades.through.objects.bulk_create(
+            Profissional.especialidades.through(
+                profissional_id=profissional.pk, servico_id=servico.pk
+            )
+            for profissional, servico in zip(profissionais, servicos)
+        )
+        clientes = Cliente.objects.bulk_create(
+            Cliente(nome=f"Cliente {i}", telefone="(11) 98888-8888")
+            for i in range(tamanho)
+        )
+
+        # Um terço ontem (concluídos), um terço hoje e um terço amanhã
+        hoje = timezone.make_aware(datetime.combine(get_local_today(), time(10, 0)))
+        situacoes = [
+            (hoje - timedelta(days=1), "CONCLUIDO"),
+            (hoje, "AGENDADO"),
+            (hoje + timedelta(days=1), "CONFIRMADO"),
+        ]
+        agendamentos = []
+        for i in range(tamanho):
+            data_hora, status = situacoes[i % 3]
+            agendamentos.append(
+                Agendamento(
+                    cliente=clientes[i],
+                    profissional=profissionais[i],
+                    servico=servicos[i],
+                    data_hora=data_hora,
+                    status=status,
+                    preco_final=servicos[i].preco,
+                )
+            )
+        Agendamento.objects.bulk_create(agendamentos)
+        HistoricoAgendamento.objects.bulk_create(
+            HistoricoAgendamento(
+                agendamento=agendamento,
+                tipo_acao=HistoricoAgendamento.TipoAcao.CRIADO,
+                status_novo=HistoricoAgendamento.codigo_status(agendamento.status),
+            )
+            for agendamento in agendamentos
+        )
+
+    def _urls(self):
+        """URL de cada rota com orçamento, apontando para objetos existentes"""
+        agendamento = Agendamento.objects.first()
+        profissional = Profissional.objects.first()
+        amanha = get_local_today() + timedelta(days=1)
+        return {
+            "agendamento_detail": [agendamento.pk],
+            "agendamento_edit": [agendamento.pk],
+            "agendamento_historico": [agendamento.pk],
+            "cliente_update": [Cliente.objects.first().pk],
+            "profissional_update": [profissional.pk],
+            "servico_update": [Servico.objects.first().pk],
+            "api_alteracoes": ["agendamentos"],
+            "agenda_profissional_ics": [profissional.pk],
+        }, {
+            "api_horarios_disponiveis": {
+                "profissional_id": profissional.pk,
+                "data": amanha.isoformat(),
+            },
+        }
+
+    def _medir(self):
+        """Consultas executadas por rota (com o cache vazio a cada requisição)"""
+        argumentos, parametros = self._urls()
+        medicoes = {}
+        for nome in ORCAMENTO_CONSULTAS:
+            url = reverse(f"appointments:{nome}", args=argumentos.get(nome))
+            cache.clear()
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(url, parametros.get(nome, {}))
+                # Respostas em streaming consultam o banco ao serem lidas
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertEqual(response.status_code, 200, nome)
+            medicoes[nome] = [consulta["sql"] for consulta in consultas]
+        return medicoes
+
+    @staticmethod
+    def _repetidas(consultas):
+        """Impressões digitais de SQL executadas mais de uma vez"""
+        contagem = {}
+        for sql in consultas:
+            digital = normalizar_sql(sql)
+            contagem[digital] = contagem.get(digital, 0) + 1
+        return [f"{total}x {digital}" for digital, total in contagem.items() if total > 1]
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        """Testa que nenhuma rota nova fica sem orçamento de consultas"""
+        rotas = {rota.name for rota in urlpatterns}
+        self.assertEqual(
+            rotas - ROTAS_SEM_ORCAMENTO - set(ORCAMENTO_CONSULTAS), set()
+        )
+
+    def test_consultas_dentro_do_orcamento_e_constantes(self):
+        """Testa 10, 100 e 1.000 linhas: orçamento respeitado e sem N+1"""
+        anteriores = None
+        gerados = 0
+        for tamanho in self.TAMANHOS:
+            self._gerar_dados(tamanho - gerados)
+            gerados = tamanho
+            medicoes = self._medir()
+
+            for nome, consultas in medicoes.items():
+                detalhes = "\n  ".join(self._repetidas(consultas))
+                self.assertLessEqual(
+                    len(consultas),
+                    ORCAMENTO_CONSULTAS[nome],
+                    f"{nome}: {len(consultas)} consultas com {tamanho} linhas "
+                    f"(orçamento {ORCAMENTO_CONSULTAS[nome]})\n  {detalhes}",
+                )
+                if anteriores is not None:
+                    self.assertEqual(
+                        len(consultas),
+                        len(anteriores[nome]),
+                        f"{nome}: consultas cresceram com os dados "
+                        f"({len(anteriores[nome])} → {len(consultas)} com "
+                        f"{tamanho} linhas)\n  {detalhes}",
+                    )
+            anteriores = medicoes
+
+
+@override_settings(PERFIL_ATIVO=True)
+class PerfilMiddlewareTest(TestCase):
+    """Testes do middleware de perfil de requisições"""
+
+    def setUp(self):
+        self.url = reverse("appointments:servico_list")
+        Servico.objects.create(nome="Corte", preco=Decimal("30.00"))
+
+    def test_server_timing(self):
+        """Testa o cabeçalho com banco, template e total, só para staff"""
+        self.assertFalse(self.client.get(self.url).has_header("Server-Timing"))
+
+        staff = User.objects.create_user("admin", password="senha", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(self.url)
+        timing = response["Server-Timing"]
+        for metrica in ("db;dur=", "tpl;dur=", "app;dur=", "total;dur="):
+            self.assertIn(metrica, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* consultas"')
+
+    @override_settings(PERFIL_LIMITE_LENTO_MS=0)
+    def test_log_de_requisicao_lenta(self):
+        """Testa o registro em JSON com o SQL normalizado"""
+        with self.assertLogs("appointments.perfil", "WARNING") as logs:
+            self.client.get(self.url, {"search": "Corte"})
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(registro["caminho"], self.url)
+        self.assertEqual(registro["consultas"], len(registro["sql"]))
+        self.assertNotIn("Corte", json.dumps(registro["sql"]))
+        self.assertNotIn("%s", json.dumps(registro["sql"]))
+
+    def test_cprofile_somente_para_staff(self):
+        """Testa que ?_perfil só devolve o cProfile para staff"""
+        response = self.client.get(self.url, {"_perfil": "1"})
+        self.assertContains(response, "Corte")
+
+        staff = User.objects.create_user("admin", password="senha", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(self.url, {"_perfil": "1"})
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertContains(response, "function calls")
+
+
+class MetricasTest(TestCase):
+    """Testes do registro de métricas e do endpoint /metrics"""
+
+    def _valor(self, serie, **rotulos):
+        chave = (serie, tuple(sorted((k, str(v)) for k, v in rotulos.items())))
+        return MetricasService.valores().get(chave, 0)
+
+    def test_contadores_e_histograma_das_requisicoes(self):
+        """Testa a instrumentação das views e o formato de exposição"""
+        view = "appointments:dashboard"
+        antes = self._valor("salao_http_duracao_segundos_count", view=view)
+        self.client.get(reverse("appointments:dashboard"))
+        self.assertEqual(
+            self._valor("salao_http_duracao_segundos_count", view=view), antes + 1
+        )
+
+        response = self.client.get("/metrics")
+        texto = response.content.decode()
+        self.assertIn("# TYPE salao_http_duracao_segundos histogram", texto)
+        self.assertIn(
+            f'salao_http_duracao_segundos_bucket{{view="{view}",le="+Inf"}}', texto
+        )
+        self.assertIn(
+            'salao_http_requisicoes_total{metodo="GET",status="200",'
+            f'view="{view}"}}',
+            texto,
+        )
+
+    def test_recusas_de_agendamento(self):
+        """Testa o contador de recusas do AgendamentoService"""
+        cliente = Cliente.objects.create(nome="Cliente", telefone="(11) 99999-9999")
+        servico = Servico.objects.create(nome="Corte", preco=Decimal("30.00"))
+        profissional = Profissional.objects.create(
+            nome="Profissional", telefone="(11) 98888-8888"
+        )
+        antes = self._valor(
+            "salao_agendamentos_recusados_total", motivo="servico_incompativel"
+        )
+        with self.assertRaises(ValueError):
+            AgendamentoService.criar_agendamento(
+                cliente, profissional, servico, timezone.now() + timedelta(days=1)
+            )
+        self.assertEqual(
+            self._valor(
+                "salao_agendamentos_recusados_total", motivo="servico_incompativel"
+            ),
+            antes + 1,
+        )
+
+    def test_soma_entre_processos_pelo_arquivo(self):
+        """Testa que os incrementos de processos diferentes se somam no arquivo"""
+        MetricasService.descarregar()  # pendências dos testes anteriores
+        with tempfile.TemporaryDirectory() as pasta, override_settings(
+            METRICAS_ARQUIVO=os.path.join(pasta, "metricas.sqlite3")
+        ), mock.patch.object(MetricasService, "_iniciar_thread"):
+            for _ in range(2):
+                # Cada iteração simula um worker que grava o seu lote
+                MetricasService.incrementar("salao_agendamentos_criados_total", 3)
+                MetricasService.descarregar()
+            self.assertEqual(self._valor("salao_agendamentos_criados_total"), 6)
+
+    def test_acesso_restrito(self):
+        """Testa que só os IPs do coletor acessam /metrics"""
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.5")
+        self.assertEqual(response.status_code, 403)
+
+
+class PlanosExecucaoTest(TestCase):
+    """Testes da verificação de planos de execução"""
+
+    def test_paginas_criticas_sem_varredura(self):
+        """Testa que as consultas das páginas críticas usam índices"""
+        call_command(
+            "populate_data",
+            "--clients=30",
+            "--professionals=3",
+            "--days=10",
+            stdout=StringIO(),
+        )
+        saida = StringIO()
+        call_command("verificar_planos", stdout=saida)
+        self.assertIn("✓ dashboard", saida.getvalue())
+
+    def test_detecta_varredura_e_sugere_indice(self):
+        """Testa a detecção de varredura em coluna sem índice"""
+        consultas = PlanoService.capturar(
+            lambda: list(Agendamento.objects.filter(observacoes="x"))
+        )
+        sql, params, alias = consultas[0]
+        plano = PlanoService.explicar(sql, params, using=alias)
+        tipos = {tipo for tipo, _ in PlanoService.problemas(sql, plano)}
+        # Sem índice em observacoes, a tabela é lida inteira (direto ou pelo
+        # índice de data_hora, por causa da ordenação padrão)
+        self.assertTrue(tipos & {"varredura", "varredura_indice"})
+        self.assertEqual(
+            PlanoService.sugerir_indice(sql),
+            'Agendamento: models.Index(fields=["observacoes", "data_hora"])',
+        )
+
+    def test_coluna_dentro_de_funcao(self):
+        """Testa o aviso de filtro por __date, que impede o uso do índice"""
+        consultas = PlanoService.capturar(
+            lambda: list(Agendamento.objects.filter(data_hora__date=date.today()))
+        )
+        self.assertEqual(
+            PlanoService.colunas_em_funcoes(consultas[0][0]), ["data_hora"]
+        )
+
+
+@override_settings(DB_LEITURA=True, DB_ALIAS_LEITURA="leitura")
+class PlanosExecucaoReplicaTest(TransactionTestCase):
+    """Testes da verificação de planos com as leituras na réplica
+
+    TransactionTestCase: a réplica é outra conexão e só enxerga o que foi
+    gravado (commit) no primário.
+    """
+
+    def setUp(self):
+        connections.settings["leitura"] = {**connection.settings_dict}
+
+        def remover():
+            connections["leitura"].close()
+            del connections["leitura"]
+            del connections.settings["leitura"]
+
+        self.addCleanup(remover)
+
+    def test_consultas_da_replica_verificadas(self):
+        """Testa que as consultas feitas na réplica são capturadas e
+        explicadas no banco que as executou"""
+        call_command(
+            "populate_data",
+            "--clients=30",
+            "--professionals=3",
+            "--days=10",
+            stdout=StringIO(),
+        )
+        saida = StringIO()
+        with mock.patch.object(
+            PlanoService, "explicar", wraps=PlanoService.explicar
+        ) as explicar:
+            call_command("verificar_planos", stdout=saida)
+        self.assertIn("✓ dashboard", saida.getvalue())
+        self.assertIn(
+            "leitura", {chamada.kwargs["using"] for chamada in explicar.call_args_list}
+        )
+
+
+class RastreamentoTest(TestCase):
+    """Testes dos spans locais exportados em NDJSON"""
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.arquivo = os.path.join(pasta.name, "rastros.ndjson")
+
+    def _spans(self):
+        if not os.path.exists(self.arquivo):
+            return []
+        return list(RastreamentoService.ler(self.arquivo))
+
+    def test_requisicao_rastreada(self):
+        """Testa o span raiz da requisição com SQL e template como filhos"""
+        with override_settings(
+            RASTREAMENTO_ARQUIVO=self.arquivo, RASTREAMENTO_AMOSTRAGEM=1.0
+        ):
+            self.client.get(reverse("appointments:dashboard"))
+
+        spans = self._spans()
+        raiz = next(s for s in spans if "parentSpanId" not in s)
+        self.assertEqual(raiz["name"], "GET appointments:dashboard")
+        self.assertIn(
+            {"key": "http.status_code", "value": {"intValue": "200"}},
+            raiz["attributes"],
+        )
+        self.assertEqual({s["traceId"] for s in spans}, {raiz["traceId"]})
+        nomes = {s["name"] for s in spans}
+        self.assertIn("SELECT appointments_agendamento", nomes)
+        self.assertIn("render appointments/dashboard/dashboard.html", nomes)
+
+        saida = StringIO()
+        call_command("rastros_flamegraph", self.arquivo, stdout=saida)
+        self.assertIn("GET appointments:dashboard;render ", saida.getvalue())
+
+    def test_amostragem(self):
+        """Testa que rastros não amostrados não gravam nada"""
+        with override_settings(
+            RASTREAMENTO_ARQUIVO=self.arquivo, RASTREAMENTO_AMOSTRAGEM=0.0
+        ):
+            self.client.get(reverse("appointments:dashboard"))
+            RelatorioService.dashboard_stats()
+        self.assertEqual(self._spans(), [])
+
+    def test_propagacao_entre_threads_e_erro(self):
+        """Testa spans de um ThreadPoolExecutor no rastro que os criou"""
+
+        @RastreamentoService.rastrear("tarefa")
+        def tarefa(valor):
+            if valor < 0:
+                raise ValueError("negativo")
+            return valor * 2
+
+        with override_settings(
+            RASTREAMENTO_ARQUIVO=self.arquivo, RASTREAMENTO_AMOSTRAGEM=1.0
+        ):
+            with RastreamentoService.span("lote") as raiz:
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futuros = [
+                        executor.submit(RastreamentoService.propagar(tarefa), v)
+                        for v in (1, 2, -1)
+                    ]
+                self.assertEqual([f.result() for f in futuros[:2]], [2, 4])
+                self.assertRaises(ValueError, futuros[2].result)
+
+        tarefas = [s for s in self._spans() if s["name"] == "tarefa"]
+        self.assertEqual(len(tarefas), 3)
+        for span in tarefas:
+            self.assertEqual(span["traceId"], raiz.rastro.id)
+            self.assertEqual(span["parentSpanId"], raiz.id)
+        self.assertEqual(sorted(s["status"]["code"] for s in tarefas), [1, 1, 2])
+
+
+class PerfilProducaoSQLiteTest(TestCase):
+    """Testes do perfil de produção do SQLite"""
+
+    def test_pragmas_e_begin_immediate(self):
+        """Testa os pragmas do hook e o BEGIN IMMEDIATE do backend"""
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        banco = DatabaseWrapper(
+            {
+                **connection.settings_dict,
+                "NAME": os.path.join(pasta.name, "producao.sqlite3"),
+                "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+            },
+            alias="producao",
+        )
+        self.addCleanup(banco.close)
+
+        with override_settings(SQLITE_PRAGMAS=settings.SQLITE_PRAGMAS_PRODUCAO):
+            banco.ensure_connection()
+        with banco.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT_MS)
+
+        comandos = []
+
+        def capturar(execute, sql, params, many, context):
+            comandos.append(sql)
+            return execute(sql, params, many, context)
+
+        with banco.execute_wrapper(capturar):
+            banco._start_transaction_under_autocommit()
+        self.assertEqual(comandos, ["BEGIN IMMEDIATE"])
+        self.assertTrue(banco.connection.in_transaction)
+        banco.connection.rollback()
+
+    def test_otimizar_banco(self):
+        """Testa o comando de manutenção periódica"""
+        saida = StringIO()
+        call_command("otimizar_banco", "--analyze", "--checkpoint", stdout=saida)
+        self.assertIn("✓ PRAGMA optimize", saida.getvalue())
+        # O banco de testes fica em memória: não há arquivo -wal
+        self.assertIn("checkpoint ignorado", saida.getvalue())
+
+
+class RelatorioAgregacoesTest(TestCase):
+    """Testes das agregações do RelatorioService (portáveis para o PostgreSQL)"""
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+        servico = Servico.objects.create(nome="Corte", preco=Decimal("40.00"))
+        self.profissional = Profissional.objects.create(
+            nome="Bia", telefone="(11) 98888-8888"
+        )
+        self.dia = get_local_today() - timedelta(days=3)
+        for hora, status in [
+            (time(9, 0), "CONCLUIDO"),
+            (time(10, 0), "CONCLUIDO"),
+            (time(11, 0), "CANCELADO"),
+            # 22:30 em São Paulo já é o dia seguinte em UTC
+            (time(22, 30), "CONCLUIDO"),
+        ]:
+            Agendamento.objects.create(
+                cliente=cliente,
+                profissional=self.profissional,
+                servico=servico,
+                data_hora=timezone.make_aware(datetime.combine(self.dia, hora)),
+                status=status,
+            )
+
+    def test_evolucao_diaria_em_data_local(self):
+        """Testa que a evolução diária agrupa pela data local"""
+        relatorio = RelatorioService.relatorio_servicos_concluidos(self.dia, self.dia)
+        self.assertEqual(
+            [(e["data"], e["total"]) for e in relatorio["agendamentos_por_dia"]],
+            [(self.dia, 3)],
+        )
+
+    def test_contagens_em_uma_consulta(self):
+        """Testa as contagens por status com agregados filtrados (uma
+        consulta na tabela principal e uma no arquivo)"""
+        with self.assertNumQueries(2):
+            stats = RelatorioService.dashboard_stats(self.dia)["stats"]
+        self.assertEqual(stats["agendamentos_hoje"], 4)
+        self.assertEqual(stats["agendamentos_concluidos"], 3)
+        self.assertEqual(stats["agendamentos_cancelados"], 1)
+
+        relatorio = RelatorioService.relatorio_profissional(self.profissional.pk)
+        self.assertEqual(relatorio["total_concluidos"], 3)
+        self.assertEqual(relatorio["total_cancelados"], 1)
+        self.assertEqual(relatorio["receita_total"], Decimal("120.00"))
+        self.assertEqual(relatorio["taxa_conclusao"], 75)
+
+    def test_totais_iguais_apos_arquivar(self):
+        """Testa que os relatórios somam os agendamentos já arquivados"""
+
+        def totais():
+            servicos = RelatorioService.relatorio_servicos_concluidos(
+                self.dia, self.dia
+            )
+            profissional = RelatorioService.relatorio_profissional(
+                self.profissional.pk
+            )
+            dashboard = RelatorioService.dashboard_stats(self.dia)["stats"]
+            return (
+                servicos["stats_gerais"],
+                list(servicos["servicos_stats"]),
+                servicos["agendamentos_por_dia"],
+                profissional,
+                dashboard,
+            )
+
+        antes = totais()
+        ArquivoService.arquivar_lote(self.dia + timedelta(days=1))
+        self.assertFalse(Agendamento.objects.exists())
+        self.assertEqual(totais(), antes)
+
+
+@override_settings(DB_ALIAS_LEITURA="leitura", DB_LEITURA_FIXAR_S=5.0)
+class ReplicaLeituraTest(TestCase):
+    """Testes do roteamento de leituras para a réplica"""
+
+    def test_router(self):
+        """Testa as decisões do router dentro e fora de ler_da_replica"""
+        router = LeituraEscritaRouter()
+        self.assertIsNone(router.db_for_read(Cliente))
+        lido = ler_da_replica(lambda: router.db_for_read(Cliente))()
+        self.assertEqual(lido, "leitura")
+        self.assertEqual(router.db_for_write(Cliente), "default")
+        self.assertTrue(router.allow_migrate("default", "appointments"))
+        self.assertFalse(router.allow_migrate("leitura", "appointments"))
+
+    def test_sessao_fixada_apos_escrita(self):
+        """Testa que a sessão lê do primário logo depois de escrever"""
+        lidos = []
+
+        @ler_da_replica
+        def listar(request):
+            lidos.append(alias_leitura())
+            return HttpResponse()
+
+        def criar(request):
+            Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+            return HttpResponse()
+
+        fabrica = RequestFactory()
+        sessao = {}
+
+        def requisitar(view, metodo="get"):
+            request = getattr(fabrica, metodo)("/")
+            request.session = sessao
+            LeituraReplicaMiddleware(view)(request)
+
+        requisitar(listar)
+        self.assertNotIn(CHAVE_SESSAO, sessao)
+        requisitar(criar, "post")
+        self.assertIn(CHAVE_SESSAO, sessao)
+        requisitar(listar)
+        with mock.patch(
+            "appointments.routers.time.time", return_value=sessao[CHAVE_SESSAO] + 6
+        ):
+            requisitar(listar)
+        self.assertEqual(lidos, ["leitura", None, "leitura"])
+
+
+@override_settings(SALOES=["norte"], SALAO_RESOLUCAO="caminho")
+class SaloesTest(TestCase):
+    """Testes do banco e do cache por salão"""
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        connections.settings["salao_norte"] = {
+            **connections.settings["default"],
+            "NAME": os.path.join(pasta.name, "norte.sqlite3"),
+        }
+
+        def remover():
+            connections["salao_norte"].close()
+            del connections["salao_norte"]
+            del connections.settings["salao_norte"]
+
+        self.addCleanup(remover)
+        call_command("por_salao", "migrate", verbosity=0, stdout=StringIO())
+
+    def test_dados_e_cache_separados(self):
+        """Testa que o salão ativo tem banco e chaves de cache próprios"""
+        router = LeituraEscritaRouter()
+        with ativar_salao("norte"):
+            self.assertEqual(router.db_for_read(Cliente), "salao_norte")
+            self.assertEqual(banco_escrita(), "salao_norte")
+            Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+            cache.set("saloes:teste", "norte")
+            self.assertEqual(Cliente.objects.count(), 1)
+        self.assertEqual(Cliente.objects.count(), 0)
+        self.assertIsNone(cache.get("saloes:teste"))
+        self.assertTrue(router.allow_migrate("salao_norte", "appointments"))
+        with self.assertRaises(ValueError):
+            with ativar_salao("sul"):
+                pass
+
+    def test_salao_pelo_caminho(self):
+        """Testa a resolução do salão pelo primeiro segmento da URL"""
+        vistos = []
+
+        def view(request):
+            url = reverse("appointments:cliente_list")
+            vistos.append((salao_atual(), request.path_info, url))
+            return HttpResponse()
+
+        SalaoMiddleware(view)(RequestFactory().get("/norte/clientes/"))
+        SalaoMiddleware(view)(RequestFactory().get("/clientes/"))
+        self.assertEqual(
+            vistos,
+            [
+                ("norte", "/clientes/", "/norte/clientes/"),
+                (None, "/clientes/", "/clientes/"),
+            ],
+        )
+
+    def test_relatorio_entre_saloes(self):
+        """Testa o relatório consolidado dos bancos dos salões"""
+        with ativar_salao("norte"):
+            cliente = Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+            profissional = Profissional.objects.create(
+                nome="Bia", telefone="(11) 98888-8888"
+            )
+            servico = Servico.objects.create(nome="Corte", preco=Decimal("40.00"))
+            Agendamento.objects.create(
+                cliente=cliente,
+                profissional=profissional,
+                servico=servico,
+                data_hora=get_local_now() - timedelta(days=1),
+                status="CONCLUIDO",
+            )
+        saida = StringIO()
+        call_command("relatorio_saloes", stdout=saida)
+        self.assertRegex(saida.getvalue(), r"norte\s+1\s+40\.00")
+        self.assertIn("Corte: 1", saida.getvalue())
+
+    def test_relatorio_entre_saloes_com_arquivados(self):
+        """Testa que o relatório consolidado soma o que o salão já arquivou"""
+        antigo = get_local_today() - timedelta(days=400)
+        with ativar_salao("norte"):
+            cliente = Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+            profissional = Profissional.objects.create(
+                nome="Bia", telefone="(11) 98888-8888"
+            )
+            servico = Servico.objects.create(nome="Corte", preco=Decimal("40.00"))
+            for data_hora in (
+                timezone.make_aware(datetime.combine(antigo, time(10, 0))),
+                get_local_now() - timedelta(days=1),
+            ):
+                Agendamento.objects.create(
+                    cliente=cliente,
+                    profissional=profissional,
+                    servico=servico,
+                    data_hora=data_hora,
+                    status="CONCLUIDO",
+                )
+            ArquivoService.arquivar_lote(antigo + timedelta(days=1))
+            self.assertEqual(Agendamento.objects.count(), 1)
+
+        saida = StringIO()
+        call_command(
+            "relatorio_saloes", f"--inicio={antigo:%Y-%m-%d}", stdout=saida
+        )
+        self.assertRegex(saida.getvalue(), r"norte\s+2\s+80\.00")
+        self.assertIn("Corte: 2", saida.getvalue())
+
+
+class ApiAssincronaTest(TestCase):
+    """Testes das views assíncronas da API (servidor ASGI)"""
+
+    def setUp(self):
+        cliente = Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+        servico = Servico.objects.create(nome="Corte", preco=Decimal("40.00"))
+        self.profissional = Profissional.objects.create(
+            nome="Bia", telefone="(11) 98888-8888", dias_semana="1,2,3,4,5,6,7"
+        )
+        self.amanha = get_local_today() + timedelta(days=1)
+        self.agendamento = Agendamento.objects.create(
+            cliente=cliente,
+            profissional=self.profissional,
+            servico=servico,
+            data_hora=timezone.make_aware(datetime.combine(self.amanha, time(10, 0))),
+        )
+
+    def test_horarios_iguais_a_versao_sincrona(self):
+        """Testa que as duas versões do endpoint respondem o mesmo"""
+        request = RequestFactory().get(
+            "/api/horarios-disponiveis/",
+            {"profissional_id": self.profissional.pk, "data": self.amanha.isoformat()},
+        )
+        sincrona = json.loads(api.api_horarios_disponiveis(request).content)
+        # Em modo assíncrono os middlewares chamam a view sem trocar de thread
+        view = ReferenciaCacheMiddleware(api_async.api_horarios_disponiveis)
+        resposta = async_to_sync(view)(request)
+        self.assertEqual(json.loads(resposta.content), sincrona)
+        self.assertNotIn("10:00", sincrona["horarios"])
+
+    def test_status_em_lote(self):
+        """Testa a alteração em lote pela view assíncrona"""
+        request = RequestFactory().post(
+            "/api/agendamentos/status-lote/",
+            data={"ids": [self.agendamento.pk], "status": "CONFIRMADO"},
+            content_type="application/json",
+        )
+        request.user = AnonymousUser()
+        resposta = async_to_sync(api_async.api_alterar_status_lote)(request)
+        alterados = json.loads(resposta.content)["alterados"]
+        self.assertEqual(alterados, [self.agendamento.pk])
+        self.agendamento.refresh_from_db()
+        self.assertEqual(self.agendamento.status, "CONFIRMADO")
+
+
+class EstaticosTest(TestCase):
+    """Testa os pacotes de estáticos e o manifesto com hash"""
+
+    def renderizar(self, nome):
+        return Template("{% load estaticos %}{% pacote nome %}").render(
+            Context({"nome": nome})
+        )
+
+    def test_urls_relativas_reescritas(self):
+        """Testa o ajuste das url() de um CSS movido para dist/"""
+        css = (
+            "a{src:url(../webfonts/fa.woff2?v=6)}"
+            "b{background:url('data:image/png;base64,AA')}"
+        )
+        reescrito = EstaticosService.reescrever_urls(
+            css, "vendor/fa/css/solid.min.css", "dist/vendor.css"
+        )
+        self.assertIn('url("../vendor/fa/webfonts/fa.woff2?v=6")', reescrito)
+        self.assertIn("url('data:image/png;base64,AA')", reescrito)
+
+    def test_pacote_sem_empacotar_usa_origens(self):
+        """Testa que em desenvolvimento a tag carrega os arquivos de origem"""
+        html = self.renderizar("app.js")
+        self.assertIn('src="/static/js/base.js"', html)
+        self.assertIn('src="/static/js/masks.js"', html)
+        pagina = Client().get(reverse("appointments:dashboard")).content.decode()
+        self.assertNotIn("cdnjs", pagina)
+        self.assertNotIn("jsdelivr", pagina)
+
+    def test_pacote_com_hash_compressao_e_cache(self):
+        """Testa o pacote montado, com hash, .gz/.br e cache imutável"""
+        conteudo = EstaticosService.montar("app.css")
+        self.assertIn(".badge-categoria-CABELO{", conteudo)
+        with tempfile.TemporaryDirectory() as pasta:
+            origem = os.path.join(pasta, "origem")
+            os.makedirs(os.path.join(origem, "dist"))
+            with open(os.path.join(origem, "dist", "app.css"), "w") as f:
+                f.write(conteudo)
+            with override_settings(
+                ESTATICOS_EMPACOTADOS=True,
+                STATICFILES_DIRS=[origem],
+                STATICFILES_FINDERS=[
+                    "django.contrib.staticfiles.finders.FileSystemFinder"
+                ],
+                STATIC_ROOT=os.path.join(pasta, "coletados"),
+                STORAGES={
+                    **settings.STORAGES,
+                    "staticfiles": {
+                        "BACKEND": (
+                            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+                        )
+                    },
+                },
+            ):
+                call_command("collectstatic", interactive=False, verbosity=0)
+                html = self.renderizar("app.css")
+                url = html.split('href="')[1].split('"')[0]
+                self.assertRegex(url, r"^/static/dist/app\.[0-9a-f]{12}\.css$")
+                coletado = os.path.join(pasta, "coletados", url[len("/static/") :])
+                self.assertTrue(os.path.exists(coletado + ".gz"))
+                self.assertTrue(os.path.exists(coletado + ".br"))
+
+                middleware = WhiteNoiseMiddleware(lambda request: HttpResponse())
+                resposta = middleware(RequestFactory().get(url))
+                self.assertEqual(resposta.status_code, 200)
+                self.assertIn("immutable", resposta["Cache-Control"])
+
+
+class GetCondicionalTest(TestCase):
+    """Testa ETag/304 das listas e do detalhe e o cache de fragmentos"""
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+        self.servico = Servico.objects.create(nome="Corte", preco=Decimal("40.00"))
+        self.profissional = Profissional.objects.create(
+            nome="Bia", telefone="(11) 98888-8888", dias_semana="1,2,3,4,5,6,7"
+        )
+        self.profissional.especialidades.add(self.servico)
+        self.agendamento = Agendamento.objects.create(
+            cliente=self.cliente,
+            profissional=self.profissional,
+            servico=self.servico,
+            data_hora=timezone.now() + timedelta(days=1),
+        )
+
+    def revalidar(self, url):
+        """Status de um GET condicional com a ETag da resposta anterior"""
+        etag = self.client.get(url)["ETag"]
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_sem_alteracao_responde_304(self):
+        """Testa 304 com a mesma ETag em todas as páginas cobertas"""
+        for url in (
+            reverse("appointments:agendamento_list"),
+            reverse("appointments:cliente_list"),
+            reverse("appointments:profissional_list"),
+            reverse("appointments:servico_list"),
+            reverse("appointments:agendamento_detail", args=[self.agendamento.pk]),
+        ):
+            self.assertEqual(self.revalidar(url), 304, url)
+
+    def test_alteracoes_mudam_a_etag(self):
+        """Testa que inclusões, inativações e cadastros relacionados invalidam"""
+        lista = reverse("appointments:cliente_list")
+        etag = self.client.get(lista)["ETag"]
+        Cliente.objects.create(nome="Carla", telefone="(11) 97777-7777")
+        resposta = self.client.get(lista, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+
+        etag = self.client.get(lista)["ETag"]
+        Cliente.objects.filter(nome="Carla").update(ativo=False)
+        resposta = self.client.get(lista, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+
+        # O nome do cliente aparece na lista de agendamentos
+        agendamentos = reverse("appointments:agendamento_list")
+        etag = self.client.get(agendamentos)["ETag"]
+        self.cliente.nome = "Ana Paula"
+        self.cliente.save()
+        resposta = self.client.get(agendamentos, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(resposta, "Ana Paula")
+
+        # Especialidades (m2m) não alteram o profissional
+        profissionais = reverse("appointments:profissional_list")
+        etag = self.client.get(profissionais)["ETag"]
+        self.profissional.especialidades.clear()
+        resposta = self.client.get(profissionais, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_etag_acompanha_csrf_e_usuario(self):
+        """Testa que um novo token CSRF ou outro login renderizam a página e
+        que não há Last-Modified (não mudaria com exclusões)"""
+        url = reverse("appointments:cliente_list")
+        resposta = self.client.get(url)
+        etag = resposta["ETag"]
+        self.assertFalse(resposta.has_header("Last-Modified"))
+        self.assertIn("Cookie", resposta["Vary"])
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "x" * 32
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+
+        etag = resposta["ETag"]
+        usuario = User.objects.create_user("recepcao", password="senha-teste")
+        self.client.force_login(usuario)
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_mensagem_pendente_sem_etag(self):
+        """Testa que a página com mensagem não é revalidada pelo cache"""
+        resposta = self.client.post(
+            reverse("appointments:cliente_create"),
+            {"nome": "Duda", "telefone": "(11) 96666-6666"},
+            follow=True,
+        )
+        self.assertContains(resposta, "Cliente cadastrado com sucesso")
+        self.assertFalse(resposta.has_header("ETag"))
+
+    def test_fragmentos_reaproveitados(self):
+        """Testa que só a linha alterada renderiza de novo"""
+        outro = Profissional.objects.create(
+            nome="Carol", telefone="(11) 95555-5555", dias_semana="1,2,3"
+        )
+        url = reverse("appointments:profissional_list")
+        with mock.patch.object(
+            CompatibilidadeService,
+            "categorias_do_profissional",
+            wraps=CompatibilidadeService.categorias_do_profissional,
+        ) as categorias:
+            self.client.get(url)
+            self.assertEqual(categorias.call_count, 2)
+
+            outro.nome = "Carolina"
+            outro.save()
+            resposta = self.client.get(url)
+            self.assertEqual(categorias.call_count, 3)
+            categorias.assert_called_with(outro.pk)
+        self.assertContains(resposta, "Carolina")
+
+
+@override_settings(FEED_ATRASO_S=0)
+class FeedAlteracoesTest(TestCase):
+    """Testa o feed de alterações: cursor, lápides e relações m2m"""
+
+    def setUp(self):
+        self.servico = Servico.objects.create(nome="Corte", preco=Decimal("40.00"))
+        self.clientes = [
+            Cliente.objects.create(nome=f"Cliente {i}", telefone=f"(11) 9000-000{i}")
+            for i in range(5)
+        ]
+
+    def sincronizar(self, recurso, cursor=None, limite=2):
+        """Percorrer o feed até "mais" ser false; retorna (páginas, cursor)"""
+        url = reverse("appointments:api_alteracoes", args=[recurso])
+        paginas = []
+        while True:
+            parametros = {"limite": limite}
+            if cursor:
+                parametros["cursor"] = cursor
+            dados = self.client.get(url, parametros).json()
+            paginas.append(dados)
+            cursor = dados["cursor"]
+            if not dados["mais"]:
+                return paginas, cursor
+
+    def test_paginacao_por_cursor(self):
+        """Testa que as páginas cobrem tudo uma vez e o cursor retoma do fim"""
+        paginas, cursor = self.sincronizar("clientes")
+        ids = [item[0] for pagina in paginas for item in pagina["itens"]]
+        self.assertEqual(ids, [c.pk for c in self.clientes])
+        self.assertEqual(paginas[0]["campos"][0], "id")
+
+        paginas, cursor = self.sincronizar("clientes", cursor)
+        self.assertEqual(paginas[0]["itens"], [])
+        self.assertEqual(paginas[0]["excluidos"], [])
+
+        self.clientes[1].nome = "Renomeado"
+        self.clientes[1].save()
+        paginas, _ = self.sincronizar("clientes", cursor)
+        campos = paginas[0]["campos"]
+        self.assertEqual(
+            [dict(zip(campos, item))["nome"] for item in paginas[0]["itens"]],
+            ["Renomeado"],
+        )
+
+    def test_lapides_de_exclusao_e_inativacao(self):
+        """Testa que excluídos e inativados chegam em "excluidos" """
+        _, cursor = self.sincronizar("clientes")
+        excluido = self.clientes[0].pk
+        self.clientes[0].delete()
+        Cliente.objects.filter(pk=self.clientes[1].pk).update(
+            ativo=False, data_atualizacao=timezone.now()
+        )
+
+        paginas, _ = self.sincronizar("clientes", cursor)
+        excluidos = [pk for pagina in paginas for pk in pagina["excluidos"]]
+        self.assertEqual(excluidos, [excluido, self.clientes[1].pk])
+        self.assertFalse(any(pagina["itens"] for pagina in paginas))
+
+        # Lápides fora da retenção são removidas pelo comando
+        RegistroExcluido.objects.update(
+            data_exclusao=timezone.now() - timedelta(days=40)
+        )
+        call_command("limpar_exclusoes", "--dias", "30", stdout=StringIO())
+        self.assertFalse(RegistroExcluido.objects.filter(objeto_id__gt=0).exists())
+        paginas, _ = self.sincronizar("clientes")
+        self.assertEqual(paginas[0]["excluidos"], [])
+
+    def test_tabela_parada_nao_expira_o_cursor(self):
+        """Testa que o cursor de uma tabela sem alterações há mais que a
+        retenção continua válido (sem 410 a cada consulta)"""
+        antigo = timezone.now() - timedelta(days=settings.FEED_RETENCAO_DIAS + 10)
+        Cliente.objects.update(data_atualizacao=antigo)
+        RegistroExcluido.objects.create(
+            modelo="cliente", objeto_id=999, data_exclusao=antigo
+        )
+        SincronizacaoService.limpar_exclusoes()
+
+        paginas, cursor = self.sincronizar("clientes")
+        self.assertEqual(len([i for p in paginas for i in p["itens"]]), 5)
+        self.assertEqual(paginas[0]["excluidos"], [])
+        for _ in range(2):
+            paginas, cursor = self.sincronizar("clientes", cursor)
+            self.assertEqual(paginas[0]["itens"], [])
+
+    def test_especialidades_alteram_o_profissional(self):
+        """Testa que a relação m2m vai no item e sua alteração o reenvia"""
+        profissional = Profissional.objects.create(
+            nome="Bia", telefone="(11) 98888-8888", dias_semana="1,2,3"
+        )
+        profissional.especialidades.add(self.servico)
+        paginas, cursor = self.sincronizar("profissionais")
+        self.assertEqual(paginas[-1]["campos"][-1], "especialidades")
+        self.assertEqual(paginas[0]["itens"][0][-1], [self.servico.pk])
+
+        self.servico.profissional_set.clear()
+        paginas, _ = self.sincronizar("profissionais", cursor)
+        self.assertEqual(paginas[0]["itens"][0][0], profissional.pk)
+        self.assertEqual(paginas[0]["itens"][0][-1], [])
+
+    def test_cursor_invalido_ou_expirado(self):
+        """Testa 400 para cursor malformado ou fora do intervalo, 410 para
+        expirado e 404 para recurso desconhecido"""
+        url = reverse("appointments:api_alteracoes", args=["clientes"])
+        self.assertEqual(self.client.get(url, {"cursor": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"limite": "-1"}).status_code, 400)
+        enorme = f"{10 ** 20}-1"
+        self.assertEqual(self.client.get(url, {"cursor": enorme}).status_code, 400)
+
+        antigo = timezone.now() - timedelta(days=settings.FEED_RETENCAO_DIAS + 1)
+        RegistroExcluido.objects.create(
+            modelo="cliente", objeto_id=999, data_exclusao=antigo
+        )
+        SincronizacaoService.limpar_exclusoes()
+        cursor = SincronizacaoService.codificar_cursor(antigo - timedelta(days=1), 1)
+        self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 410)
+        url = reverse("appointments:api_alteracoes", args=["usuarios"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class _ReceptorWebhook(BaseHTTPRequestHandler):
+    """Integração local para os testes: guarda os lotes recebidos e responde
+    com os status de server.respostas (200 quando a lista acaba)"""
+
+    def do_POST(self):
+        servidor = self.server
+        corpo = self.rfile.read(int(self.headers["Content-Length"]))
+        with servidor.trava:
+            servidor.simultaneas += 1
+            servidor.maximo = max(servidor.maximo, servidor.simultaneas)
+        threading.Event().wait(servidor.atraso)
+        with servidor.trava:
+            servidor.simultaneas -= 1
+            servidor.lotes.append((self.headers, corpo))
+            status = servidor.respostas.pop(0) if servidor.respostas else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBHOOK_BACKOFF_S=0)
+class WebhookTest(TestCase):
+    """Testa a tabela de saída e a entrega em lotes aos webhooks"""
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ReceptorWebhook)
+        self.servidor.trava = threading.Lock()
+        self.servidor.lotes, self.servidor.respostas = [], []
+        self.servidor.simultaneas = self.servidor.maximo = 0
+        self.servidor.atraso = 0
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.configurar(self.servidor_url())
+
+        self.cliente = Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+        self.servico = Servico.objects.create(nome="Corte", preco=Decimal("40.00"))
+        self.profissional = Profissional.objects.create(
+            nome="Bia",
+            telefone="(11) 98888-8888",
+            dias_semana="1,2,3,4,5,6,7",
+            horario_inicio=time(8, 0),
+            horario_fim=time(18, 0),
+        )
+        self.profissional.especialidades.add(self.servico)
+        amanha = get_local_today() + timedelta(days=1)
+        self.data_hora = timezone.make_aware(datetime.combine(amanha, time(15, 0)))
+
+    def configurar(self, url, **opcoes):
+        webhooks = override_settings(
+            WEBHOOKS={"crm": {"url": url, "segredo": "segredo", **opcoes}}
+        )
+        webhooks.enable()
+        self.addCleanup(webhooks.disable)
+
+    def despachar(self, falhas=False):
+        if not falhas:
+            call_command("despachar_webhooks", "--uma-vez", stdout=StringIO())
+            return
+        with self.assertLogs(
+            "appointments.management.commands.despachar_webhooks", "WARNING"
+        ):
+            call_command("despachar_webhooks", "--uma-vez", stdout=StringIO())
+
+    def eventos_recebidos(self):
+        return [
+            evento
+            for _, corpo in self.servidor.lotes
+            for evento in json.loads(corpo)["eventos"]
+        ]
+
+    def test_eventos_na_transacao_da_alteracao(self):
+        """Testa que criação, status e reagendamento gravam eventos sem rede e
+        que uma transação desfeita não deixa evento"""
+        agendamento = AgendamentoService.criar_agendamento(
+            self.cliente, self.profissional, self.servico, self.data_hora
+        )
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            TransicaoService.transicionar(agendamento, "CONFIRMADO")
+            raise RuntimeError
+        agendamento.refresh_from_db()
+        TransicaoService.transicionar(agendamento, "CONFIRMADO")
+        self.client.post(
+            reverse("appointments:agendamento_edit", args=[agendamento.pk]),
+            {
+                "cliente": self.cliente.pk,
+                "profissional": self.profissional.pk,
+                "servico": self.servico.pk,
+                "data": self.data_hora.date().isoformat(),
+                "hora": "16:00",
+            },
+        )
+
+        self.assertEqual(self.servidor.lotes, [])
+        self.assertEqual(
+            list(EventoSaida.objects.order_by("id").values_list("tipo", flat=True)),
+            [
+                "agendamento.criado",
+                "agendamento.status_alterado",
+                "agendamento.reagendado",
+            ],
+        )
+        reagendado = EventoSaida.objects.get(tipo="agendamento.reagendado")
+        self.assertEqual(
+            reagendado.dados["data_hora_anterior"], self.data_hora.isoformat()
+        )
+
+    def test_entrega_em_lote_assinada(self):
+        """Testa um POST por lote, com assinatura HMAC, e eventos entregues"""
+        WebhookService.publicar(
+            "agendamento.status_alterado",
+            [(pk, {"status": "CONCLUIDO"}) for pk in (1, 2, 3)],
+        )
+        self.despachar()
+
+        self.assertEqual(len(self.servidor.lotes), 1)
+        cabecalhos, corpo = self.servidor.lotes[0]
+        assinatura = hmac.new(b"segredo", corpo, hashlib.sha256).hexdigest()
+        self.assertEqual(cabecalhos["X-Webhook-Assinatura"], f"sha256={assinatura}")
+        self.assertEqual(
+            [evento["agendamento_id"] for evento in self.eventos_recebidos()],
+            [1, 2, 3],
+        )
+        self.assertEqual(
+            EventoSaida.objects.filter(status=EventoSaida.Status.ENTREGUE).count(), 3
+        )
+
+    @override_settings(WEBHOOK_MAX_TENTATIVAS=3)
+    def test_novas_tentativas_ate_falhar(self):
+        """Testa a repetição após erro e a desistência após o limite"""
+        self.servidor.respostas = [500, 200]
+        WebhookService.publicar("agendamento.criado", [(1, {})])
+        self.despachar(falhas=True)
+        evento = EventoSaida.objects.get()
+        self.assertEqual(evento.status, EventoSaida.Status.ENTREGUE)
+        self.assertEqual(evento.tentativas, 2)
+
+        self.servidor.respostas = [500, 503, 500]
+        WebhookService.publicar("agendamento.criado", [(2, {})])
+        self.despachar(falhas=True)
+        evento = EventoSaida.objects.get(objeto_id=2)
+        self.assertEqual(evento.status, EventoSaida.Status.FALHOU)
+        self.assertEqual((evento.tentativas, evento.ultimo_erro), (3, "HTTP 500"))
+
+    @override_settings(WEBHOOK_LOTE=1)
+    def test_concorrencia_por_destino(self):
+        """Testa que o destino nunca recebe mais requisições que o limite"""
+        self.configurar(self.servidor_url(), concorrencia=2)
+        self.servidor.atraso = 0.05
+        WebhookService.publicar(
+            "agendamento.criado", [(pk, {}) for pk in range(1, 7)]
+        )
+        self.despachar()
+        self.assertEqual(len(self.servidor.lotes), 6)
+        self.assertEqual(self.servidor.maximo, 2)
+
+    @override_settings(WEBHOOK_BACKOFF_S=60)
+    def test_destino_fora_do_ar(self):
+        """Testa que o agendamento não depende da integração e o evento é
+        adiado com backoff"""
+        with socket.socket() as livre:
+            livre.bind(("127.0.0.1", 0))
+            porta = livre.getsockname()[1]
+        self.configurar(f"http://127.0.0.1:{porta}/")
+
+        agendamento = AgendamentoService.criar_agendamento(
+            self.cliente, self.profissional, self.servico, self.data_hora
+        )
+        self.assertEqual(agendamento.status, "AGENDADO")
+        self.despachar(falhas=True)
+
+        evento = EventoSaida.objects.get()
+        self.assertEqual(evento.status, EventoSaida.Status.PENDENTE)
+        self.assertEqual(evento.tentativas, 1)
+        self.assertTrue(evento.ultimo_erro)
+        self.assertGreater(
+            evento.proxima_tentativa, timezone.now() + timedelta(seconds=25)
+        )
+
+    def servidor_url(self):
+        return f"http://127.0.0.1:{self.servidor.server_port}/"
+
+
+class CalendarioTest(TestCase):
+    """Testa as agendas em iCalendar: conteúdo, janela, streaming e 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = Cliente.objects.create(nome="Ana", telefone="(11) 99999-9999")
+        self.servico = Servico.objects.create(
+            nome="Corte", preco=Decimal("40.00"), duracao_minutos=45
+        )
+        self.profissionais = [
+            Profissional.objects.create(
+                nome=nome, telefone="(11) 98888-8888", dias_semana="1,2,3,4,5,6,7"
+            )
+            for nome in ("Bia", "Carla")
+        ]
+        amanha = timezone.now() + timedelta(days=1)
+        self.agendamentos = [
+            Agendamento.objects.create(
+                cliente=self.cliente,
+                profissional=profissional,
+                servico=self.servico,
+                data_hora=amanha,
+                observacoes="Cabelo longo; trazer foto, se possível, e chegar antes",
+            )
+            for profissional in self.profissionais
+        ]
+        self.url = reverse(
+            "appointments:agenda_profissional_ics", args=[self.profissionais[0].pk]
+        )
+
+    def ler(self, url, **cabecalhos):
+        resposta = self.client.get(url, **cabecalhos)
+        self.assertTrue(resposta.streaming)
+        return resposta, b"".join(resposta.streaming_content).decode()
+
+    def test_eventos_da_janela(self):
+        """Testa os eventos do profissional, sem cancelados nem fora da janela"""
+        Agendamento.objects.create(
+            cliente=self.cliente,
+            profissional=self.profissionais[0],
+            servico=self.servico,
+            data_hora=timezone.now() + timedelta(days=2),
+            status="CANCELADO",
+        )
+        Agendamento.objects.create(
+            cliente=self.cliente,
+            profissional=self.profissionais[0],
+            servico=self.servico,
+            data_hora=timezone.now()
+            + timedelta(days=settings.AGENDA_ICS_DIAS_FUTUROS + 1),
+        )
+        resposta, corpo = self.ler(self.url)
+
+        self.assertEqual(resposta["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertTrue(corpo.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(corpo.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(corpo.count("BEGIN:VEVENT"), 1)
+        self.assertIn(f"UID:agendamento-{self.agendamentos[0].pk}@testserver", corpo)
+        self.assertIn("SUMMARY:Corte - Ana", corpo)
+        # Texto escapado e linhas dobradas em no máximo 75 bytes
+        self.assertIn("\r\n ", corpo)
+        self.assertTrue(
+            all(len(linha.encode()) <= 75 for linha in corpo.split("\r\n"))
+        )
+        self.assertIn(
+            "Cabelo longo\\; trazer foto\\, se possível",
+            corpo.replace("\r\n ", ""),
+        )
+
+        _, corpo = self.ler(reverse("appointments:agenda_ics"))
+        self.assertEqual(corpo.count("BEGIN:VEVENT"), 2)
+
+    def test_304_sem_alteracao(self):
+        """Testa 304 com a mesma ETag e 200 após alterar agendamento ou cliente"""
+        resposta, _ = self.ler(self.url)
+        etag = resposta["ETag"]
+        resposta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+
+        # Agendamento de outro profissional não muda a agenda
+        self.agendamentos[1].observacoes = "Outra"
+        self.agendamentos[1].save()
+        resposta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+
+        self.cliente.nome = "Ana Paula"
+        self.cliente.save()
+        resposta, corpo = self.ler(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn("SUMMARY:Corte - Ana Paula", corpo)
+
+        etag = resposta["ETag"]
+        TransicaoService.transicionar(self.agendamentos[0], "CANCELADO")
+        resposta, corpo = self.ler(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotIn("BEGIN:VEVENT", corpo)
+
+    def test_profissional_inativo(self):
+        """Testa 404 para profissional inativo ou inexistente"""
+        Profissional.objects.filter(pk=self.profissionais[0].pk).update(ativo=False)
+        ReferenciaService.invalidar()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        url = reverse("appointments:agenda_profissional_ics", args=[999])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_corpo_assincrono(self):
+        """Testa que a versão ASGI do corpo gera o mesmo calendário"""
+        eventos = CalendarioService.eventos(CalendarioService.agendamentos())
+
+        async def ler():
+            return [
+                parte
+                async for parte in CalendarioService.corpo_async(
+                    eventos, "Agenda", "testserver"
+                )
+            ]
+
+        self.assertEqual(
+            "".join(async_to_sync(ler)()),
+            "".join(CalendarioService.corpo(eventos, "Agenda", "testserver")),
+        )
@@ -29,6 +29,11 @@ urlpatterns = [
         views.atualizar_status_agendamento,
         name="atualizar_status",
     ),
+    path(
+        "agendamentos/<int:pk>/historico/",
+        views.historico_agendamento,
+        name="agendamento_historico",
+    ),
     # Relatórios
     path("relatorios/servicos/", views.relatorio_servicos, name="relatorio_servicos"),
     # Clientes
@@ -53,6 +58,13 @@ urlpatterns = [
         views.ProfissionalUpdateView.as_view(),
         name="profissional_update",
     ),
+    # Calendário (iCalendar)
+    path("agenda.ics", views.AgendaIcsView.as_view(), name="agenda_ics"),
+    path(
+        "profissionais/<int:pk>/agenda.ics",
+        views.AgendaProfissionalIcsView.as_view(),
+        name="agenda_profissional_ics",
+    ),
     # Serviços
     path("servicos/", views.ServicoListView.as_view(), name="servico_list"),
     path("servicos/novo/", views.ServicoCreateView.as_view(), name="servico_create"),
@@ -67,4 +79,19 @@ urlpatterns = [
         views.api_horarios_disponiveis,
         name="api_horarios_disponiveis",
     ),
+    path(
+        "api/compatibilidade/",
+        views.api_compatibilidade,
+        name="api_compatibilidade",
+    ),
+    path(
+        "api/agendamentos/status-lote/",
+        views.api_alterar_status_lote,
+        name="api_alterar_status_lote",
+    ),
+    path(
+        "api/alteracoes/<str:recurso>/",
+        views.api_alteracoes,
+        name="api_alteracoes",
+    ),
 ]
@@ -2,6 +2,10 @@
 Utilitários para o app appointments
 """
 
+import calendar
+import re
+from datetime import datetime, time, timedelta
+
 from django.utils import timezone
 
 
@@ -17,3 +21,59 @@ def get_local_today():
     Retorna a data atual no timezone configurado (America/Sao_Paulo)
     """
     return get_local_now().date()
+
+
+def get_inicio_do_dia(data):
+    """
+    Retorna o datetime aware de 00:00 da data no timezone configurado,
+    para filtrar por intervalo de data_hora (aproveitando os índices)
+    """
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def ler_data(texto):
+    """
+    Converte "AAAA-MM-DD" em date; retorna None se vazio ou inválido
+    """
+    try:
+        return datetime.strptime(texto, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def filtro_periodo(data_inicio=None, data_fim=None, campo="data_hora"):
+    """
+    Retorna os kwargs de filter() para as datas locais de data_inicio até
+    data_fim (inclusive) como intervalo do datetime, em vez de campo__date,
+    que aplica uma função à coluna e impede o uso dos índices
+    """
+    filtro = {}
+    if data_inicio:
+        filtro[f"{campo}__gte"] = get_inicio_do_dia(data_inicio)
+    if data_fim:
+        filtro[f"{campo}__lt"] = get_inicio_do_dia(data_fim + timedelta(days=1))
+    return filtro
+
+
+def subtrair_meses(data, meses):
+    """
+    Retorna a data N meses antes, ajustando o dia para o fim do mês
+    quando necessário (ex.: 31/03 menos 1 mês = 28/02 ou 29/02)
+    """
+    ano, mes = divmod(data.year * 12 + data.month - 1 - meses, 12)
+    mes += 1
+    ultimo_dia = calendar.monthrange(ano, mes)[1]
+    return data.replace(year=ano, month=mes, day=min(data.day, ultimo_dia))
+
+
+def normalizar_sql(sql):
+    """
+    Retorna a "impressão digital" da consulta: literais e placeholders (%s)
+    trocados por ? e listas IN (?, ?, ...) reduzidas, para agrupar consultas
+    repetidas (N+1)
+    """
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(...)", sql)
+    return re.sub(r"\s+", " ", sql).strip()
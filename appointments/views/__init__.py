@@ -1,12 +1,24 @@
 # Imports centralizados para manter compatibilidade
+from django.conf import settings
+
 from .agendamentos import *
 from .api import *
+from .calendario import AgendaIcsView, AgendaProfissionalIcsView
 from .clientes import *
 from .dashboard import dashboard
+from .metricas import metricas
 from .profissionais import *
 from .relatorios import *
 from .servicos import *
 
+# No servidor ASGI os endpoints JSON usam as versões assíncronas
+if settings.API_ASSINCRONA:
+    from .api_async import (
+        api_alterar_status_lote,
+        api_compatibilidade,
+        api_horarios_disponiveis,
+    )
+
 __all__ = [
     "dashboard",
     # Agendamentos
@@ -15,6 +27,7 @@ __all__ = [
     "AgendamentoCreateView",
     "AgendamentoUpdateView",
     "atualizar_status_agendamento",
+    "historico_agendamento",
     # Clientes
     "ClienteListView",
     "ClienteCreateView",
@@ -29,6 +42,14 @@ __all__ = [
     "ServicoUpdateView",
     # Relatórios
     "relatorio_servicos",
+    # Calendário (iCalendar)
+    "AgendaIcsView",
+    "AgendaProfissionalIcsView",
     # API
     "api_horarios_disponiveis",
+    "api_compatibilidade",
+    "api_alterar_status_lote",
+    "api_alteracoes",
+    # Métricas
+    "metricas",
 ]
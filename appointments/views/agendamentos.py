@@ -1,16 +1,29 @@
 from django.contrib import messages
-from django.db import IntegrityError
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
 from ..forms import AgendamentoForm
-from ..models import Agendamento, HistoricoAgendamento, Profissional
-from ..utils import get_local_today
-
-
-class AgendamentoListView(ListView):
+from ..models import Agendamento, Cliente, HistoricoAgendamento
+from ..routers import banco_escrita, ler_da_replica
+from ..services.auditoria_service import AuditoriaService
+from ..services.historico_service import HistoricoService
+from ..services.metricas_service import MetricasService
+from ..services.referencia_service import ReferenciaService
+from ..services.transicao_service import TransicaoInvalida, TransicaoService
+from ..services.versao_service import VersaoService
+from ..services.webhook_service import WebhookService
+from ..utils import filtro_periodo, ler_data
+from .mixins import GetCondicionalMixin
+
+
+@method_decorator(ler_da_replica, name="dispatch")
+class AgendamentoListView(GetCondicionalMixin, ListView):
     """Lista de agendamentos com filtros"""
 
     model = Agendamento
@@ -32,24 +45,34 @@ class AgendamentoListView(ListView):
         if profissional:
             queryset = queryset.filter(profissional_id=profissional)
 
-        data_inicio = self.request.GET.get("data_inicio")
-        if data_inicio:
-            queryset = queryset.filter(data_hora__date__gte=data_inicio)
-
-        data_fim = self.request.GET.get("data_fim")
-        if data_fim:
-            queryset = queryset.filter(data_hora__date__lte=data_fim)
+        # Datas inválidas são ignoradas, como filtros vazios
+        queryset = queryset.filter(
+            **filtro_periodo(
+                ler_data(self.request.GET.get("data_inicio")),
+                ler_data(self.request.GET.get("data_fim")),
+            )
+        )
 
         return queryset
 
+    def versao_pagina(self):
+        # Nomes de clientes, profissionais e serviços aparecem nas linhas
+        ultima, partes = super().versao_pagina()
+        return ultima, (
+            *partes,
+            ReferenciaService.get_versao(),
+            VersaoService.ultima_alteracao(Cliente),
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["profissionais"] = Profissional.objects.filter(ativo=True)
-        context["status_choices"] = Agendamento.STATUS_CHOICES
+        context["profissionais"] = ReferenciaService.profissionais_ativos()
+        context["status_choices"] = ReferenciaService.status_choices()
+        context["versao_referencias"] = ReferenciaService.get_versao()
         return context
 
 
-class AgendamentoDetailView(DetailView):
+class AgendamentoDetailView(GetCondicionalMixin, DetailView):
     """Detalhes do agendamento"""
 
     model = Agendamento
@@ -59,6 +82,67 @@ class AgendamentoDetailView(DetailView):
     def get_queryset(self):
         return Agendamento.objects.select_related("cliente", "profissional", "servico")
 
+    def versao_pagina(self):
+        """Agendamento, cadastros relacionados e histórico, em uma consulta"""
+        versao = (
+            Agendamento.objects.filter(pk=self.kwargs["pk"])
+            .annotate(
+                historico_total=Count("historico"),
+                historico_ultimo=Max("historico__data_acao"),
+            )
+            .values_list(
+                "data_atualizacao",
+                "cliente__data_atualizacao",
+                "profissional__data_atualizacao",
+                "servico__data_atualizacao",
+                "historico_total",
+                "historico_ultimo",
+            )
+            .first()
+        )
+        if versao is None:
+            return None, ()
+        ultima = max(data for data in (*versao[:4], versao[5]) if data)
+        return ultima, versao
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["historico"], context["proximo_cursor"] = HistoricoService.pagina(
+            self.object
+        )
+        rotulos = dict(Agendamento.STATUS_CHOICES)
+        context["status_permitidos"] = [
+            (status, rotulos[status])
+            for status in TransicaoService.destinos_permitidos(self.object.status)
+        ]
+        return context
+
+
+def historico_agendamento(request, pk):
+    """Próxima página da linha do tempo do histórico (HTML parcial)"""
+    agendamento = get_object_or_404(
+        Agendamento.objects.select_related("cliente", "profissional").only(
+            "id", "cliente__nome", "profissional__nome"
+        ),
+        pk=pk,
+    )
+    try:
+        historico, proximo_cursor = HistoricoService.pagina(
+            agendamento, request.GET.get("cursor")
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Cursor inválido")
+
+    return render(
+        request,
+        "appointments/agendamentos/_historico.html",
+        {
+            "agendamento": agendamento,
+            "historico": historico,
+            "proximo_cursor": proximo_cursor,
+        },
+    )
+
 
 class AgendamentoCreateView(CreateView):
     """Criação de novo agendamento"""
@@ -70,16 +154,21 @@ class AgendamentoCreateView(CreateView):
 
     def form_valid(self, form):
         try:
-            response = super().form_valid(form)
-
-            # Criar histórico de criação
-            HistoricoAgendamento.objects.create(
-                agendamento=self.object,
-                tipo_acao="CRIADO",
-                descricao=f"Agendamento criado para {self.object.cliente.nome} com {self.object.profissional.nome}",
-                status_novo=self.object.status,
-                usuario="Sistema",
-            )
+            with transaction.atomic(using=banco_escrita()):
+                response = super().form_valid(form)
+
+                # Criar histórico de criação
+                AuditoriaService.registrar(
+                    self.object.pk,
+                    HistoricoAgendamento.TipoAcao.CRIADO,
+                    status_novo=self.object.status,
+                    usuario=self.request.user,
+                    descricao=HistoricoAgendamento.descricao_criacao(self.object),
+                )
+                WebhookService.publicar(
+                    "agendamento.criado",
+                    [(self.object.pk, WebhookService.dados_agendamento(self.object))],
+                )
 
             # Mensagem de sucesso
             messages.success(self.request, "Agendamento criado com sucesso!")
@@ -87,6 +176,9 @@ class AgendamentoCreateView(CreateView):
 
         except IntegrityError:
             # Tratar conflito de horário de forma elegante
+            MetricasService.incrementar(
+                "salao_agendamentos_recusados_total", motivo="conflito_concorrente"
+            )
             form.add_error(
                 None,
                 "Este horário já foi ocupado por outro agendamento. "
@@ -98,6 +190,8 @@ class AgendamentoCreateView(CreateView):
         context = super().get_context_data(**kwargs)
         context["titulo"] = "Novo Agendamento"
         context["botao_texto"] = "Criar Agendamento"
+        context["profissionais"] = ReferenciaService.profissionais_ativos()
+        context["servicos"] = ReferenciaService.servicos_ativos()
         return context
 
 
@@ -112,81 +206,56 @@ class AgendamentoUpdateView(UpdateView):
     def get_queryset(self):
         return Agendamento.objects.select_related("cliente", "profissional", "servico")
 
+    def get_object(self, queryset=None):
+        agendamento = super().get_object(queryset)
+        # O formulário altera a instância; guardar o horário antes da edição
+        self.horario_anterior = (agendamento.data_hora, agendamento.profissional_id)
+        return agendamento
+
     def form_valid(self, form):
+        with transaction.atomic(using=banco_escrita()):
+            response = super().form_valid(form)
+            horario = (self.object.data_hora, self.object.profissional_id)
+            if horario != self.horario_anterior:
+                data_hora, profissional_id = self.horario_anterior
+                dados = WebhookService.dados_agendamento(self.object)
+                dados["data_hora_anterior"] = timezone.localtime(data_hora).isoformat()
+                dados["profissional_id_anterior"] = profissional_id
+                WebhookService.publicar(
+                    "agendamento.reagendado", [(self.object.pk, dados)]
+                )
         messages.success(self.request, "✅ Agendamento atualizado com sucesso!")
-        return super().form_valid(form)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["titulo"] = "Editar Agendamento"
         context["botao_texto"] = "Salvar Alterações"
+        context["profissionais"] = ReferenciaService.profissionais_ativos()
+        context["servicos"] = ReferenciaService.servicos_ativos()
         return context
 
 
 def atualizar_status_agendamento(request, pk):
     """Atualizar status do agendamento via AJAX"""
     if request.method == "POST":
-        agendamento = get_object_or_404(Agendamento, pk=pk)
+        agendamento = get_object_or_404(
+            Agendamento.objects.only("id", "status", "data_hora"), pk=pk
+        )
         novo_status = request.POST.get("status")
+        ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
-        # Validação: não permitir "EM_ANDAMENTO" para datas passadas
-        if (
-            novo_status == "EM_ANDAMENTO"
-            and agendamento.data_hora.date() < get_local_today()
-        ):
-            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-                return JsonResponse(
-                    {
-                        "success": False,
-                        "error": 'Não é possível marcar como "Em Andamento" agendamentos de datas passadas',
-                    }
-                )
-            else:
-                messages.error(
-                    request,
-                    'Não é possível marcar como "Em Andamento" agendamentos de datas passadas',
-                )
-                return redirect("appointments:agendamento_detail", pk=pk)
-
-        if novo_status in dict(Agendamento.STATUS_CHOICES):
-            status_anterior = agendamento.status
-            agendamento.status = novo_status
-            agendamento.save()
-
-            # Criar histórico da mudança de status
-            descricoes = {
-                "AGENDADO": "Agendamento confirmado e agendado",
-                "CONFIRMADO": "Cliente confirmou o agendamento",
-                "EM_ANDAMENTO": "Atendimento iniciado",
-                "CONCLUIDO": "Atendimento finalizado com sucesso",
-                "CANCELADO": "Agendamento foi cancelado",
-                "NAO_COMPARECEU": "Cliente não compareceu ao agendamento",
-            }
-
-            HistoricoAgendamento.objects.create(
-                agendamento=agendamento,
-                tipo_acao="STATUS_ALTERADO",
-                descricao=descricoes.get(
-                    novo_status,
-                    f"Status alterado para {agendamento.get_status_display()}",
-                ),
-                status_anterior=status_anterior,
-                status_novo=novo_status,
-                usuario="Sistema",
-            )
-
-            messages.success(
-                request, f"Status atualizado para {agendamento.get_status_display()}"
-            )
-
-            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-                return JsonResponse(
-                    {
-                        "success": True,
-                        "message": f"Status atualizado para {agendamento.get_status_display()}",
-                    }
-                )
-        else:
-            messages.error(request, "Status inválido")
+        try:
+            TransicaoService.transicionar(agendamento, novo_status, request.user)
+        except TransicaoInvalida as e:
+            if ajax:
+                return JsonResponse({"success": False, "error": str(e)})
+            messages.error(request, str(e))
+            return redirect("appointments:agendamento_detail", pk=pk)
+
+        mensagem = f"Status atualizado para {agendamento.get_status_display()}"
+        messages.success(request, mensagem)
+        if ajax:
+            return JsonResponse({"success": True, "message": mensagem})
 
     return redirect("appointments:agendamento_detail", pk=pk)
@@ -1,30 +1,40 @@
+import json
 from datetime import datetime
 
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_POST
 
-from ..models import Agendamento, Profissional
+from ..models import Agendamento
+from ..services.agendamento_service import AgendamentoService
+from ..services.compatibilidade_service import CompatibilidadeService
+from ..services.referencia_service import ReferenciaService
+from ..services.sincronizacao_service import (
+    FEEDS,
+    CursorExpirado,
+    SincronizacaoService,
+)
+from ..utils import filtro_periodo
 
+STATUS_OCUPADOS = ["AGENDADO", "CONFIRMADO", "EM_ANDAMENTO"]
 
-def api_horarios_disponiveis(request):
-    """API para retornar horários disponíveis para um profissional em uma data"""
-    profissional_id = request.GET.get("profissional_id")
-    data = request.GET.get("data")
 
-    if not profissional_id or not data:
-        return JsonResponse({"error": "Parâmetros inválidos"}, status=400)
+def horarios_ocupados(profissional_id, data):
+    """Horários (locais) já marcados para o profissional na data"""
+    return Agendamento.objects.filter(
+        profissional_id=profissional_id,
+        **filtro_periodo(data, data),
+        status__in=STATUS_OCUPADOS,
+    ).values_list("data_hora__time", flat=True)
 
-    try:
-        profissional = Profissional.objects.get(id=profissional_id, ativo=True)
-        data_obj = datetime.strptime(data, "%Y-%m-%d").date()
-    except (Profissional.DoesNotExist, ValueError):
-        return JsonResponse({"error": "Profissional ou data inválidos"}, status=400)
 
+def horarios_livres(profissional, data, ocupados):
+    """Horários de trabalho do dia (de hora em hora - todos os serviços têm
+    60min) que não estão em ocupados"""
     # Verificar se o profissional trabalha neste dia da semana
-    dia_semana = data_obj.isoweekday()  # 1=segunda, 7=domingo
+    dia_semana = data.isoweekday()  # 1=segunda, 7=domingo
     if dia_semana not in profissional.lista_dias_semana:
-        return JsonResponse({"horarios": []})
+        return []
 
-    # Gerar horários de trabalho (de hora em hora - todos os serviços têm 60min)
     horarios_trabalho = []
     hora_atual = profissional.horario_inicio
 
@@ -37,18 +47,129 @@ def api_horarios_disponiveis(request):
         else:
             break
 
-    # Buscar agendamentos já marcados nesta data (simples: só verificar horário exato)
-    agendamentos_ocupados = Agendamento.objects.filter(
-        profissional=profissional,
-        data_hora__date=data_obj,
-        status__in=["AGENDADO", "CONFIRMADO", "EM_ANDAMENTO"],
-    ).values_list("data_hora__time", flat=True)
-
-    # Filtrar horários disponíveis (simples: horários não ocupados)
-    horarios_disponiveis = [
-        hora.strftime("%H:%M")
-        for hora in horarios_trabalho
-        if hora not in agendamentos_ocupados
+    # Filtrar horários disponíveis (simples: só verificar horário exato)
+    ocupados = set(ocupados)
+    return [
+        hora.strftime("%H:%M") for hora in horarios_trabalho if hora not in ocupados
     ]
 
-    return JsonResponse({"horarios": horarios_disponiveis})
+
+def parametros_status_lote(request):
+    """(ids, novo_status) do corpo JSON ou do formulário; ValueError com a
+    mensagem de erro se inválidos"""
+    if request.content_type == "application/json":
+        try:
+            dados = json.loads(request.body or b"{}")
+        except ValueError:
+            raise ValueError("JSON inválido")
+        if not isinstance(dados, dict):
+            raise ValueError("JSON inválido")
+        ids = dados.get("ids", [])
+        novo_status = dados.get("status")
+    else:
+        ids = request.POST.getlist("ids")
+        novo_status = request.POST.get("status")
+
+    try:
+        ids = sorted({int(pk) for pk in ids})
+    except (TypeError, ValueError):
+        raise ValueError("IDs inválidos")
+
+    if not ids:
+        raise ValueError("Nenhum agendamento informado")
+    return ids, novo_status
+
+
+def resposta_status_lote(ids, novo_status, alterados):
+    return JsonResponse(
+        {
+            "success": True,
+            "status": novo_status,
+            "alterados": alterados,
+            "ignorados": sorted(set(ids) - set(alterados)),
+        }
+    )
+
+
+def api_horarios_disponiveis(request):
+    """API para retornar horários disponíveis para um profissional em uma data"""
+    profissional_id = request.GET.get("profissional_id")
+    data = request.GET.get("data")
+
+    if not profissional_id or not data:
+        return JsonResponse({"error": "Parâmetros inválidos"}, status=400)
+
+    profissional = ReferenciaService.profissional_ativo(profissional_id)
+    try:
+        data_obj = datetime.strptime(data, "%Y-%m-%d").date()
+    except ValueError:
+        profissional = None
+    if profissional is None:
+        return JsonResponse({"error": "Profissional ou data inválidos"}, status=400)
+
+    if data_obj.isoweekday() not in profissional.lista_dias_semana:
+        return JsonResponse({"horarios": []})
+
+    ocupados = horarios_ocupados(profissional.pk, data_obj)
+    return JsonResponse({"horarios": horarios_livres(profissional, data_obj, ocupados)})
+
+
+def api_compatibilidade(request):
+    """API com a matriz profissional → serviços (usada para filtrar o formulário)"""
+    return resposta_compatibilidade(request, CompatibilidadeService.como_dict())
+
+
+def resposta_compatibilidade(request, dados):
+    etag = f'"compatibilidade-{dados["versao"]}"'
+
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(dados)
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@require_POST
+def api_alterar_status_lote(request):
+    """API para alterar o status de vários agendamentos (ex.: fechamento do dia)"""
+    try:
+        ids, novo_status = parametros_status_lote(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    usuario = request.user if request.user.is_authenticated else None
+    try:
+        alterados = AgendamentoService.alterar_status_em_lote(
+            ids, novo_status, usuario=usuario
+        )
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    return resposta_status_lote(ids, novo_status, alterados)
+
+
+def api_alteracoes(request, recurso):
+    """Feed de alterações de um model para sincronização incremental
+
+    ?cursor= da resposta anterior (vazio: desde o início) e ?limite=. O
+    cliente repete a chamada enquanto "mais" for true e guarda o cursor.
+    """
+    if recurso not in FEEDS:
+        raise Http404("Recurso desconhecido")
+    try:
+        limite = int(request.GET.get("limite") or 0) or None
+        if limite is not None and limite < 0:
+            raise ValueError
+        dados = SincronizacaoService.pagina(
+            recurso, request.GET.get("cursor") or None, limite
+        )
+    except ValueError:
+        return JsonResponse({"error": "Cursor ou limite inválido"}, status=400)
+    except CursorExpirado:
+        return JsonResponse(
+            {"error": "Cursor expirado: sincronize do início (sem cursor)"},
+            status=410,
+        )
+    return JsonResponse(dados)
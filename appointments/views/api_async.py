@@ -0,0 +1,91 @@
+"""Versões assíncronas dos endpoints JSON, usadas no servidor ASGI
+
+Mesmos nomes, URLs e respostas de api.py (views/__init__.py escolhe o módulo
+por settings.API_ASSINCRONA). No Django 4.2 transações não funcionam no modo
+assíncrono: o que grava roda em sync_to_async, dentro dos serviços de sempre.
+
+Chamadas sync_to_async (e os aiterator do ORM) dividem uma única thread por
+requisição, então consultas seguidas não rodam em paralelo. Por isso a
+alteração de status pelo detalhe (atualizar_status_agendamento: sessão,
+mensagens e redirect) continua síncrona: a versão assíncrona seria um único
+sync_to_async, o mesmo que o Django já faz com views síncronas em ASGI.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+from ..services.agendamento_service import AgendamentoService
+from ..services.compatibilidade_service import CompatibilidadeService
+from ..services.referencia_service import ReferenciaService
+from ..utils import ler_data
+from .api import (
+    horarios_livres,
+    horarios_ocupados,
+    parametros_status_lote,
+    resposta_compatibilidade,
+    resposta_status_lote,
+)
+
+
+async def _horarios_ocupados(profissional_id, data):
+    return [hora async for hora in horarios_ocupados(profissional_id, data)]
+
+
+def _usuario(request):
+    # request.user consulta a sessão no banco: só em código síncrono
+    return request.user if request.user.is_authenticated else None
+
+
+async def api_horarios_disponiveis(request):
+    """API para retornar horários disponíveis para um profissional em uma data"""
+    profissional_id = request.GET.get("profissional_id")
+    data = request.GET.get("data")
+
+    if not profissional_id or not data:
+        return JsonResponse({"error": "Parâmetros inválidos"}, status=400)
+
+    data_obj = ler_data(data)
+    try:
+        profissional_id = int(profissional_id)
+    except ValueError:
+        data_obj = None
+    if data_obj is None:
+        return JsonResponse({"error": "Profissional ou data inválidos"}, status=400)
+
+    # Em sequência: as duas passariam pela mesma thread (asyncio.gather não
+    # as paralelizaria) e um profissional inválido dispensa a segunda
+    profissional = await sync_to_async(ReferenciaService.profissional_ativo)(
+        profissional_id
+    )
+    if profissional is None:
+        return JsonResponse({"error": "Profissional ou data inválidos"}, status=400)
+    ocupados = await _horarios_ocupados(profissional_id, data_obj)
+
+    return JsonResponse({"horarios": horarios_livres(profissional, data_obj, ocupados)})
+
+
+async def api_compatibilidade(request):
+    """API com a matriz profissional → serviços (usada para filtrar o formulário)"""
+    dados = await sync_to_async(CompatibilidadeService.como_dict)()
+    return resposta_compatibilidade(request, dados)
+
+
+async def api_alterar_status_lote(request):
+    """API para alterar o status de vários agendamentos (ex.: fechamento do dia)"""
+    # require_POST só aceita views assíncronas a partir do Django 5.0
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        ids, novo_status = parametros_status_lote(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    usuario = await sync_to_async(_usuario)(request)
+    try:
+        alterados = await sync_to_async(AgendamentoService.alterar_status_em_lote)(
+            ids, novo_status, usuario=usuario
+        )
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    return resposta_status_lote(ids, novo_status, alterados)
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+
+from ..models import Cliente
+from ..routers import ler_da_replica
+from ..services.calendario_service import CalendarioService
+from ..services.referencia_service import ReferenciaService
+from ..services.versao_service import VersaoService
+from .mixins import GetCondicionalMixin
+
+
+@method_decorator(ler_da_replica, name="dispatch")
+class AgendaIcsView(GetCondicionalMixin, View):
+    """Agenda do salão em iCalendar, para assinatura em apps de calendário
+
+    Os apps consultam a cada poucos minutos: sem alteração recebem 304 após
+    uma consulta agregada; com alteração o arquivo é enviado em blocos.
+    """
+
+    profissional_id = None
+    nome_calendario = "Agenda do salão"
+    nome_arquivo = "agenda.ics"
+
+    def get_queryset(self):
+        return CalendarioService.agendamentos(self.profissional_id)
+
+    def versao_pagina(self):
+        # A janela anda todo dia; nomes de clientes e serviços vão nos eventos
+        ultima, partes = super().versao_pagina()
+        inicio = CalendarioService.janela()[0]
+        return ultima or inicio, (
+            *partes,
+            inicio,
+            ReferenciaService.get_versao(),
+            VersaoService.ultima_alteracao(Cliente),
+        )
+
+    def get(self, request, *args, **kwargs):
+        eventos = CalendarioService.eventos(self.get_queryset())
+        # O corpo é lido depois que o salão e a réplica da requisição foram
+        # desativados: fixar aqui o banco escolhido pelo router
+        eventos = eventos.using(eventos.db)
+        dominio = request.get_host().split(":", 1)[0]
+        corpo = (
+            CalendarioService.corpo_async
+            if settings.API_ASSINCRONA
+            else CalendarioService.corpo
+        )
+        resposta = StreamingHttpResponse(
+            corpo(eventos, self.nome_calendario, dominio),
+            content_type="text/calendar; charset=utf-8",
+        )
+        resposta["Content-Disposition"] = f'inline; filename="{self.nome_arquivo}"'
+        return resposta
+
+
+class AgendaProfissionalIcsView(AgendaIcsView):
+    """Agenda de um profissional ativo em iCalendar"""
+
+    def dispatch(self, request, *args, **kwargs):
+        profissional = ReferenciaService.profissional_ativo(kwargs["pk"])
+        if profissional is None:
+            raise Http404("Profissional não encontrado")
+        self.profissional_id = profissional.pk
+        self.nome_calendario = f"Agenda - {profissional.nome}"
+        self.nome_arquivo = f"agenda-{profissional.pk}.ics"
+        return super().dispatch(request, *args, **kwargs)
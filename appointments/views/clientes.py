@@ -1,13 +1,17 @@
 from django.contrib import messages
 from django.db.models import Q
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, ListView, UpdateView
 
 from ..forms import ClienteForm
 from ..models import Cliente
+from ..routers import ler_da_replica
+from .mixins import GetCondicionalMixin
 
 
-class ClienteListView(ListView):
+@method_decorator(ler_da_replica, name="dispatch")
+class ClienteListView(GetCondicionalMixin, ListView):
     model = Cliente
     template_name = "appointments/clientes/cliente_list.html"
     context_object_name = "clientes"
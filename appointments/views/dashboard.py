@@ -1,9 +1,14 @@
+from collections import Counter
+
 from django.shortcuts import render
 
-from ..models import Agendamento, Cliente, Profissional, Servico
-from ..utils import get_local_now, get_local_today
+from ..models import Agendamento, Cliente
+from ..routers import ler_da_replica
+from ..services.referencia_service import ReferenciaService
+from ..utils import filtro_periodo, get_local_now, get_local_today
 
 
+@ler_da_replica
 def dashboard(request):
     """Dashboard principal do sistema"""
     # Obtém a data atual no timezone configurado (America/Sao_Paulo)
@@ -11,20 +16,22 @@ def dashboard(request):
     hoje = get_local_today()
 
     # Estatísticas do dia
-    agendamentos_hoje = Agendamento.objects.filter(data_hora__date=hoje).select_related(
-        "cliente", "profissional", "servico"
-    )
+    agendamentos_hoje = Agendamento.objects.filter(
+        **filtro_periodo(hoje, hoje)
+    ).select_related("cliente", "profissional", "servico")
+
+    # A lista do dia é exibida inteira: as contagens saem dela, sem COUNTs extras
+    agendamentos_hoje_list = list(agendamentos_hoje.order_by("data_hora"))
+    por_status = Counter(agendamento.status for agendamento in agendamentos_hoje_list)
 
     stats = {
-        "agendamentos_hoje": agendamentos_hoje.count(),
-        "agendamentos_confirmados": agendamentos_hoje.filter(
-            status="CONFIRMADO"
-        ).count(),
-        "agendamentos_concluidos": agendamentos_hoje.filter(status="CONCLUIDO").count(),
-        "agendamentos_cancelados": agendamentos_hoje.filter(status="CANCELADO").count(),
+        "agendamentos_hoje": len(agendamentos_hoje_list),
+        "agendamentos_confirmados": por_status["CONFIRMADO"],
+        "agendamentos_concluidos": por_status["CONCLUIDO"],
+        "agendamentos_cancelados": por_status["CANCELADO"],
         "total_clientes": Cliente.objects.filter(ativo=True).count(),
-        "total_profissionais": Profissional.objects.filter(ativo=True).count(),
-        "total_servicos": Servico.objects.filter(ativo=True).count(),
+        "total_profissionais": len(ReferenciaService.profissionais_ativos()),
+        "total_servicos": len(ReferenciaService.servicos_ativos()),
     }
 
     # Próximos agendamentos (a partir de agora no timezone local)
@@ -36,9 +43,6 @@ def dashboard(request):
         .order_by("data_hora")[:5]
     )
 
-    # Agendamentos de hoje
-    agendamentos_hoje_list = agendamentos_hoje.order_by("data_hora")
-
     context = {
         "stats": stats,
         "proximos_agendamentos": proximos_agendamentos,
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from ..routers import ler_da_replica
+from ..services.metricas_service import MetricasService
+
+
+@ler_da_replica
+def metricas(request):
+    """Métricas no formato do Prometheus, só para os IPs do coletor local"""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICAS_IPS_PERMITIDOS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        MetricasService.exportar(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import quote_etag
+
+from ..saloes import salao_atual
+from ..services.versao_service import VersaoService
+
+
+class GetCondicionalMixin:
+    """ETag a partir da versão dos dados da página
+
+    Um GET condicional de página sem alteração recebe 304 sem renderizar o
+    template. Views que mostram dados de outras tabelas acrescentam as
+    versões delas em versao_pagina(). Sem Last-Modified: a última alteração
+    não muda quando um registro é excluído (a contagem da ETag, sim).
+    """
+
+    def versao_pagina(self):
+        """(última alteração ou None, partes extras da ETag); por padrão, do
+        conjunto filtrado de get_queryset()"""
+        ultima, total = VersaoService.do_conjunto(self.get_queryset())
+        self.total_conjunto = total
+        return ultima, (total,)
+
+    def get_paginator(self, *args, **kwargs):
+        paginator = super().get_paginator(*args, **kwargs)
+        # A contagem da versão serve ao paginador (poupa o COUNT)
+        if getattr(self, "total_conjunto", None) is not None:
+            paginator.count = self.total_conjunto
+        return paginator
+
+    def dispatch(self, request, *args, **kwargs):
+        # Páginas com mensagens pendentes são sempre renderizadas (e não
+        # recebem ETag: a mensagem seria reexibida a partir do cache)
+        if request.method not in ("GET", "HEAD") or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        ultima, partes = self.versao_pagina()
+        if ultima is None:
+            return super().dispatch(request, *args, **kwargs)
+        etag = self._etag(request, ultima, partes)
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            resposta = super().dispatch(request, *args, **kwargs)
+            # A renderização pode criar o segredo CSRF da primeira visita
+            if hasattr(resposta, "render"):
+                resposta.render()
+            etag = self._etag(request, ultima, partes)
+        if resposta.status_code in (200, 304):
+            resposta.headers.setdefault("ETag", etag)
+        # O navegador guarda a página, mas sempre revalida
+        patch_cache_control(resposta, private=True, no_cache=True)
+        patch_vary_headers(resposta, ("Cookie",))
+        return resposta
+
+    @staticmethod
+    def _etag(request, ultima, partes):
+        """A página traz o token CSRF (lido pelo JavaScript) e o usuário: com
+        outro segredo CSRF ou outro login, um 304 serviria a página antiga"""
+        usuario = getattr(request, "user", None)
+        return quote_etag(
+            VersaoService.etag(
+                settings.PAGINAS_VERSAO,
+                salao_atual(),
+                request.META.get("CSRF_COOKIE", ""),
+                getattr(usuario, "pk", None),
+                ultima,
+                *partes,
+            )
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cache_fragmentos_s"] = settings.CACHE_FRAGMENTOS_S
+        context["paginas_versao"] = settings.PAGINAS_VERSAO
+        return context
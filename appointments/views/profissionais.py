@@ -1,22 +1,26 @@
 from django.contrib import messages
 from django.db.models import Q
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, ListView, UpdateView
 
 from ..forms import ProfissionalForm
 from ..models import Profissional
+from ..routers import ler_da_replica
+from ..services.compatibilidade_service import CompatibilidadeService
+from .mixins import GetCondicionalMixin
 
 
-class ProfissionalListView(ListView):
+@method_decorator(ler_da_replica, name="dispatch")
+class ProfissionalListView(GetCondicionalMixin, ListView):
     model = Profissional
     template_name = "appointments/profissionais/profissional_list.html"
     context_object_name = "profissionais"
     paginate_by = 20
 
     def get_queryset(self):
-        queryset = Profissional.objects.filter(ativo=True).prefetch_related(
-            "especialidades"
-        )
+        # Especialidades vêm da matriz de compatibilidade em cache
+        queryset = Profissional.objects.filter(ativo=True)
         search = self.request.GET.get("search", "")
         if search:
             queryset = queryset.filter(
@@ -24,6 +28,16 @@ class ProfissionalListView(ListView):
             )
         return queryset.order_by("nome")
 
+    def versao_pagina(self):
+        # Especialidades mudam sem alterar o profissional (m2m)
+        ultima, partes = super().versao_pagina()
+        return ultima, (*partes, CompatibilidadeService.get_versao())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["versao_compatibilidade"] = CompatibilidadeService.get_versao()
+        return context
+
 
 class ProfissionalCreateView(CreateView):
     model = Profissional
@@ -1,12 +1,16 @@
 from django.contrib import messages
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, ListView, UpdateView
 
 from ..forms import ServicoForm
 from ..models import Servico
+from ..routers import ler_da_replica
+from .mixins import GetCondicionalMixin
 
 
-class ServicoListView(ListView):
+@method_decorator(ler_da_replica, name="dispatch")
+class ServicoListView(GetCondicionalMixin, ListView):
     model = Servico
     template_name = "appointments/servicos/servico_list.html"
     context_object_name = "servicos"
@@ -0,0 +1,21 @@
+# Servidor de produção: gunicorn salon_management.asgi -c gunicorn.conf.py
+# (workers uvicorn; o Dockerfile usa este arquivo). Variáveis de ambiente:
+# PORT, WEB_CONCURRENCY (processos), GUNICORN_TIMEOUT. Com mais de um worker
+# o cache e as métricas precisam ser comuns aos processos (CACHE_BACKEND,
+# METRICAS_ARQUIVO) e o banco usa DB_PERFIL=producao; o Dockerfile define os três.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Cada worker ASGI atende muitas conexões; o limite é a CPU, não a espera
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+# Recicla os workers aos poucos (evita crescimento de memória)
+max_requests = 10000
+max_requests_jitter = 1000
+accesslog = "-"
+errorlog = "-"
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "salon_management.settings")
+# Sob ASGI os endpoints JSON usam as views assíncronas (views/api_async.py)
+os.environ.setdefault("API_ASSINCRONA", "True")
 
 application = get_asgi_application()
@@ -0,0 +1,20 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite com OPTIONS["transaction_mode"] (como no Django 5.1)
+
+    Com "IMMEDIATE", o atomic() pega o lock de escrita já no BEGIN. Uma
+    transação DEFERRED que lê e depois escreve recebe SQLITE_BUSY na hora
+    de promover o lock, sem passar pelo busy_timeout, e falha com
+    "database is locked" sob escritas concorrentes.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("transaction_mode", None)
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        modo = self.settings_dict["OPTIONS"].get("transaction_mode")
+        self.cursor().execute(f"BEGIN {modo}" if modo else "BEGIN")
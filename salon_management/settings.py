@@ -10,9 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import json
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,20 +49,25 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     # Third party apps
     "django_extensions",
-    "django_bootstrap5",
     # Local apps
     "appointments",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "appointments.middleware.WhiteNoiseHibridoMiddleware",
+    "appointments.middleware.SalaoMiddleware",
+    "appointments.middleware.RastreamentoMiddleware",
+    "appointments.middleware.MetricasMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "appointments.middleware.PerfilMiddleware",
+    "appointments.middleware.LeituraReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "appointments.middleware.ReferenciaCacheMiddleware",
 ]
 
 ROOT_URLCONF = "salon_management.urls"
@@ -83,17 +89,229 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "salon_management.wsgi.application"
+ASGI_APPLICATION = "salon_management.asgi.application"
+
+# API assíncrona: com API_ASSINCRONA=True os endpoints JSON usam as views
+# async (views/api_async.py). O salon_management/asgi.py liga por padrão;
+# em produção: gunicorn salon_management.asgi -c gunicorn.conf.py.
+API_ASSINCRONA = config("API_ASSINCRONA", default=False, cast=bool)
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# DB_PERFIL=producao: SQLite em WAL com os pragmas abaixo (aplicados a cada
+# conexão nova em appointments/signals.py), transações com BEGIN IMMEDIATE
+# (esperam o lock pelo busy_timeout em vez de falhar com "database is
+# locked") e conexões reaproveitadas entre requisições. Agende
+# "python manage.py otimizar_banco" (ex.: de hora em hora no cron).
+#
+# DB_ENGINE=postgresql: PostgreSQL (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST,
+# DB_PORT) com conexões persistentes e verificação de saúde. Atrás de um
+# PgBouncer em modo transação use DB_PGBOUNCER=True (sem cursores do lado do
+# servidor). Lá uma restrição EXCLUDE USING gist também impede horários
+# sobrepostos do mesmo profissional (migração 0007).
+
+DB_ENGINE = config("DB_ENGINE", default="sqlite")
+DB_PERFIL = config("DB_PERFIL", default="desenvolvimento")
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=600, cast=int)
+SQLITE_BUSY_TIMEOUT_MS = config("SQLITE_BUSY_TIMEOUT_MS", default=5000, cast=int)
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "salon_management.db.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
+SQLITE_PRAGMAS_PRODUCAO = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # seguro em WAL: só o último commit pode se perder
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,  # em KiB (64 MB por conexão)
+    "temp_store": "MEMORY",
+}
+SQLITE_PRAGMAS = {}
+
+if DB_PERFIL == "producao":
+    DATABASES["default"].update(
+        CONN_MAX_AGE=DB_CONN_MAX_AGE,
+        CONN_HEALTH_CHECKS=True,
+        OPTIONS={"transaction_mode": "IMMEDIATE"},
+    )
+    SQLITE_PRAGMAS = SQLITE_PRAGMAS_PRODUCAO
+
+if DB_ENGINE == "postgresql":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": config("DB_NAME", default="salon_management"),
+        "USER": config("DB_USER", default="postgres"),
+        "PASSWORD": config("DB_PASSWORD", default=""),
+        "HOST": config("DB_HOST", default="localhost"),
+        "PORT": config("DB_PORT", default="5432"),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "DISABLE_SERVER_SIDE_CURSORS": config(
+            "DB_PGBOUNCER", default=False, cast=bool
+        ),
+    }
+
+# Réplica de leitura (appointments.routers): DB_LEITURA=True cria o alias
+# "leitura", usado pelas views marcadas com ler_da_replica (relatórios,
+# listas, dashboard). No SQLite é o mesmo arquivo aberto só para leitura
+# (mode=ro); no PostgreSQL, a réplica em DB_LEITURA_HOST. Escritas ficam no
+# primário, e a sessão que escreveu lê do primário por DB_LEITURA_FIXAR_S
+# segundos (o atraso máximo esperado da réplica).
+
+DB_LEITURA = config("DB_LEITURA", default=False, cast=bool)
+DB_LEITURA_FIXAR_S = config("DB_LEITURA_FIXAR_S", default=5.0, cast=float)
+DB_ALIAS_LEITURA = "leitura" if DB_LEITURA else None
+
+if DB_LEITURA:
+    leitura = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DB_ENGINE == "postgresql":
+        leitura["HOST"] = config("DB_LEITURA_HOST")
+        leitura["PORT"] = config("DB_LEITURA_PORT", default=leitura["PORT"])
+    else:
+        leitura["NAME"] = f"file:{leitura['NAME']}?mode=ro"
+        leitura["OPTIONS"] = {}
+    DATABASES["leitura"] = leitura
+
+# Salões (unidades): SALOES=centro,norte dá a cada salão o seu banco
+# (salao_<slug>.sqlite3, ou o banco <DB_NAME>_<slug> no PostgreSQL) e um
+# espaço próprio no cache. O salão vem do primeiro rótulo do host
+# (centro.exemplo.com) ou, com SALAO_RESOLUCAO=caminho, do primeiro segmento
+# da URL (/centro/...); sem salão correspondente vale o banco default.
+# Comandos por salão: python manage.py por_salao [--saloes a,b] <comando>.
+
+SALOES = config("SALOES", default="", cast=Csv())
+SALAO_RESOLUCAO = config("SALAO_RESOLUCAO", default="host")
+
+for salao in SALOES:
+    DATABASES[f"salao_{salao}"] = {
+        **DATABASES["default"],
+        "NAME": (
+            f"{DATABASES['default']['NAME']}_{salao}"
+            if DB_ENGINE == "postgresql"
+            else BASE_DIR / f"salao_{salao}.sqlite3"
+        ),
+    }
+
+DATABASE_ROUTERS = ["appointments.routers.LeituraEscritaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Com vários workers use um backend compartilhado (ex.: FileBasedCache ou Redis),
+# senão a invalidação dos caches de referência só vale no processo que salvou.
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="salon-management"),
+        "KEY_FUNCTION": "appointments.saloes.chave_cache",
+    }
+}
+
+# GET condicional e cache de fragmentos das listas e do detalhe do
+# agendamento. As ETags e as chaves dos fragmentos derivam da última alteração
+# (data_atualizacao) dos registros exibidos; PAGINAS_VERSAO entra em todas:
+# mude a cada deploy (ex.: hash do commit) para que templates novos não sejam
+# respondidos com 304 nem com fragmentos antigos.
+PAGINAS_VERSAO = config("PAGINAS_VERSAO", default="")
+CACHE_FRAGMENTOS_S = config("CACHE_FRAGMENTOS_S", default=3600, cast=int)
+
+# Feed de alterações (/api/alteracoes/<recurso>/). Registros alterados há
+# menos de FEED_ATRASO_S segundos ficam para a próxima leitura: uma transação
+# ainda aberta pode confirmar depois um data_atualizacao anterior ao cursor.
+# Lápides de exclusão ficam FEED_RETENCAO_DIAS dias (limpar_exclusoes);
+# cursores anteriores a lápides removidas recebem 410 e o cliente sincroniza
+# do início.
+FEED_ATRASO_S = config("FEED_ATRASO_S", default=2.0, cast=float)
+FEED_RETENCAO_DIAS = config("FEED_RETENCAO_DIAS", default=30, cast=int)
+
+# Agendas em iCalendar (/agenda.ics e /profissionais/<id>/agenda.ics): janela
+# móvel de dias para trás e para a frente a partir de hoje.
+AGENDA_ICS_DIAS_PASSADOS = config("AGENDA_ICS_DIAS_PASSADOS", default=30, cast=int)
+AGENDA_ICS_DIAS_FUTUROS = config("AGENDA_ICS_DIAS_FUTUROS", default=90, cast=int)
+
+
+# Auditoria (histórico de agendamentos)
+# "sincrono": grava o histórico na própria transação (padrão, usado nos testes).
+# "spool": anexa os eventos a um arquivo local por processo (com fsync, antes
+# do commit) e uma thread em segundo plano grava em lote os confirmados; o
+# restante é gravado ao encerrar o processo e arquivos de processos que caíram
+# são recuperados por "python manage.py flush_auditoria".
+
+AUDITORIA_MODO = config("AUDITORIA_MODO", default="sincrono")
+AUDITORIA_SPOOL_DIR = config("AUDITORIA_SPOOL_DIR", default=str(BASE_DIR / "spool"))
+AUDITORIA_INTERVALO = config("AUDITORIA_INTERVALO", default=2.0, cast=float)
+AUDITORIA_TAMANHO_LOTE = config("AUDITORIA_TAMANHO_LOTE", default=500, cast=int)
+
+
+# Webhooks de agendamentos (criado, reagendado, status_alterado)
+# Os eventos vão para uma tabela de saída na mesma transação da alteração; o
+# comando despachar_webhooks (serviço à parte) os entrega em lotes, com novas
+# tentativas e backoff exponencial, então a requisição nunca espera a
+# integração. WEBHOOKS é um JSON por destino, ex.:
+# {"sms": {"url": "https://...", "segredo": "...",
+#          "eventos": ["agendamento.criado"], "concorrencia": 2}}
+# "eventos" (padrão: todos), "segredo" (assinatura HMAC-SHA256 do corpo) e
+# "concorrencia" (requisições simultâneas ao destino) são opcionais.
+
+WEBHOOKS = config("WEBHOOKS", default="{}", cast=json.loads)
+WEBHOOK_LOTE = config("WEBHOOK_LOTE", default=50, cast=int)
+WEBHOOK_CONCORRENCIA = config("WEBHOOK_CONCORRENCIA", default=2, cast=int)
+WEBHOOK_TIMEOUT_S = config("WEBHOOK_TIMEOUT_S", default=10.0, cast=float)
+WEBHOOK_MAX_TENTATIVAS = config("WEBHOOK_MAX_TENTATIVAS", default=12, cast=int)
+WEBHOOK_BACKOFF_S = config("WEBHOOK_BACKOFF_S", default=10.0, cast=float)
+WEBHOOK_BACKOFF_MAX_S = config("WEBHOOK_BACKOFF_MAX_S", default=3600.0, cast=float)
+WEBHOOK_RETENCAO_DIAS = config("WEBHOOK_RETENCAO_DIAS", default=7, cast=int)
+
+
+# Arquivamento: agendamentos finalizados mais antigos que N meses saem das
+# tabelas principais (python manage.py arquivar_agendamentos)
+
+ARQUIVO_MESES = config("ARQUIVO_MESES", default=6, cast=int)
+
+
+# Perfil de requisições (appointments.middleware.PerfilMiddleware), desligado
+# por padrão: mede todas as conexões de toda requisição e, sendo só síncrono,
+# no ASGI faz cada requisição passar pela thread de código síncrono.
+# Cabeçalho Server-Timing com tempo de banco, template e Python (para staff,
+# ou para todos com DEBUG); requisições acima do limite vão para o logger
+# "appointments.perfil" (JSON com o SQL normalizado). Staff pode pedir o
+# cProfile com ?_perfil=1 ou X-Perfil: 1.
+
+PERFIL_ATIVO = config("PERFIL_ATIVO", default=False, cast=bool)
+PERFIL_LIMITE_LENTO_MS = config("PERFIL_LIMITE_LENTO_MS", default=500, cast=float)
+
+
+# Métricas (GET /metrics, formato Prometheus)
+# Sem METRICAS_ARQUIVO cada processo expõe só os próprios números (suficiente
+# com o runserver). Com vários workers, aponte para um arquivo SQLite local
+# comum a todos: cada processo soma seus incrementos lá a cada
+# METRICAS_INTERVALO segundos.
+
+METRICAS_ARQUIVO = config("METRICAS_ARQUIVO", default="")
+METRICAS_INTERVALO = config("METRICAS_INTERVALO", default=5.0, cast=float)
+METRICAS_IPS_PERMITIDOS = config(
+    "METRICAS_IPS_PERMITIDOS",
+    default="127.0.0.1,::1",
+    cast=lambda v: [s.strip() for s in v.split(",")],
+)
+
+
+# Rastreamento (spans locais em NDJSON, formato OTLP/JSON, sem coletor)
+# Desligado sem RASTREAMENTO_ARQUIVO. A fração RASTREAMENTO_AMOSTRAGEM das
+# requisições (ou chamadas de serviço fora de requisição) é rastreada por
+# inteiro: serviços, validação do formulário, SQL e templates. Para gerar um
+# flame graph: python manage.py rastros_flamegraph rastros.ndjson
+
+RASTREAMENTO_ARQUIVO = config("RASTREAMENTO_ARQUIVO", default="")
+RASTREAMENTO_AMOSTRAGEM = config("RASTREAMENTO_AMOSTRAGEM", default=0.1, cast=float)
+RASTREAMENTO_SERVICO = config("RASTREAMENTO_SERVICO", default="salon_management")
 
 
 # Password validation
@@ -136,6 +354,41 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Pipeline de estáticos. Bootstrap e Font Awesome ficam em static/vendor/
+# (sem CDN). Com ESTATICOS_EMPACOTADOS=True (produção, ver Dockerfile) as
+# páginas carregam os pacotes de PACOTES_ESTATICOS, gerados em static/dist/
+# por "python manage.py montar_estaticos" (concatenados e minificados), e o
+# collectstatic grava nomes com hash do conteúdo e versões .gz/.br; o
+# WhiteNoise serve esses arquivos com cache de 10 anos (immutable). Sem a
+# opção (desenvolvimento) as páginas carregam os arquivos de origem.
+ESTATICOS_EMPACOTADOS = config("ESTATICOS_EMPACOTADOS", default=False, cast=bool)
+ESTATICOS_DIST = BASE_DIR / "static" / "dist"
+PACOTES_ESTATICOS = {
+    "vendor.css": [
+        "vendor/bootstrap/css/bootstrap.min.css",
+        "vendor/fontawesome/css/fontawesome.min.css",
+        "vendor/fontawesome/css/solid.min.css",
+    ],
+    "app.css": ["css/base.css", "css/categories.css"],
+    "formularios.css": ["css/forms.css"],
+    "vendor.js": [
+        "vendor/bootstrap/js/popper.min.js",
+        "vendor/bootstrap/js/bootstrap.min.js",
+    ],
+    "app.js": ["js/base.js", "js/masks.js"],
+}
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if ESTATICOS_EMPACOTADOS
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        )
+    },
+}
+
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
@@ -144,9 +397,3 @@ MEDIA_ROOT = BASE_DIR / "media"
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
-
-# Bootstrap 5 configuration
-BOOTSTRAP5 = {
-    "css_url": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css",
-    "javascript_url": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js",
-}
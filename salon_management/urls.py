@@ -20,8 +20,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from appointments.views import metricas
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metricas, name="metricas"),
     path("", include("appointments.urls")),
 ]
 